@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""
+Benchmarks do pipeline de cópia (process_website) com sites sintéticos
+servidos localmente.
+
+Cada execução roda em um processo novo (o pico de memória é do processo
+inteiro) e mede tempo total, vazão, pico de RSS e o tempo de cada etapa.
+Os resultados vão para um JSON, que pode ser comparado com o de uma
+versão anterior.
+
+Uso:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --scenario huge_css --repeat 5
+    python benchmarks/run_benchmarks.py --scale 0.2 -o rapido.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Adiciona o diretório src ao path para importar webcopy
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from server import FixtureServer  # noqa: E402
+from sites import SCENARIOS  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Métricas resumidas pela mediana das repetições
+METRICS = ['wall_time', 'assets_per_s', 'mb_per_s', 'peak_rss_mb']
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memória residente do processo, em MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_once(url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copia a página uma vez e mede (executado em um processo separado).
+    
+    Args:
+        url: Página a copiar.
+        options: Argumentos de process_website, mais 'processes' (tamanho
+            do CPUPool, criado antes de começar a medir).
+        
+    Returns:
+        Medidas da execução.
+    """
+    from webcopy.organizer import FileOrganizer
+    from webcopy.web.tasks import process_website
+    from webcopy.workers import CPUPool
+    
+    options = dict(options)
+    processes = options.pop('processes', 0)
+    if processes:
+        options['cpu_pool'] = CPUPool(processes)
+    
+    output_dir = tempfile.mkdtemp(prefix='webcopy-bench-')
+    try:
+        started = time.perf_counter()
+        result = process_website(url, output_dir=output_dir, output_name='site', **options)
+        wall_time = time.perf_counter() - started
+        
+        manifest = FileOrganizer.read_manifest(Path(output_dir) / 'site') or {'assets': {}}
+        assets = len(manifest['assets'])
+        size = sum(entry.get('size', 0) for entry in manifest['assets'].values())
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        if processes:
+            options['cpu_pool'].shutdown()
+    
+    return {
+        'success': result['success'],
+        'error': result['error'],
+        'wall_time': round(wall_time, 4),
+        'assets': assets,
+        'bytes': size,
+        'assets_per_s': round(assets / wall_time, 1),
+        'mb_per_s': round(size / wall_time / (1024 * 1024), 3),
+        'peak_rss_mb': peak_rss_mb(),
+        'skipped': len(result.get('skipped', {})),
+        'stages': {stage: seconds for stage, seconds in result['timings'].items() if stage != 'total'},
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mediana de cada métrica (e de cada etapa) das repetições."""
+    summary = {}
+    for metric in METRICS:
+        values = [run[metric] for run in runs if run[metric] is not None]
+        summary[metric] = round(statistics.median(values), 4) if values else None
+    
+    stages = {}
+    for stage in dict.fromkeys(stage for run in runs for stage in run['stages']):
+        stages[stage] = round(statistics.median(run['stages'].get(stage, 0.0) for run in runs), 4)
+    summary['stages'] = stages
+    return summary
+
+
+def git_revision() -> Optional[str]:
+    """Commit atual do repositório, se houver."""
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """
+    Compara o tempo total de cada cenário com o de uma execução anterior.
+    
+    Returns:
+        True se nenhum cenário ficou mais lento que a tolerância.
+    """
+    ok = True
+    print()
+    print(f'Comparação com {baseline.get("revision") or "baseline"} ({baseline.get("timestamp", "?")}):')
+    for name, scenario in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name, {}).get('median', {}).get('wall_time')
+        after = scenario['median']['wall_time']
+        if not before or after is None:
+            print(f'  {name:16} sem referência')
+            continue
+        change = after / before - 1
+        regressed = change > tolerance
+        ok = ok and not regressed
+        mark = '[!]' if regressed else '   '
+        print(f'  {mark} {name:16} {before:8.3f}s -> {after:8.3f}s ({change:+.1%})')
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Cenário a executar (pode repetir; padrão: todos)')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções por cenário (padrão: 3)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplica o tamanho dos sites (padrão: 1.0)')
+    parser.add_argument('-o', '--output', default='benchmark-results.json',
+                        help='Arquivo JSON de resultados (padrão: benchmark-results.json)')
+    parser.add_argument('--compare', metavar='JSON', help='Resultados anteriores para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Piora aceita no tempo total ao comparar (padrão: 0.2 = 20%%)')
+    parser.add_argument('--workers', type=int,
+                        help='Downloads simultâneos (padrão: 8; 64 com --async)')
+    parser.add_argument('--per-host', type=int,
+                        help='Conexões por host (padrão: 6; 32 com --async)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Usa o AsyncDownloader (requer httpx)')
+    parser.add_argument('--parser', default='html.parser', choices=['html.parser', 'lxml'],
+                        help='Parser HTML (padrão: html.parser)')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='Processos para o parse e a reescrita (padrão: 0 = no próprio processo)')
+    args = parser.parse_args(argv)
+    
+    names = args.scenario or list(SCENARIOS)
+    options = {
+        'max_workers': args.workers,
+        'per_host_limit': args.per_host,
+        'use_async': args.use_async,
+        'html_parser': args.parser,
+        'processes': args.processes,
+    }
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': multiprocessing.cpu_count(),
+        'scale': args.scale,
+        'repeat': args.repeat,
+        'options': options,
+        'scenarios': {},
+    }
+    
+    site_root = Path(tempfile.mkdtemp(prefix='webcopy-sites-'))
+    # spawn: cada execução começa com um interpretador limpo (pico de RSS próprio)
+    context = multiprocessing.get_context('spawn')
+    try:
+        with FixtureServer(site_root) as server:
+            for name in names:
+                scenario = SCENARIOS[name]
+                entry = scenario.build(site_root / name, args.scale)
+                url = server.url(f'{name}/{entry}')
+                print(f'[*] {name}: {scenario.description}')
+                
+                runs = []
+                for attempt in range(args.repeat):
+                    server.reset()
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        run = executor.submit(run_once, url, options).result()
+                    runs.append(run)
+                    status = 'ok' if run['success'] else f'ERRO: {run["error"]}'
+                    print(f'    #{attempt + 1}: {run["wall_time"]:.3f}s, {run["assets"]} assets, '
+                          f'{run["assets_per_s"]} assets/s, {run["peak_rss_mb"]} MB RSS ({status})')
+                
+                results['scenarios'][name] = {
+                    'description': scenario.description,
+                    'median': summarize(runs),
+                    'runs': runs,
+                }
+                stages = results['scenarios'][name]['median']['stages']
+                print('    etapas: ' + ', '.join(f'{stage} {seconds:.3f}s' for stage, seconds in stages.items()))
+    finally:
+        shutil.rmtree(site_root, ignore_errors=True)
+    
+    Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f'[+] Resultados em {args.output}')
+    
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
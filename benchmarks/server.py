@@ -0,0 +1,100 @@
+"""
+Servidor HTTP local que serve os sites sintéticos dos benchmarks.
+
+Além dos arquivos estáticos (com keep-alive, como um servidor real):
+    .../slow/...      responde depois de SLOW_DELAY segundos
+    .../throttle/...  a primeira requisição de cada caminho recebe 429 com
+                      Retry-After: 1
+"""
+
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+SLOW_DELAY = 0.5
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if '/slow/' in path:
+            time.sleep(self.server.slow_delay)
+        elif '/throttle/' in path and self.server.first_hit(path):
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        super().do_GET()
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+    Servidor dos benchmarks, em uma thread do processo.
+    
+    Uso:
+        with FixtureServer(site_dir) as server:
+            url = server.url('index.html')
+    """
+    
+    def __init__(self, root: Path, slow_delay: float = SLOW_DELAY):
+        """
+        Args:
+            root: Diretório com os sites.
+            slow_delay: Atraso (segundos) das respostas em /slow/.
+        """
+        directory = str(root)
+        
+        class Handler(FixtureHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=directory, **kwargs)
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.slow_delay = slow_delay
+        self.httpd.first_hit = self._first_hit
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def _first_hit(self, path: str) -> bool:
+        with self._lock:
+            if path in self._seen:
+                return False
+            self._seen.add(path)
+            return True
+    
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+    
+    def url(self, path: str = '') -> str:
+        """URL de um caminho do servidor."""
+        return f'http://127.0.0.1:{self.port}/{path.lstrip("/")}'
+    
+    def reset(self):
+        """Volta a responder 429 na primeira requisição de cada caminho /throttle/."""
+        with self._lock:
+            self._seen.clear()
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.stop()
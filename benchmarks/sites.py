@@ -0,0 +1,148 @@
+"""
+Sites sintéticos usados nos benchmarks.
+
+Cada cenário grava um site em um diretório e retorna o caminho da página a
+copiar. O tamanho de cada um é multiplicado por scale (1.0 = tamanho padrão).
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple
+
+
+# PNG 1x1 válido; cada arquivo recebe um sufixo para ter conteúdo único
+PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+
+PARAGRAPH = (
+    'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim '
+    'veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip.'
+)
+
+
+def _count(base: int, scale: float) -> int:
+    return max(1, int(base * scale))
+
+
+def _write(root: Path, path: str, content) -> None:
+    target = root / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(content, str):
+        target.write_text(content, encoding='utf-8')
+    else:
+        target.write_bytes(content)
+
+
+def _image(root: Path, path: str, n: int) -> None:
+    _write(root, path, PNG + f'#{n}'.encode())
+
+
+def _page(title: str, head: str = '', body: str = '') -> str:
+    return (
+        '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{title}</title>\n{head}</head>\n<body>\n{body}</body>\n</html>\n'
+    )
+
+
+def many_images(root: Path, scale: float) -> str:
+    """Centenas de imagens pequenas na mesma página."""
+    count = _count(500, scale)
+    body = []
+    for n in range(count):
+        _image(root, f'img/i{n}.png', n)
+        lazy = ' loading="lazy"' if n >= 10 else ''
+        body.append(f'<img src="img/i{n}.png" alt="{n}"{lazy}>\n')
+    _write(root, 'index.html', _page('many_images', body=''.join(body)))
+    return 'index.html'
+
+
+def huge_css(root: Path, scale: float) -> str:
+    """Um CSS enorme, com milhares de url() para algumas centenas de imagens."""
+    refs = _count(5000, scale)
+    images = _count(300, scale)
+    for n in range(images):
+        _image(root, f'css/bg/b{n}.png', n)
+    
+    rules = []
+    for n in range(refs):
+        image = n % images
+        quote = ('', '"', "'")[n % 3]
+        rules.append(f'.r{n} {{ color: #{n % 4096:03x}; background: url({quote}bg/b{image}.png{quote}) no-repeat; }}\n')
+        if n % 50 == 0:
+            rules.append(f'/* seção {n}: url(comentario/ignorado.png) */\n')
+    _write(root, 'css/huge.css', ''.join(rules))
+    
+    head = '<link rel="stylesheet" href="css/huge.css">\n'
+    _write(root, 'index.html', _page('huge_css', head, '<div class="r0">huge_css</div>\n'))
+    return 'index.html'
+
+
+def import_chain(root: Path, scale: float) -> str:
+    """Cadeia profunda de @import, com imagens em cada nível."""
+    depth = min(_count(12, scale), 16)  # CSSGraph corta cadeias mais fundas
+    width = _count(5, scale)
+    for level in range(depth):
+        lines = []
+        if level + 1 < depth:
+            form = f'url("c{level + 1}.css")' if level % 2 else f'"c{level + 1}.css"'
+            lines.append(f'@import {form};\n')
+        for n in range(width):
+            _image(root, f'css/img/l{level}_{n}.png', level * width + n)
+            lines.append(f'.l{level}_{n} {{ background-image: url(img/l{level}_{n}.png); }}\n')
+        _write(root, f'css/c{level}.css', ''.join(lines))
+    
+    head = '<link rel="stylesheet" href="css/c0.css">\n'
+    _write(root, 'index.html', _page('import_chain', head, '<div class="l0_0">import_chain</div>\n'))
+    return 'index.html'
+
+
+def slow_endpoints(root: Path, scale: float) -> str:
+    """Assets lentos (/slow/) e limitados com 429 + Retry-After (/throttle/)."""
+    slow = _count(20, scale)
+    throttled = _count(5, scale)
+    body = []
+    for n in range(slow):
+        _image(root, f'slow/s{n}.png', n)
+        body.append(f'<img src="slow/s{n}.png" loading="lazy">\n')
+    for n in range(throttled):
+        _image(root, f'throttle/t{n}.png', n)
+        body.append(f'<img src="throttle/t{n}.png" loading="lazy">\n')
+    _write(root, 'index.html', _page('slow_endpoints', body=''.join(body)))
+    return 'index.html'
+
+
+def large_html(root: Path, scale: float) -> str:
+    """HTML de vários MB, com links, estilos inline e imagens espalhadas."""
+    sections = _count(6000, scale)
+    images = _count(200, scale)
+    for n in range(images):
+        _image(root, f'img/p{n}.png', n)
+    
+    body = []
+    for n in range(sections):
+        body.append(
+            f'<section id="s{n}"><h2>Seção {n}</h2>'
+            f'<p>{PARAGRAPH} <a href="https://example.com/ref/{n}">ref {n}</a></p>'
+            f'<div style="background: url(img/p{n % images}.png)"><span>{PARAGRAPH}</span></div>'
+        )
+        if n % max(1, sections // images) == 0:
+            body.append(f'<img src="img/p{n % images}.png" alt="figura {n}">')
+        body.append('</section>\n')
+    _write(root, 'index.html', _page('large_html', body=''.join(body)))
+    return 'index.html'
+
+
+class Scenario(NamedTuple):
+    description: str
+    build: Callable[[Path, float], str]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    'many_images': Scenario('500 imagens pequenas', many_images),
+    'huge_css': Scenario('CSS com 5000 url() para 300 imagens', huge_css),
+    'import_chain': Scenario('12 níveis de @import', import_chain),
+    'slow_endpoints': Scenario('assets lentos e com 429', slow_endpoints),
+    'large_html': Scenario('HTML de ~5 MB com 200 imagens', large_html),
+}
@@ -17,7 +17,7 @@ from webcopy.web.app import app
 
 if __name__ == '__main__':
     # Cria diretório output se não existir
-    output_dir = Path('output')
+    output_dir = Path(app.config['OUTPUT_DIR'])
     output_dir.mkdir(exist_ok=True)
     
     print("=" * 60)
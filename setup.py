@@ -17,9 +17,13 @@ setup(
         "flask>=3.0.0",
         "flask-cors>=4.0.0",
     ],
+    extras_require={
+        "async": ["httpx[http2]>=0.27.0"],
+    },
     entry_points={
         "console_scripts": [
             "webcopy=webcopy.cli:main",
+            "webcopy-batch=webcopy.cli:batch",
         ],
     },
 )
@@ -0,0 +1,350 @@
+"""
+Archive Module - Geração de arquivos ZIP/tar: em streaming a partir de uma
+cópia pronta, ou entrada por entrada durante a própria cópia.
+"""
+
+import os
+import time
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type, Union
+
+from .organizer import FILE_MODE, FileOrganizer
+
+
+# Formatos já comprimidos: comprimir de novo só gasta CPU
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.heic',
+    '.woff', '.woff2',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.br', '.7z', '.rar',
+    '.mp3', '.mp4', '.m4a', '.ogg', '.oga', '.ogv', '.webm', '.mov', '.avi',
+    '.pdf',
+}
+
+# Tamanho dos blocos lidos dos arquivos
+CHUNK_SIZE = 64 * 1024
+
+
+def compress_type_for(name: str) -> int:
+    """
+    Escolhe o método de compressão de uma entrada pelo nome do arquivo.
+    
+    Returns:
+        zipfile.ZIP_STORED para formatos já comprimidos (imagens, woff2,
+        vídeos...), zipfile.ZIP_DEFLATED para o resto (HTML, CSS, JS, SVG).
+    """
+    ext = os.path.splitext(name)[1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def list_files(root: Path) -> List[Tuple[str, Path]]:
+    """
+    Lista os arquivos de um diretório em ordem determinística.
+    
+    Returns:
+        Lista de (nome no arquivo, caminho), com nomes relativos a root
+        separados por '/'.
+    """
+    root = Path(root)
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = Path(dirpath) / filename
+            files.append((path.relative_to(root).as_posix(), path))
+    return files
+
+
+class _ChunkSink:
+    """Destino de escrita do ZipFile que acumula os bytes até serem lidos."""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def take(self) -> bytes:
+        """Retorna e descarta os bytes acumulados."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def iter_zip(root: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Gera um arquivo ZIP de um diretório em partes, sem gravá-lo em disco.
+    
+    Cada arquivo é lido uma única vez e as partes do ZIP são emitidas à
+    medida que ficam prontas, então o download começa imediatamente. Como a
+    saída não é seekable, tamanhos e CRCs vão em data descriptors após cada
+    entrada (suportado por todos os descompactadores usuais).
+    
+    Args:
+        root: Diretório a compactar.
+        chunk_size: Tamanho aproximado das partes emitidas.
+        
+    Yields:
+        Partes do arquivo ZIP, na ordem.
+    """
+    sink = _ChunkSink()
+    
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for name, path in list_files(root):
+            info = zipfile.ZipInfo.from_file(path, name)
+            info.compress_type = compress_type_for(name)
+            
+            with open(path, 'rb') as source, archive.open(info, 'w') as entry:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    entry.write(chunk)
+                    if sink.size >= chunk_size:
+                        yield sink.take()
+            
+            if sink.size >= chunk_size:
+                yield sink.take()
+    
+    # Restante da última entrada e diretório central
+    yield sink.take()
+
+
+class ArchiveWriter:
+    """
+    Arquivo (ZIP ou tar) montado entrada por entrada.
+    
+    É gravado em um arquivo temporário no diretório de destino e só recebe o
+    nome final em close(); abort() descarta tudo. Pode receber entradas de
+    várias threads ao mesmo tempo.
+    """
+    
+    EXTENSION = ''
+    
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Caminho final do arquivo.
+        """
+        self.path = Path(path)
+        self.count = 0
+        self._lock = threading.Lock()
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.part'
+        )
+        self._file = os.fdopen(fd, 'w+b')
+    
+    def add_file(self, name: str, path: Path):
+        """Adiciona um arquivo do disco com o nome informado."""
+        with self._lock:
+            self._add_file(name, Path(path))
+            self.count += 1
+    
+    def add_stream(self, name: str, blocks: Iterable[bytes]):
+        """Adiciona uma entrada a partir de blocos de bytes (tamanho desconhecido)."""
+        with self._lock:
+            self._add_stream(name, blocks)
+            self.count += 1
+    
+    def close(self):
+        """Finaliza o arquivo e o publica no caminho final."""
+        with self._lock:
+            self._finish()
+            self._file.close()
+            os.chmod(self._tmp_path, FILE_MODE)
+            os.replace(self._tmp_path, self.path)
+    
+    def abort(self):
+        """Descarta o arquivo incompleto."""
+        with self._lock:
+            self._file.close()
+            try:
+                os.unlink(self._tmp_path)
+            except OSError:
+                pass
+    
+    def _add_file(self, name: str, path: Path):
+        raise NotImplementedError
+    
+    def _add_stream(self, name: str, blocks: Iterable[bytes]):
+        raise NotImplementedError
+    
+    def _finish(self):
+        raise NotImplementedError
+
+
+class ZipArchiveWriter(ArchiveWriter):
+    """ZIP com compressão por entrada (veja compress_type_for)."""
+    
+    EXTENSION = '.zip'
+    
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._zip = zipfile.ZipFile(self._file, 'w', allowZip64=True)
+    
+    def _add_file(self, name: str, path: Path):
+        info = zipfile.ZipInfo.from_file(path, name)
+        info.compress_type = compress_type_for(name)
+        with open(path, 'rb') as source, self._zip.open(info, 'w') as entry:
+            shutil.copyfileobj(source, entry, CHUNK_SIZE)
+    
+    def _add_stream(self, name: str, blocks: Iterable[bytes]):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = compress_type_for(name)
+        info.external_attr = (0o100000 | FILE_MODE) << 16
+        with self._zip.open(info, 'w') as entry:
+            for block in blocks:
+                entry.write(block)
+    
+    def _finish(self):
+        self._zip.close()
+
+
+class TarArchiveWriter(ArchiveWriter):
+    """Tar sem compressão (formato PAX)."""
+    
+    EXTENSION = '.tar'
+    
+    # Entradas geradas em blocos ficam em memória até este tamanho
+    SPOOL_SIZE = 8 * 1024 * 1024
+    
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._tar = tarfile.open(fileobj=self._file, mode='w', format=tarfile.PAX_FORMAT)
+    
+    def _add_file(self, name: str, path: Path):
+        self._tar.add(str(path), arcname=name, recursive=False)
+    
+    def _add_stream(self, name: str, blocks: Iterable[bytes]):
+        # O cabeçalho tar leva o tamanho da entrada, então o conteúdo é
+        # acumulado antes (em memória ou, se for grande, em disco)
+        with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE) as spool:
+            for block in blocks:
+                spool.write(block)
+            info = tarfile.TarInfo(name)
+            info.size = spool.tell()
+            info.mtime = int(time.time())
+            info.mode = FILE_MODE
+            spool.seek(0)
+            self._tar.addfile(info, spool)
+    
+    def _finish(self):
+        self._tar.close()
+
+
+# Formatos de saída em arquivo suportados
+ARCHIVE_FORMATS: Dict[str, Type[ArchiveWriter]] = {
+    'zip': ZipArchiveWriter,
+    'tar': TarArchiveWriter,
+}
+
+
+def open_archive(path: Path, format: str = 'zip') -> ArchiveWriter:
+    """
+    Cria um ArchiveWriter.
+    
+    Args:
+        path: Caminho final do arquivo.
+        format: 'zip' ou 'tar'.
+        
+    Returns:
+        ArchiveWriter do formato pedido.
+    """
+    try:
+        writer_class = ARCHIVE_FORMATS[format]
+    except KeyError:
+        raise ValueError(f'Formato de arquivo desconhecido: {format}') from None
+    return writer_class(path)
+
+
+class ArchiveOrganizer(FileOrganizer):
+    """
+    FileOrganizer que grava a cópia direto em um arquivo ZIP ou tar.
+    
+    Cada asset entra no arquivo assim que o download termina e o arquivo
+    baixado é apagado em seguida, então a árvore de diretórios da cópia
+    nunca chega a existir. Só os CSS ficam guardados até serem reescritos;
+    eles e as páginas HTML entram no final. O arquivo fica completo em
+    close() (ou é descartado em abort()).
+    
+    Não suporta o modo incremental: não há cópia anterior a atualizar.
+    """
+    
+    def __init__(self, archive_path: Path, format: str = 'zip'):
+        """
+        Inicializa o organizador.
+        
+        Args:
+            archive_path: Caminho final do arquivo (ex: output/site.zip).
+            format: 'zip' ou 'tar'.
+        """
+        archive_path = Path(archive_path)
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Downloads em andamento e CSS a reescrever ficam em um diretório
+        # temporário ao lado do arquivo (mesmo sistema de arquivos)
+        staging = tempfile.mkdtemp(prefix=f'.{archive_path.name}.', dir=archive_path.parent)
+        super().__init__(Path(staging))
+        
+        self.archive_path = archive_path
+        self.archive = open_archive(archive_path, format)
+    
+    def _append(self, file_path: Path):
+        """Move um arquivo do diretório temporário para o arquivo final."""
+        self.archive.add_file(self._relative(file_path), file_path)
+        file_path.unlink()
+    
+    def mark_saved(self, url: str, info: Optional[Dict[str, Any]] = None) -> str:
+        """Registra um download e já o adiciona ao arquivo (exceto CSS)."""
+        local_path = super().mark_saved(url, info)
+        file_path = self.output_path / local_path
+        if file_path.parent != self.css_dir:
+            self._append(file_path)
+        return local_path
+    
+    def rewrite_css_urls(self, url_map: Dict[str, str], only: Optional[Set[str]] = None,
+                         executor=None):
+        """Reescreve os CSS e os adiciona ao arquivo."""
+        super().rewrite_css_urls(url_map, only, executor)
+        for css_file in sorted(self.css_dir.glob('*')):
+            if css_file.is_file():
+                self._append(css_file)
+    
+    def save_html(self, content: Union[str, Iterable[str]], filename: str = "index.html"):
+        """Grava uma página HTML direto em uma entrada do arquivo."""
+        if isinstance(content, str):
+            content = [content]
+        self.archive.add_stream(filename, self._html_blocks(content))
+    
+    def save_manifest(self, url_map: Dict[str, str], page: Optional[Dict[str, Any]] = None) -> Path:
+        """Grava o manifesto dentro do arquivo."""
+        file_path = super().save_manifest(url_map, page)
+        self._append(file_path)
+        return file_path
+    
+    def close(self) -> Path:
+        """
+        Finaliza o arquivo e remove o diretório temporário.
+        
+        Returns:
+            Caminho do arquivo pronto.
+        """
+        # Algo que ainda não entrou (ex: CSS sem reescrita) vai agora
+        for _, file_path in list_files(self.output_path):
+            self._append(file_path)
+        self.archive.close()
+        shutil.rmtree(self.output_path, ignore_errors=True)
+        return self.archive_path
+    
+    def abort(self):
+        """Descarta o arquivo incompleto e o diretório temporário."""
+        self.archive.abort()
+        shutil.rmtree(self.output_path, ignore_errors=True)
@@ -0,0 +1,362 @@
+"""
+Async Downloader Module - Downloads assíncronos com multiplexação HTTP/2.
+
+Requer o httpx com suporte a HTTP/2 (pip install "httpx[http2]").
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+import click
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - dependência opcional
+    httpx = None
+
+from .budget import BudgetExceeded, JobBudget
+from .cache import HTTPCache
+from .downloader import DownloadCacheMixin, Downloader
+from .metrics import JobMetrics, phase_timings
+from .organizer import AtomicWriter
+from .ratelimit import THROTTLE_STATUS, AdaptiveRateLimiter, parse_retry_after
+
+
+class _RequestTrace:
+    """
+    Recebe os eventos de trace do httpcore de uma requisição e mede a
+    abertura de conexão (TCP + TLS, com o DNS) e o tempo até os headers.
+    """
+    
+    CONNECT_EVENTS = ('connection.connect_tcp', 'connection.start_tls')
+    
+    def __init__(self):
+        self.connect = 0.0
+        self.ttfb: Optional[float] = None
+        self._started: Dict[str, float] = {}
+        self._sent: Optional[float] = None
+    
+    async def __call__(self, event: str, info: Dict[str, Any]):
+        now = time.perf_counter()
+        name, _, stage = event.rpartition('.')
+        if stage == 'started':
+            self._started[name] = now
+            return
+        if stage != 'complete':
+            return
+        
+        began = self._started.pop(name, now)
+        if name in self.CONNECT_EVENTS:
+            self.connect += now - began
+        elif name.endswith('.send_request_headers'):
+            self._sent = began
+        elif name.endswith('.receive_response_headers') and self._sent is not None:
+            self.ttfb = now - self._sent
+
+
+@asynccontextmanager
+async def _atomic_writer(path: Path) -> AsyncIterator[AtomicWriter]:
+    """AtomicWriter aberto e publicado (ou descartado) fora do event loop."""
+    loop = asyncio.get_running_loop()
+    writer = AtomicWriter(path)
+    await loop.run_in_executor(None, writer.__enter__)
+    try:
+        yield writer
+    except BaseException as e:
+        await loop.run_in_executor(None, writer.__exit__, type(e), e, e.__traceback__)
+        raise
+    await loop.run_in_executor(None, writer.__exit__, None, None, None)
+
+
+class AsyncDownloader(DownloadCacheMixin):
+    """
+    Versão asyncio do Downloader.
+    
+    Mantém poucas conexões HTTP/2 por origem e multiplexa todas as
+    requisições de assets sobre elas, sem ocupar uma thread por download.
+    O trabalho de disco (gravação, SHA-256, consultas e cópias do cache)
+    roda no executor padrão do loop, para não parar os demais streams; o
+    registro no organizador (BlobStore, arquivo zip/tar) fica a cargo do
+    AsyncDownloadPool, também no executor.
+    """
+    
+    USER_AGENT = Downloader.USER_AGENT
+    
+    # Status que justificam uma nova tentativa (mesmos do Downloader)
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    
+    def __init__(
+        self,
+        timeout: int = 30,
+        max_retries: int = 3,
+        max_connections: int = 100,
+        http2: bool = True,
+        cache: Optional[HTTPCache] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        budget: Optional[JobBudget] = None,
+        metrics: Optional[JobMetrics] = None
+    ):
+        """
+        Inicializa o downloader assíncrono.
+        
+        Args:
+            timeout: Timeout em segundos para cada requisição.
+            max_retries: Número máximo de tentativas em caso de falha.
+            max_connections: Limite total de conexões abertas.
+            http2: Usa HTTP/2 quando o servidor suportar.
+            cache: Cache HTTP persistente usado pelos downloads de assets.
+            rate_limiter: Limitador por origem (compartilhado com o
+                Downloader síncrono do mesmo job, se houver).
+            budget: Orçamento do job, aplicado aos downloads de assets.
+            metrics: Métricas do job (veja Downloader).
+        """
+        if httpx is None:
+            raise ImportError(
+                'AsyncDownloader requer o httpx. Instale com: pip install "httpx[http2]"'
+            )
+        
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.cache = cache
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.budget = budget
+        self.metrics = metrics
+        self._client: Optional['httpx.AsyncClient'] = None
+        self._downloaded_urls = set()  # Cache de URLs já baixadas
+    
+    def _create_client(self) -> 'httpx.AsyncClient':
+        """Cria o cliente HTTP (deve ser chamado dentro do event loop)."""
+        transport = httpx.AsyncHTTPTransport(
+            http2=self.http2,
+            retries=self.max_retries,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={
+                "User-Agent": self.USER_AGENT,
+                "Accept": "*/*",
+                "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+                "Accept-Encoding": "gzip, deflate, br",
+            },
+        )
+    
+    @property
+    def client(self) -> 'httpx.AsyncClient':
+        """Cliente HTTP compartilhado, criado sob demanda."""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+    
+    async def aclose(self):
+        """Fecha as conexões abertas."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self) -> 'AsyncDownloader':
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def _get(self, url: str, stream: bool = False,
+                   headers: Optional[Dict[str, str]] = None,
+                   trace: Optional[_RequestTrace] = None) -> 'httpx.Response':
+        """
+        GET com novas tentativas para status temporários (429, 5xx).
+        
+        Respeita o rate limiter da origem; em 429/503 a espera é a do
+        Retry-After, aplicada pelo limiter a todas as requisições à origem.
+        Com stream=True o corpo não é lido; o chamador deve fechar a
+        resposta com aclose(). Com trace, os eventos da conexão vão para ele.
+        """
+        extensions = {'trace': trace} if trace is not None else None
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.wait_async(url)
+            request = self.client.build_request('GET', url, headers=headers, extensions=extensions)
+            started = time.monotonic()
+            try:
+                response = await self.client.send(request, stream=stream)
+            except httpx.TransportError:
+                self.rate_limiter.record(url, None, time.monotonic() - started)
+                raise
+            
+            self.rate_limiter.record(url, response.status_code, time.monotonic() - started,
+                                     parse_retry_after(response.headers.get('Retry-After')))
+            if response.status_code not in self.RETRY_STATUS or attempt == self.max_retries:
+                break
+            await response.aclose()
+            if response.status_code not in THROTTLE_STATUS:
+                # Mesmo backoff exponencial do Retry(backoff_factor=1)
+                await asyncio.sleep(2 ** attempt)
+        
+        # 304 chega aqui e é tratado por quem fez a requisição condicional
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+        return response
+    
+    async def download_text(self, url: str) -> Optional[str]:
+        """
+        Baixa uma URL e retorna o conteúdo como texto.
+        
+        Args:
+            url: URL para baixar.
+            
+        Returns:
+            Conteúdo da página como string, ou None se falhar.
+        """
+        try:
+            response = await self._get(url)
+            
+            # Se o servidor não especificou encoding, tenta detectar
+            if response.charset_encoding is None:
+                from charset_normalizer import from_bytes
+                best = from_bytes(response.content).best()
+                response.encoding = best.encoding if best else 'utf-8'
+            
+            return response.text
+        
+        except httpx.TimeoutException:
+            click.echo(f"    [!] Timeout ao baixar: {url}", err=True)
+            return None
+        except httpx.HTTPStatusError as e:
+            click.echo(f"    [!] Erro HTTP {e.response.status_code}: {url}", err=True)
+            return None
+        except httpx.HTTPError as e:
+            click.echo(f"    [!] Erro ao baixar {url}: {e}", err=True)
+            return None
+    
+    async def download_bytes(self, url: str) -> Optional[bytes]:
+        """
+        Baixa uma URL e retorna o conteúdo como bytes.
+        
+        Args:
+            url: URL para baixar.
+            
+        Returns:
+            Conteúdo como bytes, ou None se falhar.
+        """
+        # Evita baixar a mesma URL duas vezes
+        if url in self._downloaded_urls:
+            return None
+        
+        try:
+            response = await self._get(url)
+            self._downloaded_urls.add(url)
+            return response.content
+        
+        except httpx.TimeoutException:
+            click.echo(f"    [!] Timeout ao baixar: {url}", err=True)
+            return None
+        except httpx.HTTPStatusError as e:
+            click.echo(f"    [!] Erro HTTP {e.response.status_code}: {url}", err=True)
+            return None
+        except httpx.HTTPError:
+            click.echo(f"    [!] Erro ao baixar: {url}", err=True)
+            return None
+    
+    async def download_to_file(self, url: str, path: Path,
+                               previous: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Baixa uma URL gravando o conteúdo direto no disco, em blocos.
+        
+        Args:
+            url: URL para baixar.
+            path: Caminho final do arquivo.
+            previous: Metadados do mesmo arquivo em uma cópia anterior
+                (veja Downloader.download_to_file).
+            
+        Returns:
+            Dict com 'size', 'sha256', 'content_type', 'etag',
+            'last_modified', 'cache', 'unchanged' e, com métricas,
+            'timings' (o DNS fica dentro do tempo de conexão), ou None se
+            falhar.
+            
+        Raises:
+            BudgetExceeded: Se o asset não coube no orçamento do job.
+        """
+        # Evita baixar a mesma URL duas vezes
+        if url in self._downloaded_urls:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        info, entry, headers, use_previous = await loop.run_in_executor(
+            None, self._prepare_request, url, path, previous
+        )
+        if info:
+            return info
+        
+        trace = _RequestTrace() if self.metrics is not None and self.metrics.records_assets else None
+        
+        try:
+            response = await self._get(url, stream=True, headers=headers, trace=trace)
+            received = time.perf_counter()
+            try:
+                if response.status_code == 304:
+                    info = await loop.run_in_executor(
+                        None, self._not_modified, url, path, response.headers, entry, previous, use_previous
+                    )
+                else:
+                    self._check_length(response.headers)
+                    async with _atomic_writer(path) as writer:
+                        async for chunk in response.aiter_bytes(Downloader.CHUNK_SIZE):
+                            await loop.run_in_executor(None, writer.write, chunk)
+                            self._consume(writer, len(chunk))
+                    info = await loop.run_in_executor(
+                        None, self._downloaded, url, path, response.headers, writer
+                    )
+            finally:
+                await response.aclose()
+            
+            if trace is not None and info:
+                info['timings'] = phase_timings(None, trace.connect, trace.ttfb,
+                                                time.perf_counter() - received)
+            return info
+        
+        except BudgetExceeded as e:
+            click.echo(f"    [!] Fora do orçamento ({e}): {url}", err=True)
+            raise
+        except httpx.TimeoutException:
+            click.echo(f"    [!] Timeout ao baixar: {url}", err=True)
+            return None
+        except httpx.HTTPStatusError as e:
+            click.echo(f"    [!] Erro HTTP {e.response.status_code}: {url}", err=True)
+            return None
+        except httpx.HTTPError:
+            click.echo(f"    [!] Erro ao baixar: {url}", err=True)
+            return None
+        except OSError as e:
+            click.echo(f"    [!] Erro ao gravar {url}: {e}", err=True)
+            return None
+    
+    async def get_content_type(self, url: str) -> Optional[str]:
+        """
+        Faz uma requisição HEAD para obter o Content-Type de uma URL.
+        
+        Args:
+            url: URL para verificar.
+            
+        Returns:
+            Content-Type ou None se falhar.
+        """
+        try:
+            response = await self.client.head(url)
+            return response.headers.get('Content-Type', '').split(';')[0].strip()
+        except httpx.HTTPError:
+            return None
+    
+    def is_downloaded(self, url: str) -> bool:
+        """Verifica se uma URL já foi baixada."""
+        return url in self._downloaded_urls
@@ -0,0 +1,163 @@
+"""
+Batch Module - Cópia de muitas URLs em um único processo.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from .connections import connection_stats
+from .downloader import Downloader
+from .pool import DownloadPool
+from .ratelimit import AdaptiveRateLimiter
+from .web.tasks import process_website
+
+
+# Nome do manifesto gravado no diretório do lote
+MANIFEST_NAME = 'manifest.jsonl'
+
+
+def read_urls(lines: Iterable[str]) -> List[str]:
+    """
+    Lê as URLs de um lote: uma por linha, ignorando linhas vazias e
+    comentários (#).
+    """
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line)
+    return urls
+
+
+def is_valid_url(url: str) -> bool:
+    """Indica se a URL é http(s) e tem host."""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    return parsed.scheme in ('http', 'https') and bool(parsed.netloc)
+
+
+def batch_output_name(index: int, url: str) -> str:
+    """
+    Nome da cópia de uma URL do lote: posição + host (ex: 00012_example.com).
+    
+    A posição mantém os nomes únicos mesmo com várias URLs do mesmo host
+    copiadas no mesmo segundo.
+    """
+    host = urlparse(url).netloc.replace(':', '_') or 'url'
+    return f'{index:05d}_{host}'
+
+
+def _entry(index: int, url: str, result: Dict[str, Any], seconds: float) -> Dict[str, Any]:
+    """Linha do manifesto para o resultado de uma URL."""
+    entry = {
+        'index': index,
+        'url': url,
+        'success': result['success'],
+        'output_path': result.get('output_path'),
+        'error': result.get('error'),
+        'seconds': round(seconds, 3),
+    }
+    if result['success']:
+        entry['pages'] = result.get('pages', 1)
+        entry['partial'] = result.get('partial', False)
+        entry['skipped'] = len(result.get('skipped', {}))
+    return entry
+
+
+def run_batch(
+    urls: List[str],
+    output_dir: str,
+    concurrency: int = 4,
+    manifest_path: Optional[str] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    **options
+) -> Dict[str, Any]:
+    """
+    Copia uma lista de URLs, no máximo `concurrency` por vez.
+    
+    Todas as cópias usam a mesma sessão HTTP (conexões e handshakes TLS
+    reaproveitados entre URLs do mesmo host) e o mesmo limitador de ritmo
+    por origem; cache HTTP, BlobStore e cache de DNS também são
+    compartilhados quando o chamador os fornece (cache=, store=,
+    install_dns_cache()). Cada URL é copiada em
+    output_dir/<batch_output_name()>.
+    
+    Args:
+        urls: URLs a copiar (as inválidas entram no manifesto como erro).
+        output_dir: Diretório do lote.
+        concurrency: Número de URLs copiadas ao mesmo tempo.
+        manifest_path: Manifesto JSON Lines, uma linha por URL, gravada
+            assim que a cópia termina (padrão: output_dir/manifest.jsonl).
+        on_result: Função chamada com a linha do manifesto de cada URL.
+        **options: Argumentos de process_website (max_workers, cache,
+            store, session, rate_limiter, output_format, max_bytes...).
+            
+    Returns:
+        Dict com 'total', 'succeeded', 'failed', 'partial', 'seconds',
+        'manifest' e 'connections' (reaproveitamento na sessão
+        compartilhada).
+    """
+    concurrency = max(1, concurrency)
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    manifest = Path(manifest_path) if manifest_path else output / MANIFEST_NAME
+    
+    # Sessão e ritmo compartilhados: pool por host do tamanho da concorrência total
+    if options.get('session') is None:
+        options['session'] = Downloader.create_session(
+            pool_maxsize=concurrency * (options.get('per_host_limit') or DownloadPool.DEFAULT_PER_HOST),
+            host_pool_sizes=options.pop('host_pool_sizes', None)
+        )
+    if options.get('rate_limiter') is None:
+        options['rate_limiter'] = AdaptiveRateLimiter()
+    
+    summary = {'total': len(urls), 'succeeded': 0, 'failed': 0, 'partial': 0}
+    started = time.monotonic()
+    
+    def copy(index: int, url: str) -> Dict[str, Any]:
+        copy_started = time.monotonic()
+        if not is_valid_url(url):
+            result = {'success': False, 'error': 'URL inválida'}
+        else:
+            try:
+                result = process_website(
+                    url,
+                    output_dir=str(output),
+                    output_name=batch_output_name(index, url),
+                    **options
+                )
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+        return _entry(index, url, result, time.monotonic() - copy_started)
+    
+    with open(manifest, 'w', encoding='utf-8') as manifest_file:
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='webcopy-batch')
+        futures = [executor.submit(copy, index, url) for index, url in enumerate(urls, 1)]
+        try:
+            for future in as_completed(futures):
+                entry = future.result()
+                manifest_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                manifest_file.flush()
+                summary['succeeded' if entry['success'] else 'failed'] += 1
+                if entry.get('partial'):
+                    summary['partial'] += 1
+                if on_result:
+                    on_result(entry)
+        except BaseException:
+            # Interrompido: descarta as URLs que ainda não começaram
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=True)
+    
+    summary['seconds'] = round(time.monotonic() - started, 3)
+    summary['manifest'] = str(manifest.absolute())
+    summary['connections'] = connection_stats(options['session'])
+    return summary
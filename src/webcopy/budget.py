@@ -0,0 +1,199 @@
+"""
+Budget Module - Limites de bytes, de assets e de tempo de um job.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Union
+
+
+# Motivos pelos quais um asset fica fora da cópia
+REASON_DEADLINE = 'deadline'                # prazo dos downloads de segundo plano
+REASON_TIME_LIMIT = 'time_limit'            # tempo máximo do job
+REASON_MAX_BYTES = 'max_bytes'              # total de bytes do job
+REASON_MAX_ASSET_BYTES = 'max_asset_bytes'  # tamanho de um único asset
+REASON_MAX_ASSETS = 'max_assets'            # número de assets do job
+
+REASON_LABELS = {
+    REASON_DEADLINE: 'prazo de segundo plano',
+    REASON_TIME_LIMIT: 'tempo máximo do job',
+    REASON_MAX_BYTES: 'limite de bytes do job',
+    REASON_MAX_ASSET_BYTES: 'tamanho máximo por asset',
+    REASON_MAX_ASSETS: 'limite de assets',
+}
+
+
+class BudgetExceeded(Exception):
+    """Um asset não cabe no orçamento do job."""
+    
+    def __init__(self, reason: str):
+        super().__init__(REASON_LABELS.get(reason, reason))
+        self.reason = reason
+
+
+class JobBudget:
+    """
+    Orçamento de recursos de um job: total de bytes gravados (baixados ou
+    copiados do cache), tamanho de cada asset, número de assets e tempo
+    total.
+    
+    O tamanho de um asset é conferido pelo Content-Length antes do download
+    e de novo a cada bloco recebido (o header pode faltar ou mentir). Um
+    asset que estoura o orçamento é interrompido e seus bytes não contam.
+    Quando o total de bytes ou o tempo do job se esgota, exhausted passa a
+    indicar o motivo e nenhum asset novo é aceito; o job termina com o que
+    já foi baixado. Os limites valem 0 para "sem limite".
+    
+    Uma instância é usada por um único job, por todas as suas threads.
+    """
+    
+    def __init__(
+        self,
+        max_bytes: int = 0,
+        max_asset_bytes: int = 0,
+        max_assets: int = 0,
+        time_limit: float = 0
+    ):
+        """
+        Inicializa o orçamento (o tempo começa a contar aqui).
+        
+        Args:
+            max_bytes: Total de bytes de assets baixados pelo job.
+            max_asset_bytes: Tamanho máximo de um asset.
+            max_assets: Número máximo de assets.
+            time_limit: Tempo máximo (segundos) do job.
+        """
+        self.max_bytes = max_bytes
+        self.max_asset_bytes = max_asset_bytes
+        self.max_assets = max_assets
+        self.time_limit = time_limit
+        self.deadline_at = time.monotonic() + time_limit if time_limit else None
+        
+        self.bytes = 0
+        self.assets = 0
+        self.exhausted: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """Indica se algum limite está configurado."""
+        return bool(self.max_bytes or self.max_asset_bytes or self.max_assets or self.time_limit)
+    
+    def _time_up(self) -> bool:
+        """Verifica se o tempo do job acabou (requer self._lock)."""
+        if self.deadline_at is None or time.monotonic() < self.deadline_at:
+            return False
+        self.exhausted = self.exhausted or REASON_TIME_LIMIT
+        return True
+    
+    def _check_job(self):
+        """Levanta BudgetExceeded se o orçamento do job acabou (requer self._lock)."""
+        self._time_up()
+        if self.exhausted is not None:
+            raise BudgetExceeded(self.exhausted)
+    
+    def expired(self) -> bool:
+        """Verifica (e registra) se o tempo do job acabou."""
+        with self._lock:
+            return self._time_up()
+    
+    def admit(self):
+        """
+        Reserva a vaga de um novo asset (devolvida com release() se ele
+        acabar fora da cópia).
+        
+        Raises:
+            BudgetExceeded: Se o job já atingiu o número de assets, o total
+                de bytes ou o tempo máximo.
+        """
+        with self._lock:
+            self._check_job()
+            if self.max_assets and self.assets >= self.max_assets:
+                raise BudgetExceeded(REASON_MAX_ASSETS)
+            self.assets += 1
+    
+    def release(self):
+        """Devolve a vaga de um asset admitido que ficou fora da cópia."""
+        with self._lock:
+            self.assets = max(0, self.assets - 1)
+    
+    def check_length(self, length: Union[str, int, None]):
+        """
+        Confere o tamanho anunciado (Content-Length) antes do download.
+        
+        Raises:
+            BudgetExceeded: Se o asset não cabe no tamanho máximo por asset
+                ou no que resta do total do job.
+        """
+        with self._lock:
+            self._check_job()
+            try:
+                self._check_size(int(length))
+            except (TypeError, ValueError):
+                pass
+    
+    def charge(self, size: int):
+        """
+        Contabiliza de uma vez um asset de tamanho conhecido (ex: copiado do
+        cache HTTP).
+        
+        Raises:
+            BudgetExceeded: Se o asset não cabe no orçamento (nada é
+                contabilizado).
+        """
+        with self._lock:
+            self._check_job()
+            self._check_size(size)
+            self.bytes += size
+    
+    def _check_size(self, size: int):
+        """Confere se um asset deste tamanho ainda cabe (requer self._lock)."""
+        if self.max_asset_bytes and size > self.max_asset_bytes:
+            raise BudgetExceeded(REASON_MAX_ASSET_BYTES)
+        if self.max_bytes and self.bytes + size > self.max_bytes:
+            raise BudgetExceeded(REASON_MAX_BYTES)
+    
+    def consume(self, size: int, asset_size: int):
+        """
+        Contabiliza um bloco recebido.
+        
+        Args:
+            size: Tamanho do bloco.
+            asset_size: Total já recebido do asset, incluindo o bloco.
+            
+        Raises:
+            BudgetExceeded: Se o asset passou do tamanho máximo, o job
+                passou do total de bytes ou o tempo do job acabou. O
+                chamador deve descartar o asset e chamar refund(); os
+                outros downloads em andamento continuam enquanto couberem.
+                Só este asset fica de fora: o job é dado como esgotado
+                apenas se, sem ele, o total já chegou ao limite.
+        """
+        with self._lock:
+            self.bytes += size
+            if self._time_up():
+                raise BudgetExceeded(REASON_TIME_LIMIT)
+            if self.max_asset_bytes and asset_size > self.max_asset_bytes:
+                raise BudgetExceeded(REASON_MAX_ASSET_BYTES)
+            if self.max_bytes and self.bytes > self.max_bytes:
+                if self.bytes - asset_size >= self.max_bytes:
+                    self.exhausted = self.exhausted or REASON_MAX_BYTES
+                raise BudgetExceeded(REASON_MAX_BYTES)
+    
+    def refund(self, size: int):
+        """Devolve os bytes de um asset descartado."""
+        with self._lock:
+            self.bytes = max(0, self.bytes - size)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Consumo e limites do orçamento."""
+        with self._lock:
+            return {
+                'bytes': self.bytes,
+                'assets': self.assets,
+                'max_bytes': self.max_bytes,
+                'max_asset_bytes': self.max_asset_bytes,
+                'max_assets': self.max_assets,
+                'time_limit': self.time_limit,
+                'exhausted': self.exhausted,
+            }
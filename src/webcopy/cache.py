@@ -0,0 +1,362 @@
+"""
+Cache Module - Cache HTTP persistente em disco com revalidação condicional.
+"""
+
+import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+import uuid
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+from .organizer import AtomicWriter
+
+
+def default_cache_dir() -> Path:
+    """Diretório padrão do cache (WEBCOPY_CACHE_DIR ou ~/.cache/webcopy/http)."""
+    env = os.environ.get('WEBCOPY_CACHE_DIR')
+    if env:
+        return Path(env)
+    return Path.home() / '.cache' / 'webcopy' / 'http'
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    """Converte uma data HTTP em timestamp, ou None se inválida."""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class HTTPCache:
+    """
+    Cache HTTP compartilhado entre jobs e execuções da CLI.
+    
+    Os corpos ficam em arquivos (bodies/ab/abcdef...) e os metadados em um
+    índice SQLite, o que permite que vários processos usem o mesmo
+    diretório. Respeita Cache-Control/Expires para decidir se uma resposta
+    ainda está fresca e guarda ETag/Last-Modified para requisições
+    condicionais. Quando passa do tamanho máximo, remove as entradas usadas
+    há mais tempo (LRU).
+    """
+    
+    # Frescor heurístico máximo quando o servidor só envia Last-Modified
+    MAX_HEURISTIC_TTL = 24 * 60 * 60
+    
+    _CACHE_CONTROL_PATTERN = re.compile(r'([\w-]+)(?:\s*=\s*"?([^",]*)"?)?')
+    
+    def __init__(self, directory: Optional[Path] = None, max_size: int = 1024 * 1024 * 1024):
+        """
+        Inicializa o cache.
+        
+        Args:
+            directory: Diretório do cache (padrão: default_cache_dir()).
+            max_size: Tamanho máximo dos corpos armazenados, em bytes.
+        """
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.bodies_dir = self.directory / 'bodies'
+        self.max_size = max_size
+        self.bodies_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            str(self.directory / 'index.db'),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' url TEXT NOT NULL,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' content_type TEXT,'
+            ' expires REAL NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' sha256 TEXT,'
+            ' last_access REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)')
+        with self._lock:
+            self._total_size = self._query_total_size()
+    
+    def close(self):
+        """Fecha o índice."""
+        with self._lock:
+            self._db.close()
+    
+    @staticmethod
+    def _key(url: str) -> str:
+        """Chave do cache para uma URL."""
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+    
+    def _body_path(self, key: str) -> Path:
+        """Caminho do arquivo com o corpo de uma entrada."""
+        return self.bodies_dir / key[:2] / key
+    
+    def _query_total_size(self) -> int:
+        """Soma dos tamanhos no índice (requer self._lock)."""
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+    
+    def _parse_cache_control(self, headers: Mapping[str, str]) -> Dict[str, Optional[str]]:
+        """Extrai as diretivas do header Cache-Control."""
+        value = headers.get('Cache-Control', '') or ''
+        return {
+            name.lower(): arg
+            for name, arg in self._CACHE_CONTROL_PATTERN.findall(value)
+        }
+    
+    def _expires_at(self, headers: Mapping[str, str], now: float) -> Optional[float]:
+        """
+        Calcula até quando a resposta pode ser usada sem revalidar.
+        
+        Returns:
+            Timestamp de expiração, ou None se a resposta não pode ser
+            armazenada (no-store).
+        """
+        directives = self._parse_cache_control(headers)
+        
+        if 'no-store' in directives:
+            return None
+        
+        if 'no-cache' in directives:
+            return now
+        
+        if directives.get('max-age'):
+            try:
+                age = int(headers.get('Age', 0) or 0)
+                return now + max(int(directives['max-age']) - age, 0)
+            except ValueError:
+                return now
+        
+        expires = _parse_http_date(headers.get('Expires'))
+        if expires is not None:
+            date = _parse_http_date(headers.get('Date')) or now
+            return now + max(expires - date, 0)
+        
+        # Heurística (RFC 9111): 10% do tempo desde a última modificação
+        last_modified = _parse_http_date(headers.get('Last-Modified'))
+        if last_modified is not None:
+            date = _parse_http_date(headers.get('Date')) or now
+            ttl = min((date - last_modified) * 0.1, self.MAX_HEURISTIC_TTL)
+            return now + max(ttl, 0)
+        
+        return now
+    
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Procura uma URL no cache.
+        
+        Args:
+            url: URL do recurso.
+            
+        Returns:
+            Dict com 'path', 'etag', 'last_modified', 'content_type', 'size',
+            'sha256' e 'fresh' (True se pode ser usada sem revalidar), ou
+            None se a URL não está no cache.
+        """
+        key = self._key(url)
+        now = time.time()
+        
+        with self._lock:
+            row = self._db.execute(
+                'SELECT etag, last_modified, content_type, expires, size, sha256'
+                ' FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, key))
+        
+        path = self._body_path(key)
+        if not path.exists():
+            self._delete(key)
+            return None
+        
+        etag, last_modified, content_type, expires, size, sha256 = row
+        return {
+            'path': path,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': content_type,
+            'size': size,
+            'sha256': sha256,
+            'fresh': expires > now,
+        }
+    
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Headers If-None-Match / If-Modified-Since para revalidar uma entrada."""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def store(self, url: str, headers: Mapping[str, str], source: Path,
+              info: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Armazena no cache o corpo de uma resposta 200 já gravado em disco.
+        
+        Args:
+            url: URL do recurso.
+            headers: Headers da resposta.
+            source: Arquivo com o corpo da resposta.
+            info: Metadados já calculados (size, sha256, content_type).
+            
+        Returns:
+            True se a resposta foi armazenada.
+        """
+        now = time.time()
+        expires = self._expires_at(headers, now)
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        
+        # Sem frescor nem validadores a entrada nunca seria reaproveitada
+        if expires is None or (expires <= now and not etag and not last_modified):
+            return False
+        
+        key = self._key(url)
+        path = self._body_path(key)
+        path.parent.mkdir(exist_ok=True)
+        
+        info = info or {}
+        try:
+            size, sha256 = self._link_body(Path(source), path, info)
+        except OSError:
+            return False
+        
+        with self._lock:
+            previous = self._db.execute(
+                'SELECT size FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries'
+                ' (key, url, etag, last_modified, content_type, expires, size, sha256, last_access)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url, etag, last_modified,
+                 info.get('content_type') or headers.get('Content-Type', '').split(';')[0].strip(),
+                 expires, size, sha256, now)
+            )
+            self._total_size += size - (previous[0] if previous else 0)
+            over_limit = self._total_size > self.max_size
+        
+        if over_limit:
+            self.evict()
+        return True
+    
+    @staticmethod
+    def _link_body(source: Path, path: Path, info: Dict[str, Any]):
+        """
+        Guarda o corpo que já está em disco como corpo da entrada.
+        
+        Usa um hardlink para o próprio arquivo, sem copiar os bytes: os
+        arquivos das cópias nunca são alterados no lugar (FileOrganizer e
+        BlobStore sempre gravam um arquivo novo e o renomeiam). Em outro
+        sistema de arquivos, ou sem size/sha256 em info, faz uma cópia.
+        
+        Returns:
+            Tupla (tamanho, sha256) do corpo.
+        """
+        if info.get('sha256') and info.get('size') is not None:
+            tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.link')
+            try:
+                os.link(source, tmp)
+            except OSError:
+                pass
+            else:
+                os.replace(tmp, path)
+                return info['size'], info['sha256']
+        
+        with AtomicWriter(path) as writer, open(source, 'rb') as src:
+            shutil.copyfileobj(src, writer)
+        return writer.size, writer.sha256
+    
+    def refresh(self, url: str, headers: Mapping[str, str]):
+        """
+        Atualiza validade e validadores de uma entrada após um 304.
+        
+        Args:
+            url: URL do recurso.
+            headers: Headers da resposta 304.
+        """
+        now = time.time()
+        expires = self._expires_at(headers, now)
+        if expires is None:
+            expires = now
+        
+        with self._lock:
+            self._db.execute(
+                'UPDATE entries SET expires = ?, last_access = ?,'
+                ' etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)'
+                ' WHERE key = ?',
+                (expires, now, headers.get('ETag'), headers.get('Last-Modified'), self._key(url))
+            )
+    
+    def copy_to(self, entry: Dict[str, Any], path: Path) -> Dict[str, Any]:
+        """
+        Copia o corpo de uma entrada para um arquivo de destino.
+        
+        Args:
+            entry: Entrada retornada por lookup().
+            path: Caminho final do arquivo.
+            
+        Returns:
+            Dict com 'size', 'sha256' e 'content_type' do arquivo copiado.
+        """
+        with AtomicWriter(path) as writer, open(entry['path'], 'rb') as src:
+            shutil.copyfileobj(src, writer)
+        
+        return {
+            'size': writer.size,
+            'sha256': writer.sha256,
+            'content_type': entry.get('content_type') or '',
+        }
+    
+    def _delete(self, key: str):
+        """Remove uma entrada do índice e do disco."""
+        with self._lock:
+            row = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            if row:
+                self._total_size -= row[0]
+        try:
+            self._body_path(key).unlink()
+        except OSError:
+            pass
+    
+    def evict(self):
+        """Remove as entradas menos usadas até caber no tamanho máximo."""
+        with self._lock:
+            # Outros processos podem ter mudado o cache: recalcula o total
+            self._total_size = self._query_total_size()
+            if self._total_size <= self.max_size:
+                return
+            rows = self._db.execute(
+                'SELECT key, size FROM entries ORDER BY last_access'
+            ).fetchall()
+            excess = self._total_size - self.max_size
+        
+        for key, size in rows:
+            if excess <= 0:
+                break
+            self._delete(key)
+            excess -= size
+    
+    def clear(self):
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._db.execute('DELETE FROM entries')
+            self._total_size = 0
+        shutil.rmtree(self.bodies_dir, ignore_errors=True)
+        self.bodies_dir.mkdir(parents=True, exist_ok=True)
@@ -2,15 +2,25 @@
 CLI Module - Interface de linha de comando para o WebCopy.
 """
 
+import re
+import json
 import click
 import sys
-from urllib.parse import urlparse
 from datetime import datetime
+from urllib.parse import urlparse
 from pathlib import Path
 
+from .batch import read_urls, run_batch
+from .budget import REASON_LABELS
+from .cache import HTTPCache
+from .connections import install_dns_cache, parse_host_pool_sizes
 from .downloader import Downloader
-from .parser import HTMLParser
-from .organizer import FileOrganizer
+from .metrics import MetricsRegistry
+from .pool import DownloadPool
+from .ratelimit import AdaptiveRateLimiter
+from .store import BlobStore
+from .workers import CPUPool
+from .web.tasks import generate_output_name, process_website
 
 
 def validate_url(ctx, param, value):
@@ -26,12 +36,190 @@ def validate_url(ctx, param, value):
         raise click.BadParameter(f"URL inválida: {e}")
 
 
-def generate_output_name(url: str) -> str:
-    """Gera nome do diretório de saída baseado no domínio e timestamp."""
-    parsed = urlparse(url)
-    domain = parsed.netloc.replace(":", "_")  # Remove : de portas
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    return f"{domain}_{timestamp}"
+def validate_host_pools(ctx, param, value):
+    """Converte as opções --host-pool (host=n) em um mapa host -> tamanho."""
+    try:
+        return parse_host_pool_sizes(','.join(value))
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def print_progress():
+    """
+    Cria o callback de progresso que imprime cada etapa no terminal.
+    
+    Ignora as atualizações de contagem (ex: "Baixando CSS... 3/10") para
+    não poluir a saída.
+    """
+    counter = re.compile(r'\.\.\. \d+(/\d+)?$')
+    last = {'message': None}
+    
+    def callback(data):
+        message = data['message']
+        if message == last['message'] or counter.search(message) or data['step_status'] != 'current':
+            return
+        last['message'] = message
+        click.echo(f"[+] {message}")
+    
+    return callback
+
+
+def save_stats(path: str, result: dict, registry: MetricsRegistry):
+    """Grava as estatísticas da cópia (--stats) em JSON."""
+    stats = {
+        'url': result['url'],
+        'success': result['success'],
+        **result['stats'],
+        'metrics': registry.snapshot(),
+    }
+    text = json.dumps(stats, indent=2, ensure_ascii=False)
+    if path == '-':
+        click.echo(text)
+    else:
+        Path(path).write_text(text, encoding='utf-8')
+        click.echo(f"[>] Estatisticas salvas em: {path}")
+
+
+def print_profile(profile: dict, top: int = 5):
+    """Mostra onde o perfil (--profile) foi salvo e as funções mais caras."""
+    if 'error' in profile:
+        click.echo(f"[!] {profile['error']}", err=True)
+        return
+    click.echo(f"[>] Perfil salvo em: {profile['path']}")
+    for row in profile['hot_functions'][:top]:
+        click.echo(f"    {row['cumulative']:8.3f}s  {row['calls']:>7}x  {row['function']}")
+    if profile['memory']:
+        click.echo(f"    Pico de memoria (tracemalloc): {profile['memory']['peak_mb']} MB")
+
+
+# Opções comuns a webcopy e webcopy-batch: downloads e cache
+DOWNLOAD_OPTIONS = [
+    click.option(
+        "--workers", "-w",
+        type=int,
+        help="Número de downloads simultâneos (padrão: 8; 64 com --async)"
+    ),
+    click.option(
+        "--per-host",
+        type=int,
+        help="Máximo de conexões simultâneas por host (padrão: 6; 32 com --async)"
+    ),
+    click.option(
+        "--async", "use_async",
+        is_flag=True,
+        help="Baixa assets com asyncio + HTTP/2 (requer httpx[http2])"
+    ),
+    click.option(
+        "--cache-dir",
+        default=None,
+        type=click.Path(file_okay=False),
+        help="Diretório do cache HTTP (padrão: ~/.cache/webcopy/http)"
+    ),
+    click.option(
+        "--cache-size",
+        default=1024,
+        show_default=True,
+        help="Tamanho máximo do cache HTTP em MB"
+    ),
+    click.option(
+        "--no-cache",
+        is_flag=True,
+        help="Desativa o cache HTTP persistente"
+    ),
+    click.option(
+        "--dedup",
+        is_flag=True,
+        help="Guarda assets uma única vez em <output-dir>/.store (hardlinks)"
+    ),
+]
+
+# Opções comuns a webcopy e webcopy-batch: formato, rede e orçamento
+COPY_OPTIONS = [
+    click.option(
+        "--html-parser",
+        type=click.Choice(["html.parser", "lxml"]),
+        default="html.parser",
+        show_default=True,
+        help="Parser HTML (lxml é mais rápido em páginas grandes)"
+    ),
+    click.option(
+        "--format", "output_format",
+        type=click.Choice(["dir", "zip", "tar"]),
+        default="dir",
+        show_default=True,
+        help="Salva a cópia como diretório ou direto em um arquivo ZIP/tar"
+    ),
+    click.option(
+        "--host-pool",
+        multiple=True,
+        callback=validate_host_pools,
+        metavar="HOST=N",
+        help="Conexões mantidas para um host específico (pode repetir)"
+    ),
+    click.option(
+        "--dns-ttl",
+        default=300,
+        show_default=True,
+        help="Tempo em segundos que as resoluções DNS ficam em cache (0 desativa)"
+    ),
+    click.option(
+        "--rate",
+        default=0.0,
+        show_default=True,
+        help="Requisições por segundo a cada host no início, ajustada pelas respostas (0 = sem limite até o host reclamar)"
+    ),
+    click.option(
+        "--max-rate",
+        default=0.0,
+        show_default=True,
+        help="Máximo de requisições por segundo a cada host (0 = sem teto)"
+    ),
+    click.option(
+        "--deadline",
+        default=0.0,
+        show_default=True,
+        help="Prazo em segundos para os assets de segundo plano (0 = sem prazo)"
+    ),
+    click.option(
+        "--max-mb",
+        default=0.0,
+        show_default=True,
+        help="Total de MB de assets que a cópia pode baixar (0 = sem limite)"
+    ),
+    click.option(
+        "--asset-max-mb",
+        default=0.0,
+        show_default=True,
+        help="Tamanho máximo em MB de um único asset (0 = sem limite)"
+    ),
+    click.option(
+        "--max-assets",
+        default=0,
+        show_default=True,
+        help="Número máximo de assets baixados (0 = sem limite)"
+    ),
+    click.option(
+        "--time-limit",
+        default=0.0,
+        show_default=True,
+        help="Tempo máximo em segundos da cópia; ao fim dele a cópia é finalizada com o que já chegou (0 = sem limite)"
+    ),
+    click.option(
+        "--processes",
+        default=0,
+        show_default=True,
+        help="Processos para o parse e a reescrita de HTML/CSS (0 = no próprio processo; vale a pena em páginas grandes)"
+    ),
+]
+
+
+def with_options(options):
+    """Aplica uma lista de opções do click a um comando, na ordem da lista."""
+    def decorator(func):
+        for option in reversed(options):
+            func = option(func)
+        return func
+    return decorator
 
 
 @click.command()
@@ -46,7 +234,55 @@ def generate_output_name(url: str) -> str:
     default="output",
     help="Diretório base para salvar os sites (padrão: output)"
 )
-def main(url: str, output: str, output_dir: str):
+@with_options(DOWNLOAD_OPTIONS)
+@click.option(
+    "--depth",
+    default=0,
+    show_default=True,
+    help="Profundidade de links a seguir (0 = copia só a página)"
+)
+@click.option(
+    "--max-pages",
+    default=50,
+    show_default=True,
+    help="Número máximo de páginas copiadas com --depth"
+)
+@click.option(
+    "--path-prefix",
+    default=None,
+    help="Segue apenas links cujo caminho começa com este prefixo (ex: /docs/)"
+)
+@click.option(
+    "--any-origin",
+    is_flag=True,
+    help="Segue também links para outros hosts"
+)
+@click.option(
+    "--page-delay",
+    default=0.5,
+    show_default=True,
+    help="Intervalo mínimo em segundos entre páginas do mesmo host"
+)
+@with_options(COPY_OPTIONS)
+@click.option(
+    "--stats",
+    "stats_path",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    metavar="ARQUIVO",
+    help="Grava em JSON o tempo de cada etapa e as fases de cada download (- para a saída padrão)"
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Mede a cópia com cProfile e tracemalloc e salva o perfil ao lado da saída (mais lento)"
+)
+def main(url: str, output: str, output_dir: str, workers: int, per_host: int,
+         use_async: bool, cache_dir: str, cache_size: int, no_cache: bool,
+         dedup: bool, depth: int, max_pages: int, path_prefix: str,
+         any_origin: bool, page_delay: float, html_parser: str, output_format: str,
+         host_pool: dict, dns_ttl: int, rate: float, max_rate: float, deadline: float,
+         max_mb: float, asset_max_mb: float, max_assets: int, time_limit: float,
+         processes: int, stats_path: str, profile: bool):
     """
     WebCopy - Faz cópia organizada de páginas web.
     
@@ -58,6 +294,10 @@ def main(url: str, output: str, output_dir: str):
         webcopy https://example.com
         
         webcopy https://example.com --output meu-site
+        
+        webcopy https://example.com/docs/ --depth 3 --path-prefix /docs/
+        
+        webcopy https://example.com --format zip
     """
     click.echo(f"[WebCopy] Iniciando copia de: {url}")
     click.echo()
@@ -71,118 +311,224 @@ def main(url: str, output: str, output_dir: str):
     # Cria o caminho completo
     base_path = Path(output_dir)
     site_path = base_path / site_dir_name
+    cpu_pool = None
     
     try:
-        # Inicializa os módulos
-        downloader = Downloader()
-        parser = HTMLParser(url)
-        organizer = FileOrganizer(site_path)
+        cache = None if no_cache else HTTPCache(cache_dir, max_size=cache_size * 1024 * 1024)
+        store = BlobStore(base_path / '.store') if dedup else None
+        rate_limiter = AdaptiveRateLimiter(rate=rate or None, max_rate=max_rate or None)
+        if dns_ttl > 0:
+            install_dns_cache(dns_ttl)
+        registry = MetricsRegistry() if stats_path else None
+        if processes > 0:
+            cpu_pool = CPUPool(processes)
         
-        # 1. Baixa o HTML principal
-        click.echo("[+] Baixando pagina principal...")
-        html_content = downloader.download_text(url)
+        result = process_website(
+            url,
+            output_dir=output_dir,
+            output_name=site_dir_name,
+            progress_callback=print_progress(),
+            max_workers=workers,
+            per_host_limit=per_host,
+            use_async=use_async,
+            cache=cache,
+            store=store,
+            max_depth=depth,
+            max_pages=max_pages,
+            same_origin=not any_origin,
+            path_prefix=path_prefix,
+            page_delay=page_delay,
+            html_parser=html_parser,
+            output_format=output_format,
+            host_pool_sizes=host_pool,
+            rate_limiter=rate_limiter,
+            deadline=deadline or None,
+            max_bytes=int(max_mb * 1024 * 1024),
+            max_asset_bytes=int(asset_max_mb * 1024 * 1024),
+            max_assets=max_assets,
+            time_limit=time_limit,
+            metrics=registry,
+            collect_stats=bool(stats_path),
+            profile=profile,
+            cpu_pool=cpu_pool
+        )
         
-        if not html_content:
-            click.echo("[ERRO] Nao foi possivel baixar a pagina.", err=True)
+        if not result['success']:
+            click.echo(f"[ERRO] {result['error']}", err=True)
+            if 'profile' in result:
+                print_profile(result['profile'])
+            if stats_path:
+                save_stats(stats_path, result, registry)
             sys.exit(1)
         
-        # 2. Faz parse do HTML e extrai URLs de assets
-        click.echo("[+] Analisando pagina e extraindo assets...")
-        assets = parser.extract_assets(html_content)
-        
-        click.echo(f"    Encontrados: {len(assets['css'])} CSS, {len(assets['js'])} JS, "
-                   f"{len(assets['images'])} imagens, {len(assets['fonts'])} fontes, "
-                   f"{len(assets['other'])} outros")
-        
-        # 3. Cria estrutura de diretórios
-        organizer.create_structure()
-        
-        # 4. Baixa e salva cada asset
-        url_map = {}  # Mapeia URL original -> caminho local
-        
-        # Baixa CSS
-        if assets['css']:
-            click.echo("[+] Baixando arquivos CSS...")
-            for css_url in assets['css']:
-                content = downloader.download_bytes(css_url)
-                if content:
-                    local_path = organizer.save_css(css_url, content)
-                    url_map[css_url] = local_path
-                    
-                    # Extrai assets de dentro do CSS
-                    css_text = content.decode('utf-8', errors='ignore')
-                    css_assets = parser.extract_css_urls(css_text, css_url)
-                    
-                    for asset_url in css_assets:
-                        if asset_url not in url_map:
-                            asset_content = downloader.download_bytes(asset_url)
-                            if asset_content:
-                                asset_local = organizer.save_asset(asset_url, asset_content)
-                                url_map[asset_url] = asset_local
-        
-        # Baixa JavaScript
-        if assets['js']:
-            click.echo("[+] Baixando arquivos JavaScript...")
-            for js_url in assets['js']:
-                content = downloader.download_bytes(js_url)
-                if content:
-                    local_path = organizer.save_js(js_url, content)
-                    url_map[js_url] = local_path
-        
-        # Baixa imagens
-        if assets['images']:
-            click.echo("[+] Baixando imagens...")
-            for img_url in assets['images']:
-                content = downloader.download_bytes(img_url)
-                if content:
-                    local_path = organizer.save_image(img_url, content)
-                    url_map[img_url] = local_path
-        
-        # Baixa fontes
-        if assets['fonts']:
-            click.echo("[+] Baixando fontes...")
-            for font_url in assets['fonts']:
-                content = downloader.download_bytes(font_url)
-                if content:
-                    local_path = organizer.save_font(font_url, content)
-                    url_map[font_url] = font_url
-        
-        # Baixa outros assets
-        if assets['other']:
-            click.echo("[+] Baixando outros recursos...")
-            for other_url in assets['other']:
-                content = downloader.download_bytes(other_url)
-                if content:
-                    local_path = organizer.save_other(other_url, content)
-                    url_map[other_url] = local_path
-        
-        # 5. Reescreve URLs no HTML
-        click.echo("[+] Reescrevendo URLs no HTML...")
-        if url_map:
-            modified_html = parser.rewrite_html_urls(html_content, url_map)
+        click.echo()
+        click.echo(f"[OK] Copia concluida com sucesso!")
+        if result['pages'] > 1:
+            click.echo(f"[>] Paginas copiadas: {result['pages']}")
+        connections = result.get('connections')
+        if connections and connections['requests']:
+            click.echo(
+                f"[>] Conexoes: {connections['connections']} abertas para "
+                f"{connections['requests']} requisicoes "
+                f"(reuso {connections['reuse_ratio']:.0%})"
+            )
+        if result.get('skipped'):
+            reasons = {}
+            for reason in result['skipped'].values():
+                reasons[reason] = reasons.get(reason, 0) + 1
+            click.echo(f"[>] Copia parcial: {len(result['skipped'])} assets ignorados")
+            for reason, count in reasons.items():
+                click.echo(f"    {REASON_LABELS.get(reason, reason)}: {count}")
+        if result.get('css_cycles'):
+            click.echo(f"[!] Ciclos de @import entre CSS: {len(result['css_cycles'])}")
+        throttled = sum(origin['throttled'] for origin in rate_limiter.stats().values())
+        if throttled:
+            click.echo(f"[>] Respostas 429/503 (ritmo reduzido): {throttled}")
+        if output_format == 'dir':
+            click.echo(f"[>] Arquivos salvos em: {site_path.absolute()}")
+            click.echo()
+            click.echo("Para visualizar, abra o arquivo index.html no navegador.")
         else:
-            # Se não há assets, usa HTML original sem modificações
-            modified_html = html_content
+            click.echo(f"[>] Arquivo salvo em: {result['output_path']}")
+        if 'profile' in result:
+            print_profile(result['profile'])
         
-        # 6. Reescreve URLs nos arquivos CSS
-        click.echo("[+] Reescrevendo URLs nos arquivos CSS...")
-        organizer.rewrite_css_urls(url_map)
+        # Por último: com "--stats -", o JSON fecha a saída
+        if stats_path:
+            save_stats(stats_path, result, registry)
         
-        # 7. Salva o HTML final
-        organizer.save_html(modified_html)
+    except KeyboardInterrupt:
+        click.echo("\n[!] Operacao cancelada pelo usuario.", err=True)
+        sys.exit(130)
+    except Exception as e:
+        click.echo(f"[ERRO] {e}", err=True)
+        sys.exit(1)
+    finally:
+        if cpu_pool is not None:
+            cpu_pool.shutdown()
+
+
+@click.command()
+@click.argument("urls_file", metavar="ARQUIVO", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--output", "-o",
+    default=None,
+    help="Nome do diretório do lote (padrão: batch_<data>)"
+)
+@click.option(
+    "--output-dir", "-d",
+    default="output",
+    help="Diretório base para salvar os lotes (padrão: output)"
+)
+@click.option(
+    "--concurrency", "-j",
+    default=4,
+    show_default=True,
+    help="Número de URLs copiadas ao mesmo tempo"
+)
+@with_options(DOWNLOAD_OPTIONS)
+@with_options(COPY_OPTIONS)
+def batch(urls_file, output: str, output_dir: str, concurrency: int, workers: int,
+          per_host: int, use_async: bool, cache_dir: str, cache_size: int, no_cache: bool,
+          dedup: bool, html_parser: str, output_format: str, host_pool: dict, dns_ttl: int,
+          rate: float, max_rate: float, deadline: float, max_mb: float, asset_max_mb: float,
+          max_assets: int, time_limit: float, processes: int):
+    """
+    WebCopy em lote - Copia muitas URLs em um único processo.
+    
+    Lê as URLs de ARQUIVO (uma por linha; - para a entrada padrão; linhas
+    vazias e com # são ignoradas) e copia até --concurrency delas ao mesmo
+    tempo, com a mesma sessão HTTP, cache de DNS, cache HTTP e (com
+    --dedup) BlobStore. Cada URL vai para <lote>/<posição>_<host> e o
+    resultado de cada uma para <lote>/manifest.jsonl. O orçamento
+    (--max-mb, --time-limit...) vale para cada URL.
+    
+    Exemplo:
+    
+        webcopy-batch urls.txt -j 8
         
-        click.echo()
-        click.echo(f"[OK] Copia concluida com sucesso!")
-        click.echo(f"[>] Arquivos salvos em: {site_path.absolute()}")
-        click.echo()
-        click.echo("Para visualizar, abra o arquivo index.html no navegador.")
+        cat urls.txt | webcopy-batch - --dedup --time-limit 120
+    """
+    urls = read_urls(urls_file)
+    if not urls:
+        click.echo("[ERRO] Nenhuma URL encontrada", err=True)
+        sys.exit(1)
+    
+    base_path = Path(output_dir)
+    batch_path = base_path / (output or datetime.now().strftime("batch_%Y-%m-%d_%H-%M-%S"))
+    click.echo(f"[WebCopy] Lote de {len(urls)} URLs, {concurrency} por vez")
+    click.echo()
+    
+    done = {'count': 0}
+    
+    def report(entry):
+        done['count'] += 1
+        status = 'ok' if entry['success'] else f"ERRO: {entry['error']}"
+        click.echo(f"[{done['count']}/{len(urls)}] {entry['url']} ({entry['seconds']:.1f}s) {status}")
+    
+    cpu_pool = None
+    try:
+        cache = None if no_cache else HTTPCache(cache_dir, max_size=cache_size * 1024 * 1024)
+        store = BlobStore(base_path / '.store') if dedup else None
+        if dns_ttl > 0:
+            install_dns_cache(dns_ttl)
+        if processes > 0:
+            cpu_pool = CPUPool(processes)
         
+        summary = run_batch(
+            urls,
+            str(batch_path),
+            concurrency=concurrency,
+            on_result=report,
+            max_workers=workers,
+            per_host_limit=per_host,
+            use_async=use_async,
+            cache=cache,
+            store=store,
+            session=Downloader.create_session(
+                pool_maxsize=concurrency * (per_host or DownloadPool.DEFAULT_PER_HOST),
+                host_pool_sizes=host_pool
+            ),
+            rate_limiter=AdaptiveRateLimiter(rate=rate or None, max_rate=max_rate or None),
+            html_parser=html_parser,
+            output_format=output_format,
+            deadline=deadline or None,
+            max_bytes=int(max_mb * 1024 * 1024),
+            max_asset_bytes=int(asset_max_mb * 1024 * 1024),
+            max_assets=max_assets,
+            time_limit=time_limit,
+            cpu_pool=cpu_pool
+        )
     except KeyboardInterrupt:
         click.echo("\n[!] Operacao cancelada pelo usuario.", err=True)
         sys.exit(130)
     except Exception as e:
         click.echo(f"[ERRO] {e}", err=True)
         sys.exit(1)
+    finally:
+        if cpu_pool is not None:
+            cpu_pool.shutdown()
+    
+    click.echo()
+    click.echo(
+        f"[OK] {summary['succeeded']} de {summary['total']} URLs copiadas "
+        f"em {summary['seconds']:.1f}s"
+    )
+    if summary['partial']:
+        click.echo(f"[>] Copias parciais (orcamento esgotado): {summary['partial']}")
+    if summary['failed']:
+        click.echo(f"[!] Falhas: {summary['failed']}")
+    connections = summary['connections']
+    if connections['requests']:
+        click.echo(
+            f"[>] Conexoes: {connections['connections']} abertas para "
+            f"{connections['requests']} requisicoes "
+            f"(reuso {connections['reuse_ratio']:.0%})"
+        )
+    click.echo(f"[>] Manifesto: {summary['manifest']}")
+    
+    if summary['failed']:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
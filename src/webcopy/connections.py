@@ -0,0 +1,326 @@
+"""
+Connections Module - Pool de conexões HTTP por host, keep-alive e cache de DNS.
+"""
+
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.poolmanager import PoolManager
+
+
+# Mantém conexões ociosas vivas (e detecta conexões mortas) no nível do TCP
+KEEPALIVE_SOCKET_OPTIONS = list(HTTPConnection.default_socket_options) + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+if hasattr(socket, 'TCP_KEEPIDLE'):
+    KEEPALIVE_SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4),
+    ]
+
+
+# Segundos gastos pela thread atual resolvendo nomes (com o DNSCache
+# instalado) e abrindo conexões (TCP + TLS, incluindo o DNS)
+_connect_times = threading.local()
+
+
+def _add_connect_time(phase: str, seconds: float):
+    setattr(_connect_times, phase, getattr(_connect_times, phase, 0.0) + seconds)
+
+
+def reset_connect_times():
+    """Zera os tempos de DNS e de conexão da thread atual."""
+    _connect_times.dns = 0.0
+    _connect_times.connect = 0.0
+
+
+def connect_times() -> Tuple[float, float]:
+    """
+    Tempos da thread atual desde reset_connect_times().
+    
+    Returns:
+        Tupla (dns, conexão). O tempo de conexão inclui o DNS; sem o
+        DNSCache instalado, o DNS não é medido separadamente (fica 0).
+    """
+    return getattr(_connect_times, 'dns', 0.0), getattr(_connect_times, 'connect', 0.0)
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """HTTPConnection que mede o tempo de abertura da conexão."""
+    
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time('connect', time.perf_counter() - started)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """HTTPSConnection que mede o tempo de abertura da conexão (TCP + TLS)."""
+    
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time('connect', time.perf_counter() - started)
+
+
+def parse_host_pool_sizes(value: Optional[str]) -> Dict[str, int]:
+    """
+    Lê tamanhos de pool por host no formato "host=n,host=n".
+    
+    Args:
+        value: Texto (ex: "cdn.example.com=32,img.example.com=16").
+        
+    Returns:
+        Mapa host -> tamanho do pool.
+        
+    Raises:
+        ValueError: Se algum item não estiver no formato host=n.
+    """
+    sizes = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, size = item.partition('=')
+        if not host or not size.strip().isdigit():
+            raise ValueError(f'Tamanho de pool inválido: {item!r} (use host=n)')
+        sizes[host.strip().lower()] = int(size)
+    return sizes
+
+
+class HostPoolManager(PoolManager):
+    """
+    PoolManager com tamanho de pool configurável por host, estatísticas
+    de reaproveitamento de conexões e medição do tempo de conexão (veja
+    connect_times()).
+    """
+    
+    def __init__(self, *args, host_maxsize: Optional[Dict[str, int]] = None, **kwargs):
+        """
+        Args:
+            host_maxsize: Tamanho do pool de hosts específicos (os demais
+                usam o maxsize padrão).
+        """
+        super().__init__(*args, **kwargs)
+        self.host_maxsize = {host.lower(): size for host, size in (host_maxsize or {}).items()}
+        
+        # Contadores de pools já descartados (LRU de num_pools hosts)
+        self._retired = {'requests': 0, 'connections': 0, 'tls_connections': 0}
+        self._retired_lock = threading.Lock()
+        self.pools.dispose_func = self._dispose_pool
+    
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if request_context is None:
+            request_context = self.connection_pool_kw.copy()
+        maxsize = self.host_maxsize.get(host.lower())
+        if maxsize:
+            request_context = dict(request_context, maxsize=maxsize)
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.ConnectionCls = TimedHTTPSConnection if scheme == 'https' else TimedHTTPConnection
+        return pool
+    
+    def _dispose_pool(self, pool):
+        """Guarda os contadores de um pool antes de fechá-lo."""
+        with self._retired_lock:
+            self._count(pool, self._retired)
+        pool.close()
+    
+    @staticmethod
+    def _count(pool, totals: Dict[str, int]):
+        totals['requests'] += pool.num_requests
+        totals['connections'] += pool.num_connections
+        if pool.scheme == 'https':
+            totals['tls_connections'] += pool.num_connections
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Estatísticas acumuladas de todos os pools.
+        
+        Returns:
+            Dict com 'requests' (requisições feitas), 'connections'
+            (conexões abertas), 'tls_connections' (conexões HTTPS, isto é,
+            handshakes TLS), 'reused' (requisições que reaproveitaram uma
+            conexão) e 'hosts' (pools ativos).
+        """
+        with self._retired_lock:
+            totals = dict(self._retired)
+        
+        hosts = 0
+        for key in self.pools.keys():
+            pool = self.pools.get(key)
+            if pool is not None:
+                self._count(pool, totals)
+                hosts += 1
+        
+        totals['reused'] = max(0, totals['requests'] - totals['connections'])
+        totals['hosts'] = hosts
+        return totals
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter que usa o HostPoolManager e ativa keep-alive do TCP."""
+    
+    def __init__(self, host_pool_sizes: Optional[Dict[str, int]] = None,
+                 keepalive: bool = True, **kwargs):
+        """
+        Args:
+            host_pool_sizes: Tamanho do pool de hosts específicos.
+            keepalive: Ativa SO_KEEPALIVE nas conexões.
+            **kwargs: Argumentos do HTTPAdapter (pool_connections,
+                pool_maxsize, max_retries, pool_block).
+        """
+        self.host_pool_sizes = host_pool_sizes or {}
+        self.keepalive = keepalive
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.keepalive:
+            pool_kwargs.setdefault('socket_options', KEEPALIVE_SOCKET_OPTIONS)
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = HostPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            host_maxsize=self.host_pool_sizes,
+            **pool_kwargs
+        )
+    
+    def stats(self) -> Dict[str, int]:
+        """Estatísticas de conexões (veja HostPoolManager.stats)."""
+        return self.poolmanager.stats()
+
+
+def connection_stats(session: requests.Session) -> Dict[str, Any]:
+    """
+    Soma as estatísticas de conexões dos adapters de uma sessão.
+    
+    Returns:
+        Dict como HostPoolManager.stats(), mais 'reuse_ratio' (fração das
+        requisições que não precisaram abrir conexão).
+    """
+    totals = {'requests': 0, 'connections': 0, 'tls_connections': 0, 'reused': 0, 'hosts': 0}
+    seen = set()
+    for adapter in session.adapters.values():
+        if not isinstance(adapter, PooledHTTPAdapter) or id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        for key, value in adapter.stats().items():
+            totals[key] += value
+    
+    totals['reuse_ratio'] = round(totals['reused'] / totals['requests'], 3) if totals['requests'] else 0.0
+    return totals
+
+
+class DNSCache:
+    """
+    Cache de resolução de nomes (socket.getaddrinfo) com tempo de vida.
+    
+    Instalado com install(), vale para o processo inteiro: requests e httpx
+    deixam de consultar o resolvedor a cada conexão nova ao mesmo host.
+    Falhas de resolução não são guardadas.
+    """
+    
+    def __init__(self, ttl: float = 300, max_entries: int = 1024):
+        """
+        Args:
+            ttl: Tempo de vida (segundos) de cada resolução.
+            max_entries: Número máximo de nomes guardados.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._resolve = socket.getaddrinfo
+        self._installed = False
+    
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Substituto de socket.getaddrinfo com cache."""
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return list(entry[1])
+        
+        started = time.perf_counter()
+        result = self._resolve(host, port, family, type, proto, flags)
+        _add_connect_time('dns', time.perf_counter() - started)
+        
+        with self._lock:
+            self.misses += 1
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        return list(result)
+    
+    def install(self):
+        """Passa a usar o cache em socket.getaddrinfo."""
+        if not self._installed:
+            self._resolve = socket.getaddrinfo
+            socket.getaddrinfo = self.getaddrinfo
+            self._installed = True
+    
+    def uninstall(self):
+        """Restaura o socket.getaddrinfo original."""
+        if self._installed:
+            socket.getaddrinfo = self._resolve
+            self._installed = False
+    
+    def clear(self):
+        """Descarta as resoluções guardadas."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Acertos, falhas e número de nomes guardados."""
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_dns_cache: Optional[DNSCache] = None
+_dns_lock = threading.Lock()
+
+
+def install_dns_cache(ttl: float = 300) -> DNSCache:
+    """
+    Instala o cache de DNS do processo (uma única vez).
+    
+    Args:
+        ttl: Tempo de vida das resoluções (usado na primeira chamada).
+        
+    Returns:
+        O DNSCache instalado.
+    """
+    global _dns_cache
+    with _dns_lock:
+        if _dns_cache is None:
+            _dns_cache = DNSCache(ttl)
+            _dns_cache.install()
+        return _dns_cache
+
+
+def get_dns_cache() -> Optional[DNSCache]:
+    """Retorna o cache de DNS instalado, se houver."""
+    return _dns_cache
@@ -0,0 +1,186 @@
+"""
+Crawler Module - Rastreamento de múltiplas páginas de um site.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .downloader import Downloader
+from .parser import HTMLParser
+
+
+class HostRateLimiter:
+    """Garante um intervalo mínimo entre requisições ao mesmo host."""
+    
+    def __init__(self, min_interval: float = 0.5):
+        """
+        Args:
+            min_interval: Intervalo mínimo em segundos entre requisições
+                a um mesmo host.
+        """
+        self.min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def wait(self, url: str):
+        """Bloqueia até que uma nova requisição ao host da URL seja permitida."""
+        if self.min_interval <= 0:
+            return
+        
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Crawler:
+    """
+    Descobre as páginas de um site a partir de uma página inicial.
+    
+    Percorre os links <a href> em largura (nível por nível), baixando as
+    páginas de cada nível em paralelo. A fronteira ignora URLs já vistas,
+    fora do escopo (mesma origem e prefixo de caminho) ou que não parecem
+    páginas HTML. A ordem das páginas retornadas é determinística.
+    
+    Se o downloader tiver um JobBudget com tempo máximo, o rastreamento
+    para quando o tempo acaba e segue com as páginas já obtidas.
+    """
+    
+    # Extensões tratadas como páginas (sem extensão também conta)
+    PAGE_EXTENSIONS = {'', '.html', '.htm', '.xhtml', '.shtml', '.php', '.asp', '.aspx', '.jsp'}
+    
+    def __init__(
+        self,
+        start_url: str,
+        downloader: Downloader,
+        max_depth: int = 1,
+        max_pages: int = 50,
+        same_origin: bool = True,
+        path_prefix: Optional[str] = None,
+        page_workers: int = 4,
+        page_delay: float = 0.5,
+        html_parser: str = 'html.parser'
+    ):
+        """
+        Inicializa o crawler.
+        
+        Args:
+            start_url: URL da página inicial.
+            downloader: Downloader usado para baixar as páginas.
+            max_depth: Profundidade máxima de links a seguir (0 = só a inicial).
+            max_pages: Número máximo de páginas (incluindo a inicial).
+            same_origin: Segue apenas links do mesmo esquema/host da inicial.
+            path_prefix: Segue apenas links cujo caminho começa com este prefixo.
+            page_workers: Número de páginas baixadas em paralelo.
+            page_delay: Intervalo mínimo (segundos) entre páginas do mesmo host.
+            html_parser: Parser do BeautifulSoup ('html.parser' ou 'lxml').
+        """
+        self.start_url = start_url
+        self.downloader = downloader
+        self.max_depth = max(0, max_depth)
+        self.max_pages = max(1, max_pages)
+        self.same_origin = same_origin
+        self.path_prefix = path_prefix
+        self.page_workers = max(1, page_workers)
+        self.rate_limiter = HostRateLimiter(page_delay)
+        self.html_parser = html_parser
+        
+        # Parser de cada página, com a árvore já montada para extrair os assets
+        self.parsers: Dict[str, HTMLParser] = {}
+        
+        start = urlparse(start_url)
+        self._origin = (start.scheme, start.netloc.lower())
+    
+    def in_scope(self, url: str) -> bool:
+        """Verifica se uma URL deve ser rastreada."""
+        parsed = urlparse(url)
+        
+        if parsed.scheme not in ('http', 'https'):
+            return False
+        
+        if self.same_origin and (parsed.scheme, parsed.netloc.lower()) != self._origin:
+            return False
+        
+        if self.path_prefix and not parsed.path.startswith(self.path_prefix):
+            return False
+        
+        path = parsed.path.lower()
+        last_segment = path.rsplit('/', 1)[-1]
+        ext = '.' + last_segment.rsplit('.', 1)[-1] if '.' in last_segment else ''
+        return ext in self.PAGE_EXTENSIONS
+    
+    def _expired(self) -> bool:
+        """Verifica se o tempo do job acabou."""
+        budget = self.downloader.budget
+        return budget is not None and budget.expired()
+    
+    def _fetch(self, url: str) -> Optional[str]:
+        """Baixa uma página respeitando o intervalo por host."""
+        self.rate_limiter.wait(url)
+        if self._expired():
+            return None
+        return self.downloader.download_text(url)
+    
+    def crawl(
+        self,
+        start_html: str,
+        on_page: Optional[Callable[[str, int], None]] = None
+    ) -> Dict[str, str]:
+        """
+        Rastreia o site.
+        
+        Args:
+            start_html: HTML já baixado da página inicial.
+            on_page: Callback chamado a cada página obtida (url, total).
+            
+        Returns:
+            Dicionário URL -> HTML de cada página, começando pela inicial
+            (com a URL exatamente como recebida), na ordem de descoberta.
+        """
+        pages: Dict[str, str] = {self.start_url: start_html}
+        seen = {HTMLParser.strip_fragment(self.start_url)}
+        level: List[Tuple[str, str]] = [(self.start_url, start_html)]
+        
+        if on_page:
+            on_page(self.start_url, len(pages))
+        
+        with ThreadPoolExecutor(max_workers=self.page_workers,
+                                thread_name_prefix='webcopy-crawl') as executor:
+            for _ in range(self.max_depth):
+                if self._expired():
+                    break
+                
+                # Próximo nível da fronteira, na ordem das páginas e dos links
+                frontier = []
+                for page_url, html in level:
+                    parser = self.parsers.get(page_url)
+                    if parser is None:
+                        parser = self.parsers[page_url] = HTMLParser(page_url, self.html_parser)
+                    for link in parser.extract_links(html):
+                        if link in seen or not self.in_scope(link):
+                            continue
+                        if len(seen) >= self.max_pages:
+                            break
+                        seen.add(link)
+                        frontier.append(link)
+                
+                if not frontier:
+                    break
+                
+                level = []
+                for link, html in zip(frontier, executor.map(self._fetch, frontier)):
+                    if html:
+                        pages[link] = html
+                        level.append((link, html))
+                        if on_page:
+                            on_page(link, len(pages))
+        
+        return pages
@@ -0,0 +1,197 @@
+"""
+CSS Graph Module - Referências dentro de CSS (@import, url(), image-set()) e
+grafo de dependências entre folhas de estilo.
+"""
+
+import re
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+
+# Comentários são pulados; @import aceita url() ou string solta
+# (@import "a.css" screen;), url() aceita aspas ou não, e image-set() pode
+# listar strings soltas ("a.png" 1x), tratadas em _image_set_strings()
+_REF_PATTERN = re.compile(
+    r'/\*.*?\*/'
+    r'|@import\s+(?P<import>url\(\s*(?P<q1>["\']?)(?P<u1>[^"\')\s]+)(?P=q1)\s*\)'
+    r'|(?P<q2>["\'])(?P<u2>[^"\'\s]+)(?P=q2))'
+    r'|(?P<url>url\(\s*(?P<q3>["\']?)(?P<u3>[^"\')\s]+)(?P=q3)\s*\))'
+    r'|(?P<set>(?:-webkit-)?image-set\()',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+class CSSRef(NamedTuple):
+    """Uma URL dentro de um CSS."""
+    
+    kind: str   # 'import', 'url' ou 'image-set'
+    url: str    # valor como está no CSS (sem aspas)
+    start: int  # trecho do CSS ocupado pela referência (url(...) ou "...")
+    end: int
+
+
+def _image_set_strings(css: str, pos: int) -> Iterable[CSSRef]:
+    """Strings soltas de um image-set() cujo conteúdo começa em pos."""
+    depth = 0
+    while pos < len(css):
+        char = css[pos]
+        if char in '"\'':
+            end = css.find(char, pos + 1)
+            if end < 0:
+                return
+            # Strings dentro de url() e type() já são tratadas (ou ignoradas)
+            if depth == 0:
+                yield CSSRef('image-set', css[pos + 1:end], pos, end + 1)
+            pos = end + 1
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                return
+            depth -= 1
+        pos += 1
+
+
+def css_refs(css: str) -> List[CSSRef]:
+    """
+    Encontra as URLs de um CSS.
+    
+    Args:
+        css: Conteúdo CSS (arquivo, bloco <style> ou atributo style).
+        
+    Returns:
+        Referências na ordem em que aparecem.
+    """
+    refs = []
+    pos = 0
+    while True:
+        match = _REF_PATTERN.search(css, pos)
+        if match is None:
+            break
+        if match.group('import'):
+            refs.append(CSSRef('import', match.group('u1') or match.group('u2'), *match.span('import')))
+        elif match.group('url'):
+            refs.append(CSSRef('url', match.group('u3'), *match.span('url')))
+        elif match.group('set'):
+            # Continua logo após o "(" para achar também os url() internos
+            refs.extend(_image_set_strings(css, match.end()))
+        pos = match.end()
+    
+    refs.sort(key=lambda ref: ref.start)
+    return refs
+
+
+def rewrite_css_refs(css: str, replace: Callable[[CSSRef], Optional[str]]) -> str:
+    """
+    Reescreve as URLs de um CSS.
+    
+    Cada referência substituída mantém a forma original: url("...") onde
+    havia url(), string onde havia string (@import "..." e image-set()).
+    
+    Args:
+        css: Conteúdo CSS.
+        replace: Recebe cada referência e retorna o novo valor, ou None para
+            mantê-la como está.
+            
+    Returns:
+        CSS reescrito (o próprio css se nada mudou).
+    """
+    parts = []
+    last = 0
+    for ref in css_refs(css):
+        value = replace(ref)
+        if value is None:
+            continue
+        parts.append(css[last:ref.start])
+        if css[ref.start:ref.start + 4].lower() == 'url(':
+            parts.append(f'url("{value}")')
+        else:
+            parts.append(f'"{value}"')
+        last = ref.end
+    
+    if not parts:
+        return css
+    parts.append(css[last:])
+    return ''.join(parts)
+
+
+class CSSGraph:
+    """
+    Grafo de @import entre as folhas de estilo de uma cópia.
+    
+    As folhas referenciadas pelo HTML são as raízes (profundidade 0); cada
+    @import novo fica um nível abaixo de quem o importou. Folhas já vistas
+    não são baixadas de novo, então ciclos (a.css importa b.css, que importa
+    a.css) não travam a cópia: são apenas registrados em cycles(). Cadeias
+    mais fundas que max_depth (ex: URLs geradas a cada import) são cortadas.
+    """
+    
+    def __init__(self, roots: Iterable[str] = (), max_depth: int = 16):
+        """
+        Args:
+            roots: URLs das folhas referenciadas pelo HTML.
+            max_depth: Profundidade máxima de @import seguida.
+        """
+        self.max_depth = max_depth
+        self.depth: Dict[str, int] = dict.fromkeys(roots, 0)
+        self.imports: Dict[str, List[str]] = {}
+        self.too_deep: List[str] = []
+    
+    def __contains__(self, url: str) -> bool:
+        return url in self.depth
+    
+    def add(self, css_url: str, imports: Iterable[str]) -> List[str]:
+        """
+        Registra os @import de uma folha.
+        
+        Args:
+            css_url: URL da folha.
+            imports: URLs (absolutas) que ela importa.
+            
+        Returns:
+            Folhas novas a baixar, na ordem em que foram importadas.
+        """
+        self.imports[css_url] = list(dict.fromkeys(imports))
+        depth = self.depth.setdefault(css_url, 0) + 1
+        
+        new = []
+        for url in self.imports[css_url]:
+            if url in self.depth:
+                continue
+            if depth > self.max_depth:
+                self.too_deep.append(url)
+                continue
+            self.depth[url] = depth
+            new.append(url)
+        return new
+    
+    def cycles(self) -> List[List[str]]:
+        """
+        Ciclos de @import.
+        
+        Returns:
+            Cada ciclo como a sequência de folhas, repetindo a primeira no
+            final (ex: [a.css, b.css, a.css]).
+        """
+        cycles = []
+        state: Dict[str, bool] = {}  # True = no caminho atual, False = concluída
+        
+        for root in self.imports:
+            if root in state:
+                continue
+            state[root] = True
+            path = [root]
+            stack = [iter(self.imports[root])]
+            
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    state[path.pop()] = False
+                    stack.pop()
+                elif state.get(child) is True:
+                    cycles.append(path[path.index(child):] + [child])
+                elif child not in state:
+                    state[child] = True
+                    path.append(child)
+                    stack.append(iter(self.imports.get(child, ())))
+        return cycles
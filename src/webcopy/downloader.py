@@ -2,14 +2,135 @@
 Downloader Module - Gerencia requisições HTTP para baixar páginas e assets.
 """
 
+import time
 import requests
-from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from typing import Optional
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple
 import click
 
+from .budget import BudgetExceeded, JobBudget
+from .cache import HTTPCache
+from .connections import PooledHTTPAdapter, connect_times, connection_stats, reset_connect_times
+from .metrics import JobMetrics, phase_timings
+from .organizer import AtomicWriter
+from .ratelimit import THROTTLE_STATUS, AdaptiveRateLimiter, parse_retry_after
 
-class Downloader:
+
+class DownloadCacheMixin:
+    """
+    Lógica de cache e revalidação compartilhada pelo Downloader e pelo
+    AsyncDownloader ao gravar assets direto no disco.
+    
+    Requer os atributos cache (HTTPCache ou None), budget (JobBudget ou
+    None), metrics (JobMetrics ou None) e _downloaded_urls.
+    """
+    
+    def _check_length(self, headers: Mapping[str, str]):
+        """Confere o Content-Length com o orçamento do job, se houver."""
+        if self.budget is not None:
+            self.budget.check_length(headers.get('Content-Length'))
+    
+    def _consume(self, writer: AtomicWriter, size: int):
+        """Contabiliza um bloco gravado no orçamento do job, se houver."""
+        if self.budget is not None:
+            try:
+                self.budget.consume(size, writer.size)
+            except BudgetExceeded:
+                # O asset é descartado pelo AtomicWriter: seus bytes não contam
+                self.budget.refund(writer.size)
+                raise
+    
+    def _prepare_request(self, url: str, path: Path, previous: Optional[Dict[str, Any]]
+                         ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Dict[str, str], bool]:
+        """
+        Decide como obter uma URL antes de acessar a rede.
+        
+        Returns:
+            Tupla (info, entrada_do_cache, headers_condicionais, usa_anterior).
+            Se info não for None, o arquivo já está pronto e nenhuma
+            requisição é necessária.
+        """
+        # Só revalida a cópia anterior se o arquivo ainda estiver lá
+        if previous and not Path(path).exists():
+            previous = None
+        
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and entry['fresh']:
+            if previous and previous.get('sha256') and previous['sha256'] == entry.get('sha256'):
+                return self._unchanged(url, previous, 'hit'), None, {}, False
+            info = self._copy_from_cache(url, entry, path, 'hit')
+            if info:
+                return info, None, {}, False
+            entry = None
+        
+        if previous and (previous.get('etag') or previous.get('last_modified')):
+            return None, entry, HTTPCache.conditional_headers(previous), True
+        
+        return None, entry, HTTPCache.conditional_headers(entry), False
+    
+    def _not_modified(self, url: str, path: Path, headers: Mapping[str, str],
+                      entry: Optional[Dict[str, Any]], previous: Optional[Dict[str, Any]],
+                      use_previous: bool) -> Optional[Dict[str, Any]]:
+        """Trata uma resposta 304."""
+        if use_previous:
+            return self._unchanged(url, previous, 'revalidated')
+        
+        if entry:
+            self.cache.refresh(url, headers)
+            return self._copy_from_cache(url, entry, path, 'revalidated')
+        
+        # 304 sem requisição condicional: não há corpo para gravar
+        return None
+    
+    def _downloaded(self, url: str, path: Path, headers: Mapping[str, str],
+                    writer: AtomicWriter) -> Dict[str, Any]:
+        """Registra um download completo (200) e o guarda no cache."""
+        self._downloaded_urls.add(url)
+        info = {
+            'size': writer.size,
+            'sha256': writer.sha256,
+            'content_type': headers.get('Content-Type', '').split(';')[0].strip(),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'cache': 'miss',
+        }
+        
+        if self.cache:
+            self.cache.store(url, headers, path, info)
+        return info
+    
+    def _unchanged(self, url: str, previous: Dict[str, Any], status: str) -> Dict[str, Any]:
+        """Mantém o arquivo da cópia anterior."""
+        self._downloaded_urls.add(url)
+        info = dict(previous)
+        info['cache'] = status
+        info['unchanged'] = True
+        return info
+    
+    def _copy_from_cache(self, url: str, entry: Dict[str, Any], path: Path,
+                         status: str) -> Optional[Dict[str, Any]]:
+        """Copia o corpo armazenado no cache para o destino."""
+        size = entry.get('size') or 0
+        if self.budget is not None:
+            self.budget.charge(size)
+        try:
+            info = self.cache.copy_to(entry, path)
+        except OSError:
+            # Entrada removida por outro processo entre lookup e cópia: o
+            # asset segue pela rede, que o contabiliza de novo
+            if self.budget is not None:
+                self.budget.refund(size)
+            return None
+        
+        info['etag'] = entry.get('etag')
+        info['last_modified'] = entry.get('last_modified')
+        info['cache'] = status
+        self._downloaded_urls.add(url)
+        return info
+
+
+class Downloader(DownloadCacheMixin):
     """Classe responsável por fazer downloads de recursos web."""
     
     # User-Agent que simula um navegador real
@@ -19,37 +140,96 @@ class Downloader:
         "Chrome/120.0.0.0 Safari/537.36"
     )
     
-    def __init__(self, timeout: int = 30, max_retries: int = 3):
+    # Tamanho dos blocos lidos da rede ao gravar direto no disco
+    CHUNK_SIZE = 64 * 1024
+    
+    # Conexões mantidas por host (o padrão do requests é 10)
+    POOL_MAXSIZE = 10
+    
+    # Número de hosts com pool de conexões mantido
+    POOL_HOSTS = 100
+    
+    def __init__(self, timeout: int = 30, max_retries: int = 3,
+                 cache: Optional[HTTPCache] = None,
+                 session: Optional[requests.Session] = None,
+                 pool_maxsize: Optional[int] = None,
+                 host_pool_sizes: Optional[Dict[str, int]] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 budget: Optional[JobBudget] = None,
+                 metrics: Optional[JobMetrics] = None):
         """
         Inicializa o downloader.
         
         Args:
             timeout: Timeout em segundos para cada requisição.
             max_retries: Número máximo de tentativas em caso de falha.
+            cache: Cache HTTP persistente usado pelos downloads de assets.
+            session: Sessão compartilhada (ver create_session()); se omitida,
+                o downloader cria a sua.
+            pool_maxsize: Conexões mantidas por host na sessão própria.
+            host_pool_sizes: Conexões mantidas por host, para hosts
+                específicos (ex: {'cdn.example.com': 32}).
+            rate_limiter: Limitador por origem, compartilhado entre
+                downloaders que acessam os mesmos hosts; se omitido, o
+                downloader cria o seu.
+            budget: Orçamento do job, aplicado aos downloads de assets
+                (download_to_file).
+            metrics: Métricas do job. Com elas (e records_assets), cada
+                download de asset mede suas fases em info['timings'].
         """
         self.timeout = timeout
-        self.session = self._create_session(max_retries)
+        self.max_retries = max_retries
+        self.cache = cache
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.budget = budget
+        self.metrics = metrics
+        self.session = session or self.create_session(max_retries, pool_maxsize, host_pool_sizes)
         self._downloaded_urls = set()  # Cache de URLs já baixadas
     
-    def _create_session(self, max_retries: int) -> requests.Session:
-        """Cria uma sessão HTTP com retry logic."""
+    @classmethod
+    def create_session(cls, max_retries: int = 3, pool_maxsize: Optional[int] = None,
+                       host_pool_sizes: Optional[Dict[str, int]] = None) -> requests.Session:
+        """
+        Cria uma sessão HTTP com retry logic e pool de conexões por host.
+        
+        A sessão é thread-safe para os usos do WebCopy e pode ser
+        compartilhada por vários downloaders (ex: todos os jobs da interface
+        web), reaproveitando conexões e handshakes TLS entre eles.
+        
+        Args:
+            max_retries: Número máximo de tentativas em caso de falha.
+            pool_maxsize: Conexões mantidas por host (deve cobrir os
+                downloads simultâneos a um mesmo host, senão as conexões
+                excedentes são descartadas após o uso).
+            host_pool_sizes: Conexões mantidas para hosts específicos.
+            
+        Returns:
+            Sessão configurada.
+        """
         session = requests.Session()
         
-        # Configura retry para falhas de rede
+        # Configura retry para falhas de rede. 429 e 503 são tratados em
+        # _request(), que respeita o Retry-After junto ao rate limiter
         retry_strategy = Retry(
             total=max_retries,
             backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET", "HEAD"]
+            status_forcelist=[500, 502, 504],
+            allowed_methods=["GET", "HEAD"],
+            respect_retry_after_header=False
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = PooledHTTPAdapter(
+            host_pool_sizes=host_pool_sizes,
+            max_retries=retry_strategy,
+            pool_connections=cls.POOL_HOSTS,
+            pool_maxsize=pool_maxsize or cls.POOL_MAXSIZE
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
         # Headers padrão
         session.headers.update({
-            "User-Agent": self.USER_AGENT,
+            "User-Agent": cls.USER_AGENT,
             "Accept": "*/*",
             "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
             "Accept-Encoding": "gzip, deflate, br",
@@ -57,6 +237,36 @@ class Downloader:
         
         return session
     
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Faz uma requisição respeitando o rate limiter da origem.
+        
+        Cada resposta ajusta a taxa da origem. Em 429/503 a origem fica
+        bloqueada pelo Retry-After (para todos os downloaders que
+        compartilham o limiter) e a requisição é repetida até max_retries
+        vezes; a última resposta é retornada como veio.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(url)
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException:
+                self.rate_limiter.record(url, None, time.monotonic() - started)
+                raise
+            
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            self.rate_limiter.record(url, response.status_code,
+                                     response.elapsed.total_seconds(), retry_after)
+            if response.status_code not in THROTTLE_STATUS or attempt == self.max_retries:
+                return response
+            response.close()
+        return response
+    
+    def connection_stats(self) -> Dict[str, Any]:
+        """Reaproveitamento de conexões da sessão (veja connections.connection_stats)."""
+        return connection_stats(self.session)
+    
     def download_text(self, url: str) -> Optional[str]:
         """
         Baixa uma URL e retorna o conteúdo como texto.
@@ -68,7 +278,7 @@ class Downloader:
             Conteúdo da página como string, ou None se falhar.
         """
         try:
-            response = self.session.get(url, timeout=self.timeout)
+            response = self._request('GET', url)
             response.raise_for_status()
             
             # Detecta encoding correto
@@ -107,7 +317,7 @@ class Downloader:
             return None
         
         try:
-            response = self.session.get(url, timeout=self.timeout)
+            response = self._request('GET', url)
             response.raise_for_status()
             
             self._downloaded_urls.add(url)
@@ -124,6 +334,89 @@ class Downloader:
             click.echo(f"    [!] Erro ao baixar: {url}", err=True)
             return None
     
+    def download_to_file(self, url: str, path: Path,
+                         previous: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Baixa uma URL gravando o conteúdo direto no disco, em blocos.
+        
+        O corpo nunca é mantido inteiro em memória: os blocos vão para um
+        arquivo temporário no diretório de destino, renomeado ao final.
+        Com cache configurado, respostas ainda frescas são copiadas do cache
+        sem acessar a rede e as demais são revalidadas com requisições
+        condicionais (um 304 reaproveita o corpo armazenado).
+        
+        Args:
+            url: URL para baixar.
+            path: Caminho final do arquivo.
+            previous: Metadados do mesmo arquivo em uma cópia anterior
+                (etag, last_modified, sha256). Se o arquivo ainda existe em
+                path e não mudou no servidor, ele é mantido sem ser regravado.
+            
+        Returns:
+            Dict com 'size', 'sha256', 'content_type', 'etag',
+            'last_modified', 'cache' ('hit', 'revalidated' ou 'miss') e
+            'unchanged' (True se o arquivo existente foi mantido), ou None
+            se falhar. Com métricas, as respostas da rede incluem
+            'timings' (segundos de DNS, conexão, TTFB e transferência).
+            
+        Raises:
+            BudgetExceeded: Se o asset não coube no orçamento do job (o
+                download é interrompido e nada é gravado).
+        """
+        # Evita baixar a mesma URL duas vezes
+        if url in self._downloaded_urls:
+            return None
+        
+        info, entry, headers, use_previous = self._prepare_request(url, path, previous)
+        if info:
+            return info
+        
+        timed = self.metrics is not None and self.metrics.records_assets
+        if timed:
+            reset_connect_times()
+        
+        try:
+            with self._request('GET', url, stream=True, headers=headers) as response:
+                received = time.perf_counter()
+                if response.status_code == 304:
+                    info = self._not_modified(url, path, response.headers, entry, previous, use_previous)
+                else:
+                    response.raise_for_status()
+                    self._check_length(response.headers)
+                    
+                    with AtomicWriter(path) as writer:
+                        for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                            writer.write(chunk)
+                            self._consume(writer, len(chunk))
+                    
+                    info = self._downloaded(url, path, response.headers, writer)
+                
+                if timed and info:
+                    # elapsed vai do envio aos headers, incluindo a conexão
+                    dns, connect = connect_times()
+                    info['timings'] = phase_timings(
+                        dns, connect - dns, response.elapsed.total_seconds() - connect,
+                        time.perf_counter() - received
+                    )
+                return info
+            
+        except BudgetExceeded as e:
+            click.echo(f"    [!] Fora do orçamento ({e}): {url}", err=True)
+            raise
+        except requests.exceptions.Timeout:
+            click.echo(f"    [!] Timeout ao baixar: {url}", err=True)
+            return None
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else "?"
+            click.echo(f"    [!] Erro HTTP {status}: {url}", err=True)
+            return None
+        except requests.exceptions.RequestException:
+            click.echo(f"    [!] Erro ao baixar: {url}", err=True)
+            return None
+        except OSError as e:
+            click.echo(f"    [!] Erro ao gravar {url}: {e}", err=True)
+            return None
+    
     def get_content_type(self, url: str) -> Optional[str]:
         """
         Faz uma requisição HEAD para obter o Content-Type de uma URL.
@@ -135,7 +428,7 @@ class Downloader:
             Content-Type ou None se falhar.
         """
         try:
-            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            response = self._request('HEAD', url, allow_redirects=True)
             return response.headers.get('Content-Type', '').split(';')[0].strip()
         except:
             return None
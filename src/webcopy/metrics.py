@@ -0,0 +1,326 @@
+"""
+Metrics Module - Contadores e histogramas no formato do Prometheus e tempos
+de cada etapa e de cada asset de um job.
+"""
+
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Limites (segundos) dos histogramas de tempo
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Limites (segundos) do histograma de duração dos jobs
+JOB_BUCKETS = (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+# Fases de um download medidas por asset
+PHASES = ('dns', 'connect', 'ttfb', 'transfer')
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """Base dos tipos de métrica: nome, ajuda e rótulos."""
+    
+    TYPE = ''
+    
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} usa os rótulos {self.labels}, recebeu {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labels)
+    
+    def render(self) -> List[str]:
+        """Linhas da métrica no formato de texto do Prometheus."""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.TYPE}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+    
+    def _render_sample(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}']
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Valores atuais, um por combinação de rótulos."""
+        with self._lock:
+            items = sorted(self._values.items())
+        return [dict(zip(self.labels, key), value=self._snapshot_value(value)) for key, value in items]
+    
+    def _snapshot_value(self, value: Any) -> Any:
+        return value
+
+
+class Counter(_Metric):
+    """Valor que só aumenta (ex: total de bytes baixados)."""
+    
+    TYPE = 'counter'
+    
+    def inc(self, amount: float = 1, **labels):
+        """Soma amount ao valor dos rótulos informados."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (ex: jobs na fila)."""
+    
+    TYPE = 'gauge'
+    
+    def set(self, value: float, **labels):
+        """Define o valor dos rótulos informados."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribuição de valores em faixas cumulativas (ex: tempos)."""
+    
+    TYPE = 'histogram'
+    
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Iterable[float] = TIME_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+    
+    def observe(self, value: float, **labels):
+        """Registra um valor na faixa correspondente."""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limit in enumerate(self.buckets):
+                if value <= limit:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+    
+    def _render_sample(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for limit, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            le = _format_labels(self.labels, key, f'le="{_format_value(limit)}"')
+            lines.append(f'{self.name}_bucket{le} {cumulative}')
+        labels = _format_labels(self.labels, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(round(total, 6))}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+    
+    def _snapshot_value(self, value: Any) -> Any:
+        counts, total, count = value
+        return {'count': count, 'sum': round(total, 6), 'buckets': dict(zip(
+            (_format_value(limit) for limit in self.buckets), counts
+        ))}
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas de um processo, exportado em /metrics.
+    
+    counter(), gauge() e histogram() criam a métrica na primeira chamada e
+    retornam a mesma instância nas seguintes. Thread-safe.
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _get(self, cls, name: str, *args, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'{name} já registrada como {metric.TYPE}')
+            return metric
+    
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        """Retorna (criando, se preciso) um Counter."""
+        return self._get(Counter, name, help, labels)
+    
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        """Retorna (criando, se preciso) um Gauge."""
+        return self._get(Gauge, name, help, labels)
+    
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Iterable[float] = TIME_BUCKETS) -> Histogram:
+        """Retorna (criando, se preciso) um Histogram."""
+        return self._get(Histogram, name, help, labels, buckets)
+    
+    def render(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus (0.0.4)."""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+    
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Valores de todas as métricas (para JSON)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+class JobMetrics:
+    """
+    Tempos de um job: duração de cada etapa e, opcionalmente, as fases de
+    cada download (DNS, conexão, TTFB, transferência), bytes e uso do cache.
+    
+    As etapas são marcadas com mark(), que encerra a anterior; custam uma
+    leitura de relógio cada. Os downloads só medem suas fases quando o job
+    usa um registry ou keep_assets (records_assets); sem isso, cada asset
+    custa apenas a soma dos totais.
+    """
+    
+    def __init__(self, registry: Optional[MetricsRegistry] = None, keep_assets: bool = False):
+        """
+        Args:
+            registry: Registry que acumula as métricas de todos os jobs.
+            keep_assets: Guarda o registro de cada asset (para summary()).
+        """
+        self.registry = registry
+        self.keep_assets = keep_assets
+        self.stages: Dict[str, float] = {}
+        self.assets: List[Dict[str, Any]] = []
+        self.totals = {'assets': 0, 'bytes': 0, 'hit': 0, 'revalidated': 0, 'miss': 0, 'failed': 0}
+        
+        self.total: Optional[float] = None
+        self._started = time.perf_counter()
+        self._stage: Optional[str] = None
+        self._stage_started = self._started
+        self._lock = threading.Lock()
+    
+    @property
+    def records_assets(self) -> bool:
+        """Indica se os downloads devem ser medidos."""
+        return self.registry is not None or self.keep_assets
+    
+    def mark(self, stage: Optional[str]):
+        """
+        Encerra a etapa atual e começa outra.
+        
+        Args:
+            stage: Nome da nova etapa, ou None para só encerrar a atual.
+        """
+        now = time.perf_counter()
+        if self._stage is not None:
+            elapsed = now - self._stage_started
+            self.stages[self._stage] = self.stages.get(self._stage, 0.0) + elapsed
+            if self.registry is not None:
+                self.registry.histogram(
+                    'webcopy_stage_duration_seconds', 'Duração de cada etapa dos jobs', ('stage',)
+                ).observe(elapsed, stage=self._stage)
+        self._stage = stage
+        self._stage_started = now
+    
+    def finish(self, success: bool) -> Dict[str, float]:
+        """
+        Encerra a última etapa e contabiliza o job.
+        
+        Returns:
+            Segundos gastos em cada etapa, mais 'total'.
+        """
+        self.mark(None)
+        self.total = total = time.perf_counter() - self._started
+        if self.registry is not None:
+            self.registry.counter(
+                'webcopy_jobs_total', 'Jobs concluídos', ('status',)
+            ).inc(status='success' if success else 'error')
+            self.registry.histogram(
+                'webcopy_job_duration_seconds', 'Duração total dos jobs', buckets=JOB_BUCKETS
+            ).observe(total)
+        return self.timings()
+    
+    def timings(self) -> Dict[str, float]:
+        """Segundos gastos em cada etapa (arredondados), mais 'total'."""
+        total = self.total if self.total is not None else time.perf_counter() - self._started
+        timings = {stage: round(seconds, 4) for stage, seconds in self.stages.items()}
+        timings['total'] = round(total, 4)
+        return timings
+    
+    def record_asset(self, url: str, info: Optional[Dict[str, Any]]):
+        """
+        Registra o resultado de um download.
+        
+        Args:
+            url: URL do asset.
+            info: Retorno de download_to_file (None se falhou), com
+                'timings' quando o downloader mediu as fases.
+        """
+        cache = info.get('cache', 'miss') if info else 'failed'
+        size = info.get('size', 0) if info else 0
+        timings = info.get('timings') if info else None
+        
+        with self._lock:
+            self.totals['assets'] += 1
+            self.totals['bytes'] += size
+            self.totals[cache] = self.totals.get(cache, 0) + 1
+            if self.keep_assets:
+                entry = {'url': url, 'cache': cache, 'size': size}
+                if timings:
+                    entry['timings'] = timings
+                self.assets.append(entry)
+        
+        if self.registry is None:
+            return
+        self.registry.counter(
+            'webcopy_assets_total', 'Assets processados, por resultado do cache', ('cache',)
+        ).inc(cache=cache)
+        if size:
+            self.registry.counter(
+                'webcopy_asset_bytes_total', 'Bytes de assets gravados, por resultado do cache', ('cache',)
+            ).inc(size, cache=cache)
+        if timings:
+            phases = self.registry.histogram(
+                'webcopy_download_phase_seconds', 'Tempo de cada fase dos downloads de assets', ('phase',)
+            )
+            for phase in PHASES:
+                if timings.get(phase) is not None:
+                    phases.observe(timings[phase], phase=phase)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Etapas, totais e (com keep_assets) o registro de cada asset."""
+        with self._lock:
+            summary = {'stages': self.timings(), 'totals': dict(self.totals)}
+            if self.keep_assets:
+                summary['assets'] = list(self.assets)
+        return summary
+
+
+def phase_timings(dns: Optional[float], connect: Optional[float], ttfb: Optional[float],
+                  transfer: Optional[float]) -> Dict[str, Optional[float]]:
+    """Fases de um download (segundos, arredondados; None = não medida)."""
+    values = {'dns': dns, 'connect': connect, 'ttfb': ttfb, 'transfer': transfer}
+    return {phase: round(max(0.0, value), 6) if value is not None else None for phase, value in values.items()}
@@ -2,11 +2,146 @@
 Organizer Module - Organiza arquivos baixados em estrutura de pastas padronizada.
 """
 
+import os
 import re
+import json
 import hashlib
+import posixpath
+import tempfile
+import threading
 from pathlib import Path
-from typing import Dict, Optional
-from urllib.parse import urlparse, unquote
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Set, Union
+from urllib.parse import urldefrag, urljoin, urlparse, unquote
+
+from .cssgraph import rewrite_css_refs
+from .parser import normalize_url
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    
+    from .store import BlobStore
+
+
+# Permissões padrão de arquivos novos (mkstemp cria com 0600)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+class AtomicWriter:
+    """
+    Escreve um arquivo em partes e o publica atomicamente ao final.
+    
+    Os dados vão para um arquivo temporário no mesmo diretório do destino,
+    que só é renomeado para o nome final se a escrita terminar sem erro.
+    Tamanho e hash SHA-256 são calculados durante a escrita.
+    """
+    
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Caminho final do arquivo.
+        """
+        self.path = Path(path)
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = None
+        self._tmp_path: Optional[str] = None
+    
+    def __enter__(self) -> 'AtomicWriter':
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.part'
+        )
+        self._file = os.fdopen(fd, 'wb')
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            os.chmod(self._tmp_path, FILE_MODE)
+            os.replace(self._tmp_path, self.path)
+        else:
+            try:
+                os.unlink(self._tmp_path)
+            except OSError:
+                pass
+    
+    def write(self, chunk: bytes):
+        """Escreve uma parte do conteúdo."""
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+    
+    @property
+    def sha256(self) -> str:
+        """Hash SHA-256 (hex) do conteúdo escrito até agora."""
+        return self._hash.hexdigest()
+
+
+def rewrite_css_file(css_file: Path, css_url: str, css_path: str, local_paths: Dict[str, str]) -> bool:
+    """
+    Reescreve as URLs de um arquivo CSS salvo (veja
+    FileOrganizer.rewrite_css_urls). Função de módulo para poder rodar em
+    outro processo (workers.py).
+    
+    Args:
+        css_file: Arquivo CSS.
+        css_url: URL de origem do CSS.
+        css_path: Caminho do CSS relativo à cópia.
+        local_paths: Mapa URL normalizada -> caminho local.
+        
+    Returns:
+        True se o arquivo foi alterado.
+    """
+    css_dir = posixpath.dirname(css_path)
+    
+    try:
+        content = Path(css_file).read_text(encoding='utf-8', errors='ignore')
+        modified = False
+        
+        def replace_url(ref):
+            nonlocal modified
+            
+            # Ignora data URLs e referências internas (#id)
+            if ref.url.startswith(('data:', '#')):
+                return None
+            
+            absolute_url = urljoin(css_url, ref.url)
+            local_path = local_paths.get(normalize_url(absolute_url))
+            if local_path is None:
+                return None
+            
+            # Mantém o fragmento (ex: font.svg#icone)
+            fragment = urldefrag(absolute_url)[1]
+            relative_path = posixpath.relpath(local_path, css_dir)
+            if fragment:
+                relative_path += '#' + fragment
+            
+            modified = True
+            return relative_path
+        
+        new_content = rewrite_css_refs(content, replace_url)
+        
+        if modified:
+            # Nunca no lugar: o arquivo pode ser um hardlink do BlobStore
+            with AtomicWriter(Path(css_file)) as writer:
+                writer.write(new_content.encode('utf-8'))
+        return modified
+    
+    except Exception:
+        # Ignora erros de encoding em arquivos CSS
+        return False
+
+
+def rewrite_css_files(files: List[tuple], local_paths: Dict[str, str]) -> int:
+    """
+    Reescreve vários CSS (tuplas arquivo, URL, caminho relativo) de uma vez.
+    
+    Returns:
+        Número de arquivos alterados.
+    """
+    return sum(rewrite_css_file(css_file, css_url, css_path, local_paths)
+               for css_file, css_url, css_path in files)
 
 
 class FileOrganizer:
@@ -35,14 +170,22 @@ class FileOrganizer:
         'font/otf': '.otf',
     }
     
-    def __init__(self, output_path: Path):
+    # Tamanho dos blocos gravados por save_html() com conteúdo em partes
+    HTML_BUFFER_SIZE = 64 * 1024
+    
+    # Manifesto URL -> arquivo gravado ao final de cada cópia
+    MANIFEST_NAME = 'webcopy-manifest.json'
+    
+    def __init__(self, output_path: Path, store: Optional['BlobStore'] = None):
         """
         Inicializa o organizador.
         
         Args:
             output_path: Caminho base para salvar os arquivos.
+            store: BlobStore para deduplicar o conteúdo dos assets.
         """
         self.output_path = Path(output_path)
+        self.store = store
         self.css_dir = self.output_path / 'css'
         self.js_dir = self.output_path / 'js'
         self.images_dir = self.output_path / 'images'
@@ -54,6 +197,45 @@ class FileOrganizer:
         
         # Mapeia URLs para caminhos locais salvos
         self._saved_files: Dict[str, str] = {}
+        
+        # Tamanho e hash dos arquivos gravados
+        self._file_info: Dict[str, Dict[str, Any]] = {}
+        
+        # Assets da cópia anterior (modo incremental): URL -> entrada do manifesto
+        self._previous: Dict[str, Dict[str, Any]] = {}
+        
+        # Caminhos reservados antes do download (URL -> caminho absoluto)
+        self._reserved: Dict[str, Path] = {}
+        self._reserved_names: Set[Path] = set()
+        self._lock = threading.Lock()
+    
+    def _directory_for(self, category: str) -> Path:
+        """Retorna o diretório de destino para uma categoria de asset."""
+        return {
+            'css': self.css_dir,
+            'js': self.js_dir,
+            'images': self.images_dir,
+            'fonts': self.fonts_dir,
+        }.get(category, self.assets_dir)
+    
+    def category_for(self, url: str) -> str:
+        """
+        Categoriza uma URL pela extensão.
+        
+        Returns:
+            'css', 'js', 'images', 'fonts', ou 'other'
+        """
+        ext = self._get_extension(url)
+        
+        if ext == '.css':
+            return 'css'
+        elif ext == '.js':
+            return 'js'
+        elif ext in self.IMAGE_EXTENSIONS:
+            return 'images'
+        elif ext in self.FONT_EXTENSIONS:
+            return 'fonts'
+        return 'other'
     
     def create_structure(self):
         """Cria a estrutura de diretórios."""
@@ -136,7 +318,7 @@ class FileOrganizer:
         """
         full_path = directory / filename
         
-        if not full_path.exists():
+        if not self._is_taken(full_path):
             return filename
         
         # Adiciona contador para tornar único
@@ -145,10 +327,123 @@ class FileOrganizer:
         
         while True:
             new_filename = f"{name}_{counter}.{ext}" if ext else f"{name}_{counter}"
-            if not (directory / new_filename).exists():
+            if not self._is_taken(directory / new_filename):
                 return new_filename
             counter += 1
     
+    def _is_taken(self, path: Path) -> bool:
+        """Verifica se um caminho já existe ou foi reservado."""
+        return path in self._reserved_names or path.exists()
+    
+    def _relative(self, file_path: Path) -> str:
+        """Calcula o caminho relativo (com /) em relação ao output_path."""
+        relative_path = file_path.relative_to(self.output_path)
+        return str(relative_path).replace('\\', '/')
+    
+    def reserve(self, url: str, category: Optional[str] = None) -> str:
+        """
+        Reserva o caminho local de uma URL antes do download.
+        
+        Reservar na ordem em que as URLs foram descobertas garante nomes
+        determinísticos mesmo quando os downloads terminam fora de ordem.
+        
+        Args:
+            url: URL do recurso.
+            category: Categoria do asset (None para detectar pela extensão).
+            
+        Returns:
+            Caminho relativo reservado (em relação ao output_path).
+        """
+        with self._lock:
+            if url in self._reserved:
+                return self._relative(self._reserved[url])
+            
+            directory = self._directory_for(category or self.category_for(url))
+            return self._relative(self._reserve_in(directory, url))
+    
+    def _reserve_in(self, directory: Path, url: str) -> Path:
+        """Reserva um nome único para a URL no diretório (requer self._lock)."""
+        filename = self._get_filename_from_url(url)
+        
+        # Folhas sem extensão (ex: /css?family=...) precisam dela para serem
+        # reescritas (rewrite_css_urls) e servidas como CSS
+        if directory == self.css_dir and not filename.lower().endswith('.css'):
+            filename += '.css'
+        
+        file_path = directory / self._get_unique_filename(directory, filename)
+        
+        self._reserved[url] = file_path
+        self._reserved_names.add(file_path)
+        return file_path
+    
+    def release(self, url: str):
+        """Libera a reserva de uma URL cujo download falhou."""
+        with self._lock:
+            file_path = self._reserved.pop(url, None)
+            if file_path is not None:
+                self._reserved_names.discard(file_path)
+    
+    def reserved_path(self, url: str) -> Path:
+        """Retorna o caminho absoluto reservado para uma URL."""
+        with self._lock:
+            return self._reserved[url]
+    
+    def mark_saved(self, url: str, info: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Registra uma URL cujo arquivo já foi gravado no caminho reservado
+        (por exemplo, via streaming direto para o disco).
+        
+        Args:
+            url: URL do recurso (já reservada com reserve()).
+            info: Metadados do arquivo gravado (size, sha256, ...).
+            
+        Returns:
+            Caminho relativo do arquivo salvo.
+        """
+        with self._lock:
+            file_path = self._reserved[url]
+        
+        # Deduplica o conteúdo no store (o arquivo vira um link para o blob)
+        if self.store is not None and info and info.get('sha256') and not info.get('unchanged'):
+            self.store.ingest(file_path, info['sha256'])
+        
+        with self._lock:
+            local_path = self._relative(file_path)
+            self._saved_files[url] = local_path
+            if info:
+                self._file_info[url] = info
+        return local_path
+    
+    def save_reserved(self, url: str, content: bytes) -> str:
+        """
+        Salva o conteúdo de uma URL no caminho previamente reservado.
+        
+        Args:
+            url: URL do recurso (já reservada com reserve()).
+            content: Conteúdo do arquivo em bytes.
+            
+        Returns:
+            Caminho relativo do arquivo salvo.
+        """
+        with AtomicWriter(self.reserved_path(url)) as writer:
+            writer.write(content)
+        
+        return self.mark_saved(url, {'size': writer.size, 'sha256': writer.sha256})
+    
+    def read_text(self, local_path: str) -> str:
+        """Lê um arquivo salvo (caminho relativo) como texto."""
+        return (self.output_path / local_path).read_text(encoding='utf-8', errors='ignore')
+    
+    def _write_text(self, file_path: Path, content: str):
+        """
+        Grava texto substituindo o arquivo atomicamente.
+        
+        Nunca altera o arquivo no lugar: ele pode ser um hardlink para um
+        blob do BlobStore compartilhado com outras cópias.
+        """
+        with AtomicWriter(file_path) as writer:
+            writer.write(content.encode('utf-8'))
+    
     def _save_file(self, directory: Path, url: str, content: bytes) -> str:
         """
         Salva um arquivo no diretório especificado.
@@ -161,20 +456,11 @@ class FileOrganizer:
         Returns:
             Caminho relativo do arquivo salvo (em relação ao output_path).
         """
-        filename = self._get_filename_from_url(url)
-        unique_filename = self._get_unique_filename(directory, filename)
-        
-        file_path = directory / unique_filename
-        file_path.write_bytes(content)
-        
-        # Calcula caminho relativo ao output_path
-        relative_path = file_path.relative_to(self.output_path)
-        local_path = str(relative_path).replace('\\', '/')
-        
-        # Salva no mapa
-        self._saved_files[url] = local_path
+        with self._lock:
+            if url not in self._reserved:
+                self._reserve_in(directory, url)
         
-        return local_path
+        return self.save_reserved(url, content)
     
     def save_css(self, url: str, content: bytes) -> str:
         """Salva um arquivo CSS."""
@@ -207,72 +493,261 @@ class FileOrganizer:
         Returns:
             Caminho relativo do arquivo salvo.
         """
-        ext = self._get_extension(url)
+        return self._save_file(self._directory_for(self.category_for(url)), url, content)
+    
+    def page_filenames(self, page_urls: List[str]) -> Dict[str, str]:
+        """
+        Define o arquivo HTML local de cada página de um rastreamento.
         
-        if ext == '.css':
-            return self.save_css(url, content)
-        elif ext == '.js':
-            return self.save_js(url, content)
-        elif ext in self.IMAGE_EXTENSIONS:
-            return self.save_image(url, content)
-        elif ext in self.FONT_EXTENSIONS:
-            return self.save_font(url, content)
-        else:
-            return self.save_other(url, content)
+        Todas as páginas ficam na raiz da cópia, para que os caminhos
+        relativos dos assets (css/..., images/...) valham em qualquer uma.
+        A primeira página vira index.html; as demais usam o caminho da URL
+        (/docs/guia/intro.html -> docs_guia_intro.html).
+        
+        Args:
+            page_urls: URLs das páginas, começando pela página inicial.
+            
+        Returns:
+            Mapa URL da página -> nome do arquivo HTML.
+        """
+        names: Dict[str, str] = {}
+        taken: Set[str] = {self.MANIFEST_NAME}
+        
+        for index, url in enumerate(page_urls):
+            if index == 0:
+                filename = 'index.html'
+            else:
+                parsed = urlparse(url)
+                path = unquote(parsed.path).strip('/')
+                stem = path.rsplit('.', 1)[0] if '.' in path.rsplit('/', 1)[-1] else path
+                stem = self._sanitize_filename(stem.replace('/', '_')) or 'index'
+                if parsed.query:
+                    stem += '_' + hashlib.md5(parsed.query.encode()).hexdigest()[:8]
+                filename = f'{stem}.html'
+            
+            # Garante nomes únicos entre as páginas
+            name, counter = filename, 1
+            while name in taken:
+                name = f'{filename[:-5]}_{counter}.html'
+                counter += 1
+            
+            taken.add(name)
+            names[url] = name
+        
+        return names
     
-    def save_html(self, content: str, filename: str = "index.html"):
+    def save_html(self, content: Union[str, Iterable[str]], filename: str = "index.html"):
         """
         Salva o arquivo HTML principal.
         
         Args:
-            content: Conteúdo HTML.
+            content: Conteúdo HTML, ou partes do conteúdo (ex:
+                HTMLParser.iter_rewrite_html()), gravadas à medida que são
+                geradas.
             filename: Nome do arquivo (padrão: index.html).
         """
-        file_path = self.output_path / filename
-        file_path.write_text(content, encoding='utf-8')
+        self.write_html(self.output_path / filename, content)
+    
+    @classmethod
+    def write_html(cls, file_path: Path, content: Union[str, Iterable[str]]):
+        """
+        Grava um HTML (inteiro ou em partes) substituindo o arquivo atomicamente.
+        
+        Também usado pelos processos do CPUPool, que gravam as páginas
+        reescritas direto no destino.
+        """
+        if isinstance(content, str):
+            content = [content]
+        with AtomicWriter(file_path) as writer:
+            for block in cls._html_blocks(content):
+                writer.write(block)
     
-    def rewrite_css_urls(self, url_map: Dict[str, str]):
+    @classmethod
+    def _html_blocks(cls, parts: Iterable[str]) -> Iterator[bytes]:
+        """Agrupa as partes (em geral pequenas) do HTML em blocos codificados."""
+        buffer = []
+        buffered = 0
+        for part in parts:
+            buffer.append(part)
+            buffered += len(part)
+            if buffered >= cls.HTML_BUFFER_SIZE:
+                yield ''.join(buffer).encode('utf-8')
+                buffer = []
+                buffered = 0
+        yield ''.join(buffer).encode('utf-8')
+    
+    def rewrite_css_urls(self, url_map: Dict[str, str], only: Optional[Set[str]] = None,
+                         executor: Optional['Executor'] = None):
         """
         Reescreve URLs dentro de todos os arquivos CSS salvos.
         
+        Cada url(), image-set() e @import é resolvido contra a URL de origem
+        do próprio CSS e procurado no url_map pela URL absoluta normalizada;
+        o caminho gravado é relativo ao diretório do arquivo CSS.
+        
         Args:
             url_map: Mapa de URL original -> caminho local.
+            only: Se informado, reescreve apenas estes arquivos (caminhos
+                relativos); usado no modo incremental.
+            executor: Pool de processos (workers.create_cpu_pool()) que
+                reescreve os arquivos em paralelo, em lotes.
         """
-        css_url_pattern = re.compile(r'url\(["\']?([^"\')\s]+)["\']?\)', re.IGNORECASE)
+        # Índices: URL normalizada -> caminho local, e CSS local -> URL de origem
+        local_paths = {normalize_url(url): path for url, path in url_map.items()}
+        css_sources = {path: url for url, path in url_map.items()}
         
+        files = []
         for css_file in self.css_dir.glob('*.css'):
-            try:
-                content = css_file.read_text(encoding='utf-8', errors='ignore')
-                modified = False
-                
-                def replace_url(match):
-                    nonlocal modified
-                    original_url = match.group(1)
-                    
-                    # Ignora data URLs
-                    if original_url.startswith('data:'):
-                        return match.group(0)
-                    
-                    # Procura no mapa
-                    for orig_url, local_path in url_map.items():
-                        # Verifica se a URL do CSS termina com o mesmo caminho
-                        if original_url in orig_url or orig_url.endswith(original_url):
-                            modified = True
-                            # Calcula caminho relativo do CSS para o asset
-                            relative_path = '../' + local_path
-                            return f'url("{relative_path}")'
-                    
-                    return match.group(0)
-                
-                new_content = css_url_pattern.sub(replace_url, content)
-                
-                if modified:
-                    css_file.write_text(new_content, encoding='utf-8')
-                    
-            except Exception as e:
-                # Ignora erros de encoding em arquivos CSS
-                pass
+            css_path = self._relative(css_file)
+            if only is not None and css_path not in only:
+                continue
+            
+            css_url = css_sources.get(css_path)
+            if css_url is not None:
+                files.append((css_file, css_url, css_path))
+        
+        if executor is None or len(files) < 2:
+            rewrite_css_files(files, local_paths)
+            return
+        
+        # Lotes: local_paths vai uma vez por lote, não uma vez por arquivo
+        chunks = min(len(files), 2 * getattr(executor, 'processes', os.cpu_count() or 1))
+        futures = [executor.submit(rewrite_css_files, files[i::chunks], local_paths) for i in range(chunks)]
+        for future in futures:
+            future.result()
     
     def get_saved_files(self) -> Dict[str, str]:
         """Retorna o mapa de URLs para caminhos locais."""
         return self._saved_files.copy()
+    
+    def get_file_info(self, url: str) -> Optional[Dict[str, Any]]:
+        """Retorna tamanho e hash de um arquivo gravado."""
+        return self._file_info.get(url)
+    
+    def set_dependencies(self, url: str, dependencies: List[str], imports: Optional[List[str]] = None):
+        """
+        Registra as URLs referenciadas por um CSS (gravadas no manifesto).
+        
+        Args:
+            url: URL do CSS.
+            dependencies: Todas as URLs referenciadas.
+            imports: Quais delas são folhas importadas (@import).
+        """
+        with self._lock:
+            info = self._file_info.setdefault(url, {})
+            info['deps'] = list(dependencies)
+            info['imports'] = list(imports or [])
+    
+    def save_manifest(self, url_map: Dict[str, str], page: Optional[Dict[str, Any]] = None) -> Path:
+        """
+        Grava o manifesto da cópia: para cada URL, o arquivo local, tamanho,
+        SHA-256, validadores HTTP (ETag/Last-Modified) e, para CSS, as URLs
+        referenciadas e as importadas. É o que permite atualizar a cópia depois (adopt()).
+        
+        Args:
+            url_map: Mapa de URL original -> caminho local.
+            page: Informações da página principal (url, sha256).
+            
+        Returns:
+            Caminho do manifesto.
+        """
+        assets = {}
+        for url in sorted(url_map):
+            entry = {'path': url_map[url]}
+            info = self._file_info.get(url, {})
+            for key in ('size', 'sha256', 'content_type', 'etag', 'last_modified', 'deps', 'imports'):
+                if info.get(key):
+                    entry[key] = info[key]
+            assets[url] = entry
+        
+        manifest = {'page': page or {}, 'assets': assets}
+        file_path = self.output_path / self.MANIFEST_NAME
+        self._write_text(file_path, json.dumps(manifest, indent=2, ensure_ascii=False))
+        return file_path
+    
+    @classmethod
+    def read_manifest(cls, output_path: Path) -> Optional[Dict[str, Any]]:
+        """
+        Lê o manifesto de uma cópia existente.
+        
+        Returns:
+            Conteúdo do manifesto, ou None se não existir ou for inválido.
+        """
+        file_path = Path(output_path) / cls.MANIFEST_NAME
+        try:
+            manifest = json.loads(file_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        
+        if not isinstance(manifest, dict) or not isinstance(manifest.get('assets'), dict):
+            return None
+        return manifest
+    
+    def adopt(self, manifest: Dict[str, Any]):
+        """
+        Assume os arquivos de uma cópia anterior (modo incremental).
+        
+        Cada URL do manifesto volta a ocupar o mesmo caminho, e seus
+        metadados ficam disponíveis em previous_info() para revalidação.
+        
+        Args:
+            manifest: Manifesto lido com read_manifest().
+        """
+        with self._lock:
+            for url, entry in manifest.get('assets', {}).items():
+                file_path = self._inside_output(entry['path'])
+                if file_path is None:
+                    continue
+                self._reserved[url] = file_path
+                self._reserved_names.add(file_path)
+                self._previous[url] = entry
+    
+    def previous_info(self, url: str) -> Optional[Dict[str, Any]]:
+        """Metadados da URL na cópia anterior, se houver."""
+        return self._previous.get(url)
+    
+    def _inside_output(self, relative: str) -> Optional[Path]:
+        """
+        Caminho de um arquivo do manifesto, ou None se ele sair da cópia
+        (manifesto danificado ou editado com '..' ou caminhos absolutos).
+        """
+        file_path = self.output_path / relative
+        try:
+            resolved = file_path.resolve()
+            output_dir = self.output_path.resolve()
+            if resolved == output_dir:
+                return None
+            resolved.relative_to(output_dir)
+        except (OSError, ValueError):
+            return None
+        return file_path
+    
+    def is_unchanged(self, url: str) -> bool:
+        """Verifica se o arquivo da cópia anterior foi mantido sem alterações."""
+        info = self._file_info.get(url)
+        return bool(info and info.get('unchanged'))
+    
+    def remove_stale(self, url_map: Dict[str, str]) -> int:
+        """
+        Remove arquivos da cópia anterior que não são mais usados.
+        
+        Args:
+            url_map: Mapa final de URL -> caminho local.
+            
+        Returns:
+            Número de arquivos removidos.
+        """
+        in_use = set(url_map.values())
+        removed = 0
+        for url, entry in self._previous.items():
+            if url in url_map or entry['path'] in in_use:
+                continue
+            file_path = self._inside_output(entry['path'])
+            if file_path is None:
+                continue
+            try:
+                file_path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -2,11 +2,60 @@
 Parser Module - Analisa HTML e CSS para extrair URLs de assets.
 """
 
-import re
-from typing import Dict, List, Set
-from urllib.parse import urljoin, urlparse
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
 from bs4 import BeautifulSoup
 
+from .cssgraph import css_refs, rewrite_css_refs
+from .rewriter import StreamingRewriter
+
+
+# Portas padrão omitidas na forma normalizada das URLs
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _remove_dot_segments(path: str) -> str:
+    """Resolve segmentos "." e ".." de um caminho de URL (RFC 3986)."""
+    segments: List[str] = []
+    parts = path.split('/')
+    for part in parts:
+        if part == '..':
+            if len(segments) > 1:
+                segments.pop()
+        elif part != '.':
+            segments.append(part)
+    
+    # "/a/b/.." aponta para o diretório "/a/"
+    if parts[-1] in ('.', '..'):
+        segments.append('')
+    return '/'.join(segments)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normaliza uma URL absoluta para uso como chave de mapas.
+    
+    Remove o fragmento e a porta padrão, coloca esquema e host em
+    minúsculas, resolve segmentos "." e ".." e usa "/" como caminho vazio. URLs que diferem só nesses
+    pontos apontam para o mesmo recurso.
+    
+    Args:
+        url: URL absoluta.
+        
+    Returns:
+        URL normalizada.
+    """
+    parsed = urlparse(urldefrag(url)[0])
+    scheme = parsed.scheme.lower()
+    netloc = (parsed.hostname or '').lower()
+    if ':' in netloc:
+        netloc = f'[{netloc}]'  # IPv6
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{parsed.port}'
+    if '@' in parsed.netloc:
+        netloc = parsed.netloc.rsplit('@', 1)[0] + '@' + netloc
+    return parsed._replace(scheme=scheme, netloc=netloc, path=_remove_dot_segments(parsed.path) or '/', fragment='').geturl()
+
 
 class HTMLParser:
     """Classe responsável por parsear HTML e extrair URLs de assets."""
@@ -15,18 +64,37 @@ class HTMLParser:
     IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico', '.bmp', '.tiff'}
     FONT_EXTENSIONS = {'.woff', '.woff2', '.ttf', '.otf', '.eot'}
     
-    # Regex para extrair url() de CSS
-    CSS_URL_PATTERN = re.compile(r'url\(["\']?([^"\')\s]+)["\']?\)', re.IGNORECASE)
+    # Imagens tratadas como acima da dobra: as primeiras do documento
+    ABOVE_FOLD_IMAGES = 6
     
-    def __init__(self, base_url: str):
+    # Documentos a partir deste tamanho (caracteres) são processados em
+    # streaming, sem montar a árvore do BeautifulSoup (veja rewriter.py)
+    STREAMING_THRESHOLD = 2 * 1024 * 1024
+    
+    def __init__(self, base_url: str, features: str = 'html.parser',
+                 streaming_threshold: Optional[int] = None):
         """
         Inicializa o parser.
         
         Args:
             base_url: URL base para resolver URLs relativas.
+            features: Parser usado pelo BeautifulSoup: 'html.parser'
+                (padrão, preserva melhor o original) ou 'lxml' (bem mais
+                rápido em páginas grandes).
+            streaming_threshold: Tamanho a partir do qual o documento é
+                lido e reescrito em streaming (padrão: STREAMING_THRESHOLD).
         """
         self.base_url = base_url
+        self.features = features
+        self.streaming_threshold = (
+            self.STREAMING_THRESHOLD if streaming_threshold is None else streaming_threshold
+        )
         self._soup = None
+        self._html: Optional[str] = None
+        
+        # Atributos com URL encontrados no parse: (tag, atributo, tipo, categorias)
+        self._refs: List[Tuple] = []
+        self._resolved: Dict[Tuple[str, str], str] = {}
     
     def _resolve_url(self, url: str, context_url: str = None) -> str:
         """
@@ -52,7 +120,17 @@ class HTMLParser:
         # Usa URL de contexto ou base
         base = context_url if context_url else self.base_url
         
-        return urljoin(base, url)
+        # A mesma URL costuma aparecer muitas vezes (extração e reescrita)
+        key = (base, url)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = self._resolved[key] = urljoin(base, url)
+        return resolved
+    
+    @staticmethod
+    def strip_fragment(url: str) -> str:
+        """Remove o fragmento (#...) de uma URL."""
+        return urldefrag(url)[0]
     
     def _get_extension(self, url: str) -> str:
         """Extrai a extensão de um arquivo da URL."""
@@ -87,6 +165,105 @@ class HTMLParser:
         else:
             return 'other'
     
+    def classify_tag(self, name: str, attrs: Dict) -> List[Tuple[str, str, list]]:
+        """
+        Identifica os atributos de uma tag que contêm URLs.
+        
+        Args:
+            name: Nome da tag em minúsculas.
+            attrs: Atributos da tag (nome -> valor).
+            
+        Returns:
+            Lista de (atributo, tipo, categorias). tipo é 'url' (URL única),
+            'srcset', 'style' (CSS inline) ou 'link' (link para página);
+            categorias são as categorias de asset da URL (None = pela extensão).
+        """
+        specs = []
+        
+        if name == 'link' and attrs.get('href'):
+            rel = attrs.get('rel') or []
+            rel = (rel if isinstance(rel, str) else ' '.join(rel)).lower()
+            categories = []
+            if 'stylesheet' in rel.split() or '.css' in attrs['href'].lower():
+                categories.append('css')
+            if 'icon' in rel:
+                categories.append('other')
+            if 'preload' in rel or 'prefetch' in rel:
+                categories.append(None)  # categoria pela extensão
+            specs.append(('href', 'url', categories))
+        elif name == 'script' and attrs.get('src'):
+            specs.append(('src', 'url', ['js']))
+        elif name in ('img', 'source'):
+            if name == 'img' and attrs.get('src'):
+                specs.append(('src', 'url', ['images']))
+            if attrs.get('srcset'):
+                specs.append(('srcset', 'srcset', ['images']))
+        elif name in ('a', 'area') and attrs.get('href'):
+            specs.append(('href', 'link', []))
+        
+        if attrs.get('style'):
+            specs.append(('style', 'style', []))
+        
+        return specs
+    
+    def parse(self, html_content: str):
+        """
+        Faz o parse do HTML e registra, em uma única passada pela árvore,
+        cada atributo que contém URLs junto com o seu nó.
+        
+        extract_assets(), extract_links() e rewrite_html_urls() usam esse
+        registro em vez de percorrer o documento de novo.
+        
+        Args:
+            html_content: Conteúdo HTML a analisar.
+        """
+        self._soup = BeautifulSoup(html_content, self.features)
+        self._html = html_content
+        refs = self._refs = []
+        
+        for tag in self._soup.find_all(True):
+            if tag.name == 'style' and tag.string:
+                refs.append((tag, None, 'style_tag', []))
+            for attr, kind, categories in self.classify_tag(tag.name, tag.attrs):
+                refs.append((tag, attr, kind, categories))
+    
+    def _ensure_parsed(self, html_content: str):
+        """Faz o parse apenas se o documento ainda não foi analisado."""
+        if self._soup is None or (self._html is not html_content and self._html != html_content):
+            self.parse(html_content)
+    
+    def is_streaming(self, html_content: str) -> bool:
+        """Verifica se o documento é grande o bastante para ser processado em streaming."""
+        return len(html_content) >= self.streaming_threshold
+    
+    def iter_values(self, html_content: str) -> Iterator[Tuple[str, list, str]]:
+        """
+        Percorre os valores com URLs do documento.
+        
+        Yields:
+            Tuplas (tipo, categorias, valor) de cada atributo com URL (veja
+            classify_tag()) e de cada bloco <style> (tipo 'style_tag').
+        """
+        if self.is_streaming(html_content):
+            yield from StreamingRewriter(self).iter_values(html_content)
+            return
+        
+        self._ensure_parsed(html_content)
+        for tag, attr, kind, categories in self._refs:
+            value = (tag.string or '') if kind == 'style_tag' else tag.get(attr)
+            yield kind, categories, value
+    
+    def _srcset_urls(self, srcset: str) -> List[str]:
+        """Extrai as URLs (já resolvidas) de um atributo srcset."""
+        urls = []
+        for item in srcset.split(','):
+            parts = item.strip().split()
+            if parts:
+                url = self._resolve_url(parts[0])
+                if url:
+                    urls.append(url)
+        return urls
+    
     def extract_assets(self, html_content: str) -> Dict[str, List[str]]:
         """
         Extrai todas as URLs de assets do HTML.
@@ -98,8 +275,6 @@ class HTMLParser:
             Dicionário com listas de URLs por tipo:
             {'css': [...], 'js': [...], 'images': [...], 'fonts': [...], 'other': [...]}
         """
-        self._soup = BeautifulSoup(html_content, 'html.parser')
-        
         assets: Dict[str, Set[str]] = {
             'css': set(),
             'js': set(),
@@ -108,202 +283,256 @@ class HTMLParser:
             'other': set()
         }
         
-        # Extrai CSS de <link rel="stylesheet">
-        for link in self._soup.find_all('link', rel='stylesheet'):
-            href = link.get('href')
-            if href:
-                url = self._resolve_url(href)
+        for kind, categories, value in self.iter_values(html_content):
+            if kind == 'url':
+                url = self._resolve_url(value)
                 if url:
-                    assets['css'].add(url)
+                    for category in categories:
+                        assets[category or self._categorize_url(url)].add(url)
+            
+            elif kind == 'srcset':
+                assets['images'].update(self._srcset_urls(value))
+            
+            elif kind in ('style', 'style_tag'):
+                # url(), image-set() e @import em style inline e em tags <style>
+                for ref in css_refs(value):
+                    url = self._resolve_url(ref.url)
+                    if url:
+                        assets['css' if ref.kind == 'import' else self._categorize_url(url)].add(url)
         
-        # Extrai CSS de <link> sem rel mas com .css
-        for link in self._soup.find_all('link', href=True):
-            href = link.get('href', '')
-            if '.css' in href.lower():
-                url = self._resolve_url(href)
-                if url:
-                    assets['css'].add(url)
+        # Converte sets para listas ordenadas
+        return {k: sorted(list(v)) for k, v in assets.items()}
+    
+    def iter_tags(self, html_content: str) -> Iterator[Tuple[str, Dict, bool]]:
+        """
+        Percorre as tags <script>, <link> e <img> do documento, em ordem.
         
-        # Extrai JavaScript de <script src>
-        for script in self._soup.find_all('script', src=True):
-            src = script.get('src')
-            if src:
-                url = self._resolve_url(src)
-                if url:
-                    assets['js'].add(url)
-        
-        # Extrai imagens de <img src> e <img srcset>
-        for img in self._soup.find_all('img'):
-            # src principal
-            src = img.get('src')
-            if src:
-                url = self._resolve_url(src)
-                if url and not url.startswith('data:'):
-                    assets['images'].add(url)
+        Yields:
+            Tuplas (nome, atributos, dentro_do_head).
+        """
+        if self.is_streaming(html_content):
+            yield from StreamingRewriter(self).iter_tags(html_content, ('script', 'link', 'img'))
+            return
+        
+        self._ensure_parsed(html_content)
+        for tag in self._soup.find_all(['script', 'link', 'img']):
+            yield tag.name, tag.attrs, tag.find_parent('head') is not None
+    
+    def extract_critical(self, html_content: str) -> Tuple[Set[str], Set[str]]:
+        """
+        Identifica os assets de que a primeira renderização da página depende
+        (além dos CSS, que sempre bloqueiam a renderização).
+        
+        Args:
+            html_content: Conteúdo HTML a analisar.
             
-            # srcset (múltiplas resoluções)
-            srcset = img.get('srcset')
-            if srcset:
-                for item in srcset.split(','):
-                    parts = item.strip().split()
-                    if parts:
-                        url = self._resolve_url(parts[0])
-                        if url and not url.startswith('data:'):
-                            assets['images'].add(url)
-        
-        # Extrai imagens de <source> (picture element)
-        for source in self._soup.find_all('source'):
-            srcset = source.get('srcset')
-            if srcset:
-                for item in srcset.split(','):
-                    parts = item.strip().split()
-                    if parts:
-                        url = self._resolve_url(parts[0])
-                        if url and not url.startswith('data:'):
-                            assets['images'].add(url)
-        
-        # Extrai favicon e outros ícones
-        for link in self._soup.find_all('link', rel=True):
-            rel = ' '.join(link.get('rel', []))
-            if 'icon' in rel.lower():
-                href = link.get('href')
-                if href:
-                    url = self._resolve_url(href)
+        Returns:
+            Tupla (scripts_do_head, acima_da_dobra). acima_da_dobra tem as
+            primeiras ABOVE_FOLD_IMAGES <img> sem loading="lazy", as com
+            fetchpriority="high" e os recursos de <link rel="preload">.
+        """
+        head_scripts: Set[str] = set()
+        above_fold: Set[str] = set()
+        images = 0
+        
+        for name, attrs, in_head in self.iter_tags(html_content):
+            if name == 'script':
+                url = self._resolve_url(attrs.get('src', ''))
+                if url and in_head:
+                    head_scripts.add(url)
+            
+            elif name == 'link':
+                rel = attrs.get('rel') or []
+                rel = (rel if isinstance(rel, str) else ' '.join(rel)).lower().split()
+                url = self._resolve_url(attrs.get('href', ''))
+                if url and 'preload' in rel:
+                    above_fold.add(url)
+            
+            else:
+                lazy = (attrs.get('loading') or '').lower() == 'lazy'
+                eager = (attrs.get('fetchpriority') or '').lower() == 'high'
+                if eager or (not lazy and images < self.ABOVE_FOLD_IMAGES):
+                    url = self._resolve_url(attrs.get('src', ''))
                     if url:
-                        assets['other'].add(url)
+                        above_fold.add(url)
+                    above_fold.update(self._srcset_urls(attrs.get('srcset', '')))
+                if not lazy:
+                    images += 1
         
-        # Extrai imagens de background em style inline
-        for tag in self._soup.find_all(style=True):
-            style = tag.get('style', '')
-            for match in self.CSS_URL_PATTERN.findall(style):
-                url = self._resolve_url(match)
-                if url:
-                    category = self._categorize_url(url)
-                    assets[category].add(url)
-        
-        # Extrai URLs de <style> tags
-        for style_tag in self._soup.find_all('style'):
-            if style_tag.string:
-                for match in self.CSS_URL_PATTERN.findall(style_tag.string):
-                    url = self._resolve_url(match)
-                    if url:
-                        category = self._categorize_url(url)
-                        assets[category].add(url)
-        
-        # Extrai preload/prefetch de recursos
-        for link in self._soup.find_all('link', rel=lambda x: x and ('preload' in x or 'prefetch' in x)):
-            href = link.get('href')
-            if href:
-                url = self._resolve_url(href)
+        return head_scripts, above_fold
+    
+    def extract_links(self, html_content: str) -> List[str]:
+        """
+        Extrai os links para outras páginas (<a href> e <area href>).
+        
+        Args:
+            html_content: Conteúdo HTML a analisar.
+            
+        Returns:
+            Lista de URLs absolutas sem fragmento, sem repetições, na ordem
+            em que aparecem no documento.
+        """
+        links = []
+        
+        for kind, _, value in self.iter_values(html_content):
+            if kind == 'link':
+                url = self._resolve_url(value)
                 if url:
-                    category = self._categorize_url(url)
-                    assets[category].add(url)
+                    links.append(self.strip_fragment(url))
         
-        # Converte sets para listas ordenadas
-        return {k: sorted(list(v)) for k, v in assets.items()}
+        return list(dict.fromkeys(links))
     
-    def extract_css_urls(self, css_content: str, css_url: str) -> List[str]:
+    def extract_css_refs(self, css_content: str, css_url: str) -> Tuple[List[str], List[str]]:
         """
-        Extrai todas as URLs de dentro de um arquivo CSS.
+        Extrai as URLs de dentro de um arquivo CSS, separando os @import.
         
         Args:
             css_content: Conteúdo do arquivo CSS.
-            css_url: URL do arquivo CSS (para resolver URLs relativas).
+            css_url: URL do arquivo CSS (as URLs relativas são resolvidas
+                contra ela, não contra a página).
             
         Returns:
-            Lista de URLs absolutas encontradas.
+            Tupla (imports, assets) de URLs absolutas normalizadas
+            (normalize_url(), sem fragmento) e sem repetições: as folhas de
+            estilo importadas e o resto (url() e image-set()). Assim
+            "a.png#x" e "a.png" são um download só, e as chaves batem com o
+            índice usado por FileOrganizer.rewrite_css_urls().
         """
-        urls = []
+        imports, assets = [], []
         
-        for match in self.CSS_URL_PATTERN.findall(css_content):
-            url = self._resolve_url(match, css_url)
+        for ref in css_refs(css_content):
+            url = self._resolve_url(ref.url, css_url)
             if url:
-                urls.append(url)
+                (imports if ref.kind == 'import' else assets).append(normalize_url(url))
         
-        return urls
+        return list(dict.fromkeys(imports)), list(dict.fromkeys(assets))
     
-    def rewrite_html_urls(self, html_content: str, url_map: Dict[str, str]) -> str:
+    def extract_css_urls(self, css_content: str, css_url: str) -> List[str]:
         """
-        Reescreve todas as URLs no HTML para apontar para caminhos locais.
+        Extrai todas as URLs de dentro de um arquivo CSS.
         
         Args:
-            html_content: Conteúdo HTML original.
+            css_content: Conteúdo do arquivo CSS.
+            css_url: URL do arquivo CSS (para resolver URLs relativas).
+            
+        Returns:
+            Lista de URLs absolutas encontradas (@import primeiro).
+        """
+        imports, assets = self.extract_css_refs(css_content, css_url)
+        return imports + [url for url in assets if url not in imports]
+    
+    def rewrite_value(self, value: str, kind: str, url_map: Dict[str, str],
+                      link_map: Optional[Dict[str, str]] = None) -> str:
+        """
+        Reescreve o valor de um atributo com URLs.
+        
+        Args:
+            value: Valor original do atributo.
+            kind: Tipo do atributo (veja classify_tag()).
             url_map: Mapa de URL original -> caminho local.
+            link_map: Mapa de URL de página -> arquivo HTML local.
             
         Returns:
-            HTML com URLs reescritas.
+            Novo valor (o próprio valor original se nada mudou).
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Reescreve <link href>
-        for link in soup.find_all('link', href=True):
-            original_href = link.get('href')
-            absolute_url = self._resolve_url(original_href)
-            if absolute_url in url_map:
-                link['href'] = url_map[absolute_url]
-        
-        # Reescreve <script src>
-        for script in soup.find_all('script', src=True):
-            original_src = script.get('src')
-            absolute_url = self._resolve_url(original_src)
-            if absolute_url in url_map:
-                script['src'] = url_map[absolute_url]
-        
-        # Reescreve <img src>
-        for img in soup.find_all('img', src=True):
-            original_src = img.get('src')
-            if not original_src.startswith('data:'):
-                absolute_url = self._resolve_url(original_src)
-                if absolute_url in url_map:
-                    img['src'] = url_map[absolute_url]
-        
-        # Reescreve <img srcset>
-        for img in soup.find_all('img', srcset=True):
-            srcset = img.get('srcset')
-            new_srcset_parts = []
-            for item in srcset.split(','):
-                parts = item.strip().split()
-                if parts:
-                    original_url = parts[0]
-                    absolute_url = self._resolve_url(original_url)
-                    if absolute_url in url_map:
-                        parts[0] = url_map[absolute_url]
-                    new_srcset_parts.append(' '.join(parts))
-            img['srcset'] = ', '.join(new_srcset_parts)
+        if kind == 'url':
+            # <link href>, <script src> e <img src>
+            return url_map.get(self._resolve_url(value), value)
         
-        # Reescreve <source srcset>
-        for source in soup.find_all('source', srcset=True):
-            srcset = source.get('srcset')
+        if kind == 'srcset':
+            # <img srcset> e <source srcset>
             new_srcset_parts = []
-            for item in srcset.split(','):
+            changed = False
+            for item in value.split(','):
                 parts = item.strip().split()
                 if parts:
-                    original_url = parts[0]
-                    absolute_url = self._resolve_url(original_url)
+                    absolute_url = self._resolve_url(parts[0])
                     if absolute_url in url_map:
                         parts[0] = url_map[absolute_url]
+                        changed = True
                     new_srcset_parts.append(' '.join(parts))
-            source['srcset'] = ', '.join(new_srcset_parts)
+            return ', '.join(new_srcset_parts) if changed else value
+        
+        if kind == 'style':
+            # Style inline com url()
+            return self._rewrite_css_urls(value, url_map)
+        
+        if kind == 'link' and link_map:
+            # Links para páginas copiadas, mantendo o fragmento
+            page_url, fragment = urldefrag(self._resolve_url(value))
+            if page_url in link_map:
+                return link_map[page_url] + (f'#{fragment}' if fragment else '')
+        
+        return value
+    
+    def rewrite_html_urls(self, html_content: str, url_map: Dict[str, str],
+                          link_map: Optional[Dict[str, str]] = None) -> str:
+        """
+        Reescreve todas as URLs no HTML para apontar para caminhos locais.
         
-        # Reescreve style inline com url()
-        for tag in soup.find_all(style=True):
-            style = tag.get('style', '')
-            new_style = self._rewrite_css_urls(style, url_map)
-            if new_style != style:
-                tag['style'] = new_style
+        Reaproveita a árvore de extract_assets() quando o documento é o
+        mesmo; a árvore é descartada depois, pois foi alterada.
+        
+        Args:
+            html_content: Conteúdo HTML original.
+            url_map: Mapa de URL original -> caminho local.
+            link_map: Mapa de URL de página -> arquivo HTML local, usado para
+                reescrever links entre páginas copiadas (<a href>).
+            
+        Returns:
+            HTML com URLs reescritas.
+        """
+        if self.is_streaming(html_content):
+            return ''.join(self.iter_rewrite_html(html_content, url_map, link_map))
         
-        # Reescreve <style> tags
-        for style_tag in soup.find_all('style'):
-            if style_tag.string:
-                new_css = self._rewrite_css_urls(style_tag.string, url_map)
-                style_tag.string = new_css
+        self._ensure_parsed(html_content)
+        
+        for tag, attr, kind, _ in self._refs:
+            if kind == 'style_tag':
+                # Tags <style>
+                if tag.string:
+                    tag.string = self._rewrite_css_urls(tag.string, url_map)
+                continue
+            
+            value = tag.get(attr)
+            new_value = self.rewrite_value(value, kind, url_map, link_map)
+            if new_value != value:
+                tag[attr] = new_value
         
         # Retorna HTML sem formatação adicional para preservar o original
-        return str(soup)
+        html = str(self._soup)
+        self._soup = None
+        self._html = None
+        self._refs = []
+        return html
+    
+    def iter_rewrite_html(self, html_content: str, url_map: Dict[str, str],
+                          link_map: Optional[Dict[str, str]] = None) -> Iterator[str]:
+        """
+        Reescreve as URLs do HTML emitindo o resultado em partes.
+        
+        Documentos grandes (veja STREAMING_THRESHOLD) são reescritos em
+        streaming: sem árvore, com memória quase constante e mantendo
+        intacto, byte a byte, tudo o que não é uma URL reescrita. Os menores
+        usam rewrite_html_urls() e saem em uma parte só.
+        
+        Args:
+            html_content: Conteúdo HTML original.
+            url_map: Mapa de URL original -> caminho local.
+            link_map: Mapa de URL de página -> arquivo HTML local.
+            
+        Yields:
+            Partes do HTML reescrito, na ordem.
+        """
+        if not self.is_streaming(html_content):
+            yield self.rewrite_html_urls(html_content, url_map, link_map)
+            return
+        
+        yield from StreamingRewriter(self).rewrite(html_content, url_map, link_map)
     
     def _rewrite_css_urls(self, css_content: str, url_map: Dict[str, str]) -> str:
         """
-        Reescreve URLs url() em conteúdo CSS.
+        Reescreve as URLs (url(), image-set() e @import) em conteúdo CSS.
         
         Args:
             css_content: Conteúdo CSS.
@@ -312,12 +541,4 @@ class HTMLParser:
         Returns:
             CSS com URLs reescritas.
         """
-        def replace_url(match):
-            original_url = match.group(1)
-            absolute_url = self._resolve_url(original_url)
-            
-            if absolute_url in url_map:
-                return f'url("{url_map[absolute_url]}")'
-            return match.group(0)
-        
-        return self.CSS_URL_PATTERN.sub(replace_url, css_content)
+        return rewrite_css_refs(css_content, lambda ref: url_map.get(self._resolve_url(ref.url)))
@@ -0,0 +1,616 @@
+"""
+Pool Module - Download concorrente de assets, por prioridade, com limite de
+conexões por host.
+"""
+
+import asyncio
+import heapq
+import itertools
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from .budget import REASON_DEADLINE, BudgetExceeded
+from .downloader import Downloader
+from .organizer import FileOrganizer
+
+if TYPE_CHECKING:
+    from .async_downloader import AsyncDownloader
+
+
+# Prioridades dos downloads (maior sai primeiro)
+PRIORITY_CRITICAL = 2     # CSS (e os que eles importam) e scripts do <head>
+PRIORITY_HIGH = 1         # imagens acima da dobra e recursos pré-carregados
+PRIORITY_BACKGROUND = 0   # todo o resto
+
+
+class DownloadPool:
+    """
+    Baixa assets em paralelo, por prioridade, e entrega cada resultado ao
+    FileOrganizer assim que o download termina.
+    
+    Os downloads agendados com schedule() saem em ordem de prioridade (e,
+    na mesma prioridade, na ordem de agendamento). Um host que já está no
+    limite de conexões não segura a fila: o worker livre pega o próximo
+    download de outro host.
+    
+    Os caminhos locais são reservados na ordem em que as URLs são
+    agendadas, antes de qualquer download, então o url_map final é o mesmo
+    independente da ordem em que as respostas chegam.
+    
+    Com um JobBudget no downloader, cada URL agendada ocupa uma vaga do
+    orçamento; quando ele se esgota (bytes ou tempo), o que ainda não
+    começou é descartado. O que fica de fora vai para skipped com o motivo.
+    """
+    
+    # Limites padrão: downloads simultâneos e conexões por host
+    DEFAULT_WORKERS = 8
+    DEFAULT_PER_HOST = 6
+    
+    def __init__(
+        self,
+        downloader: Downloader,
+        organizer: FileOrganizer,
+        max_workers: Optional[int] = None,
+        per_host_limit: Optional[int] = None
+    ):
+        """
+        Inicializa o pool.
+        
+        Args:
+            downloader: Downloader usado para as requisições.
+            organizer: Organizador que recebe os arquivos baixados.
+            max_workers: Número máximo de downloads simultâneos (None =
+                DEFAULT_WORKERS).
+            per_host_limit: Número máximo de conexões simultâneas por host
+                (None = DEFAULT_PER_HOST).
+        """
+        self.downloader = downloader
+        self.organizer = organizer
+        self.max_workers = max(1, max_workers or self.DEFAULT_WORKERS)
+        self.per_host_limit = max(1, per_host_limit or self.DEFAULT_PER_HOST)
+        self.budget = downloader.budget
+        self.metrics = downloader.metrics
+        
+        # URLs que ficaram fora da cópia -> motivo (budget.REASON_*)
+        self.skipped: Dict[str, str] = {}
+        
+        self._lock = threading.Condition()
+        self._scheduled: Set[str] = set()
+        self._outstanding = 0
+        self._cutoff: Optional[int] = None
+        self._cancel_reason = REASON_DEADLINE
+        self._results: 'queue.Queue[Tuple[str, Optional[str]]]' = queue.Queue()
+        self._order = itertools.count()
+        
+        # Uma fila (heap de (-prioridade, ordem, url)) por host, downloads em
+        # andamento por host e heap dos hosts com conexão livre e fila não
+        # vazia, pela cabeça da fila (entradas obsoletas são descartadas em _next)
+        self._hosts: Dict[str, List[Tuple[int, int, str]]] = {}
+        self._active: Dict[str, int] = {}
+        self._ready: List[Tuple[int, int, str]] = []
+        self._queued = 0
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+    
+    def __enter__(self) -> 'DownloadPool':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """Descarta o que ainda não começou e encerra as threads do pool."""
+        self.cancel()
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def schedule(
+        self,
+        urls: Iterable[str],
+        category: Optional[str] = None,
+        priority: int = PRIORITY_BACKGROUND
+    ) -> List[str]:
+        """
+        Agenda o download de URLs (as já agendadas são ignoradas).
+        
+        Args:
+            urls: URLs a baixar.
+            category: Categoria dos assets ('css', 'js', 'images', 'fonts',
+                'other') ou None para detectar pela extensão.
+            priority: Prioridade dos downloads (PRIORITY_*).
+            
+        Returns:
+            URLs efetivamente agendadas.
+        """
+        new = [url for url in dict.fromkeys(urls) if url not in self._scheduled]
+        
+        # Reserva os nomes na ordem de descoberta (determinístico)
+        for url in new:
+            self._scheduled.add(url)
+            self.organizer.reserve(url, category)
+        
+        with self._lock:
+            self._outstanding += len(new)
+            skip = self._cutoff is not None and priority <= self._cutoff
+        
+        for url in new:
+            if skip:
+                self._skip(url, self._cancel_reason, admitted=False)
+                continue
+            if self.budget is not None:
+                try:
+                    self.budget.admit()
+                except BudgetExceeded as e:
+                    self._skip(url, e.reason, admitted=False)
+                    continue
+            self._submit(url, priority)
+        return new
+    
+    def results(self, deadline: Optional[float] = None) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Entrega os resultados de todos os downloads agendados, inclusive
+        dos agendados durante a iteração.
+        
+        Args:
+            deadline: Momento (time.monotonic()) a partir do qual os
+                downloads de segundo plano que ainda não começaram são
+                descartados (veja cancel()).
+                
+        Yields:
+            Tuplas (url, caminho_local) na ordem em que os downloads terminam.
+            caminho_local é None quando o download falha ou é descartado.
+        """
+        budget_over = False
+        while True:
+            with self._lock:
+                if not self._outstanding:
+                    return
+            
+            # Orçamento esgotado (bytes ou tempo): nada mais começa
+            if not budget_over and self.budget is not None and (self.budget.expired() or self.budget.exhausted):
+                budget_over = True
+                self.cancel(reason=self.budget.exhausted)
+            
+            if deadline is not None and deadline <= time.monotonic():
+                self.cancel(PRIORITY_BACKGROUND, REASON_DEADLINE)
+                deadline = None
+            
+            # Acorda no próximo prazo, mesmo sem nenhum download terminar
+            wake = [deadline]
+            if not budget_over and self.budget is not None:
+                wake.append(self.budget.deadline_at)
+            wake = [t for t in wake if t is not None]
+            timeout = max(0.0, min(wake) - time.monotonic()) if wake else None
+            
+            try:
+                url, local_path = self._results.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            
+            with self._lock:
+                self._outstanding -= 1
+            yield url, local_path
+    
+    def download(
+        self,
+        urls: Iterable[str],
+        category: Optional[str] = None,
+        priority: int = PRIORITY_BACKGROUND
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Baixa um conjunto de URLs em paralelo (schedule() seguido de results()).
+        
+        Args:
+            urls: URLs a baixar (duplicadas são ignoradas).
+            category: Categoria dos assets ou None para detectar pela extensão.
+            priority: Prioridade dos downloads.
+                
+        Yields:
+            Tuplas (url, caminho_local) na ordem em que os downloads terminam.
+            caminho_local é None quando o download falha.
+        """
+        self.schedule(urls, category, priority)
+        yield from self.results()
+    
+    def cancel(self, max_priority: Optional[int] = None, reason: str = REASON_DEADLINE):
+        """
+        Descarta os downloads que ainda não começaram.
+        
+        Os descartados são entregues por results() como falhas e ficam em
+        skipped; os que já estão em andamento terminam normalmente.
+        
+        Args:
+            max_priority: Descarta só até esta prioridade, inclusive os
+                agendados daqui em diante (None = todos os pendentes).
+            reason: Motivo registrado em skipped.
+        """
+        with self._lock:
+            self._set_cutoff(max_priority)
+            self._cancel_reason = reason
+            dropped = []
+            for host, entries in list(self._hosts.items()):
+                kept = [entry for entry in entries if not self._cut(-entry[0], max_priority)]
+                dropped.extend(entry for entry in entries if self._cut(-entry[0], max_priority))
+                if kept:
+                    heapq.heapify(kept)
+                    self._hosts[host] = kept
+                else:
+                    del self._hosts[host]
+            self._queued -= len(dropped)
+            self._ready = []
+            for host in self._hosts:
+                self._mark_ready(host)
+        
+        for _, _, url in dropped:
+            self._skip(url, reason)
+    
+    @staticmethod
+    def _cut(priority: int, max_priority: Optional[int]) -> bool:
+        """Indica se um download desta prioridade é descartado por cancel(max_priority)."""
+        return max_priority is None or priority <= max_priority
+    
+    def _set_cutoff(self, max_priority: Optional[int]):
+        """Passa a descartar novos downloads até esta prioridade (requer self._lock)."""
+        if max_priority is not None:
+            self._cutoff = max_priority if self._cutoff is None else max(self._cutoff, max_priority)
+    
+    def _drop(self, url: str, reason: str, admitted: bool = True):
+        """
+        Libera o caminho reservado (e a vaga no orçamento, se a URL foi
+        admitida) de uma URL que ficou fora da cópia.
+        """
+        self.organizer.release(url)
+        self._exceeded(url, reason, admitted)
+    
+    def _exceeded(self, url: str, reason: str, admitted: bool = True):
+        """Registra uma URL fora da cópia, devolvendo sua vaga no orçamento."""
+        self.skipped[url] = reason
+        if admitted and self.budget is not None:
+            self.budget.release()
+    
+    def _skip(self, url: str, reason: str, admitted: bool = True):
+        """Descarta um download agendado, sem baixá-lo."""
+        self._drop(url, reason, admitted)
+        self._results.put((url, None))
+    
+    def _submit(self, url: str, priority: int):
+        """Coloca um download na fila dos workers."""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            entries = self._hosts.setdefault(host, [])
+            entry = (-priority, next(self._order), url)
+            heapq.heappush(entries, entry)
+            self._queued += 1
+            if entries[0] is entry:
+                self._mark_ready(host)
+            while len(self._threads) < min(self.max_workers, self._queued + self._running()):
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f'webcopy-download-{len(self._threads)}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            if self._active.get(host, 0) < self.per_host_limit:
+                self._lock.notify()
+    
+    def _running(self) -> int:
+        """Número de downloads em andamento (requer self._lock)."""
+        return sum(self._active.values())
+    
+    def _mark_ready(self, host: str):
+        """Põe o host entre os que têm download para começar, se tiver conexão livre (requer self._lock)."""
+        entries = self._hosts.get(host)
+        if entries and self._active.get(host, 0) < self.per_host_limit:
+            priority, order, _ = entries[0]
+            heapq.heappush(self._ready, (priority, order, host))
+    
+    def _next(self) -> Optional[Tuple[str, str]]:
+        """
+        Tira da fila o download mais prioritário de um host com conexão
+        livre (requer self._lock).
+        
+        Returns:
+            Tupla (url, host) ou None se nenhum host tem download e conexão livre.
+        """
+        while self._ready:
+            priority, order, host = heapq.heappop(self._ready)
+            entries = self._hosts.get(host)
+            if not entries or entries[0][:2] != (priority, order):
+                continue
+            if self._active.get(host, 0) >= self.per_host_limit:
+                continue
+            
+            _, _, url = heapq.heappop(entries)
+            if not entries:
+                del self._hosts[host]
+            self._queued -= 1
+            self._active[host] = self._active.get(host, 0) + 1
+            self._mark_ready(host)
+            return url, host
+        return None
+    
+    def _work(self):
+        """Loop de um worker: pega o próximo download e o executa."""
+        while True:
+            with self._lock:
+                task = self._next()
+                while task is None:
+                    if self._closed:
+                        return
+                    self._lock.wait()
+                    task = self._next()
+            url, host = task
+            
+            try:
+                local_path = self._fetch(url)
+            except Exception:
+                self.organizer.release(url)
+                local_path = None
+            finally:
+                with self._lock:
+                    self._active[host] -= 1
+                    # Libera um worker que esperava por uma conexão deste host
+                    if host in self._hosts:
+                        self._mark_ready(host)
+                        self._lock.notify()
+            
+            self._results.put((url, local_path))
+    
+    def _fetch(self, url: str) -> Optional[str]:
+        """Baixa uma URL direto para o caminho reservado (executa em worker)."""
+        path = self.organizer.reserved_path(url)
+        previous = self.organizer.previous_info(url)
+        try:
+            info = self.downloader.download_to_file(url, path, previous)
+        except BudgetExceeded as e:
+            self._exceeded(url, e.reason)
+            info = None
+        else:
+            self._record(url, info)
+        return self._finish(url, path, info, previous)
+    
+    def _record(self, url: str, info: Optional[Dict[str, Any]]):
+        """Registra o download nas métricas do job, se houver."""
+        if self.metrics is not None:
+            self.metrics.record_asset(url, info)
+    
+    def _finish(self, url: str, path: Path, info: Optional[Dict[str, Any]],
+                previous: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Registra o resultado de um download no organizador."""
+        if not info:
+            # Falha ao revalidar: mantém o arquivo da cópia anterior
+            if previous and path.exists():
+                return self.organizer.mark_saved(url, dict(previous, unchanged=True))
+            self.organizer.release(url)
+            return None
+        
+        return self.organizer.mark_saved(url, info)
+
+
+class _PriorityGate:
+    """Semáforo do asyncio que libera as vagas por ordem de prioridade."""
+    
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+    
+    async def acquire(self, priority: int) -> bool:
+        """
+        Espera uma vaga.
+        
+        Returns:
+            True com a vaga obtida, False se a espera foi cancelada por
+            cancel_waiting().
+        """
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return True
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._order), future))
+        return await future
+    
+    def release(self):
+        """Devolve uma vaga (ao próximo da fila, se houver)."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self._value += 1
+    
+    def cancel_waiting(self, max_priority: Optional[int] = None):
+        """Encerra as esperas até a prioridade informada (None = todas)."""
+        kept = []
+        for entry in self._waiters:
+            if max_priority is None or -entry[0] <= max_priority:
+                if not entry[2].done():
+                    entry[2].set_result(False)
+            else:
+                kept.append(entry)
+        heapq.heapify(kept)
+        self._waiters = kept
+
+
+class AsyncDownloadPool(DownloadPool):
+    """
+    Variante do DownloadPool baseada em asyncio.
+    
+    Todas as requisições rodam em um único event loop (em uma thread
+    dedicada) usando o AsyncDownloader, que multiplexa os downloads sobre
+    poucas conexões HTTP/2 por origem. A interface é a mesma do DownloadPool,
+    inclusive as prioridades: as vagas de cada host e as vagas globais são
+    liberadas primeiro para os downloads mais prioritários.
+    
+    Os limites padrão são bem maiores que os do DownloadPool: cada download
+    é só uma tarefa no loop, e as requisições a um host são streams
+    multiplexados nas mesmas conexões HTTP/2.
+    """
+    
+    DEFAULT_WORKERS = 64
+    DEFAULT_PER_HOST = 32
+    
+    def __init__(
+        self,
+        downloader: 'AsyncDownloader',
+        organizer: FileOrganizer,
+        max_workers: Optional[int] = None,
+        per_host_limit: Optional[int] = None
+    ):
+        """
+        Inicializa o pool assíncrono.
+        
+        Args:
+            downloader: AsyncDownloader usado para as requisições.
+            organizer: Organizador que recebe os arquivos baixados.
+            max_workers: Número máximo de downloads simultâneos (None =
+                DEFAULT_WORKERS).
+            per_host_limit: Número máximo de requisições simultâneas por
+                host (None = DEFAULT_PER_HOST).
+        """
+        super().__init__(downloader, organizer, max_workers, per_host_limit)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._async_slots: Dict[str, _PriorityGate] = {}
+        self._concurrency: Optional[_PriorityGate] = None
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Inicia o event loop em uma thread dedicada, sob demanda."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='webcopy-async-download',
+                    daemon=True
+                )
+                self._thread.start()
+            return self._loop
+    
+    def close(self):
+        """Fecha as conexões e encerra o event loop."""
+        if self._loop is not None:
+            self.cancel()
+            future = asyncio.run_coroutine_threadsafe(self.downloader.aclose(), self._loop)
+            future.result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+        super().close()
+    
+    def cancel(self, max_priority: Optional[int] = None, reason: str = REASON_DEADLINE):
+        """Descarta os downloads que ainda esperam uma vaga (veja DownloadPool.cancel)."""
+        with self._lock:
+            self._set_cutoff(max_priority)
+            self._cancel_reason = reason
+            loop = self._loop
+        if loop is None:
+            return
+        
+        def cancel_waiting():
+            for gate in [self._concurrency, *self._async_slots.values()]:
+                if gate is not None:
+                    gate.cancel_waiting(max_priority)
+        
+        loop.call_soon_threadsafe(cancel_waiting)
+    
+    async def _afetch(self, url: str, priority: int) -> Optional[str]:
+        """Baixa uma URL e salva no caminho reservado (executa no loop)."""
+        if self._cutoff is not None and priority <= self._cutoff:
+            return self._drop(url, self._cancel_reason)
+        if self._concurrency is None:
+            self._concurrency = _PriorityGate(self.max_workers)
+        
+        host = urlparse(url).netloc.lower()
+        slot = self._async_slots.get(host)
+        if slot is None:
+            slot = self._async_slots[host] = _PriorityGate(self.per_host_limit)
+        
+        # Primeiro a vaga do host: quem espera um host lotado não ocupa vaga global
+        if not await slot.acquire(priority):
+            return self._drop(url, self._cancel_reason)
+        try:
+            if not await self._concurrency.acquire(priority):
+                return self._drop(url, self._cancel_reason)
+            try:
+                path = self.organizer.reserved_path(url)
+                previous = self.organizer.previous_info(url)
+                try:
+                    info = await self.downloader.download_to_file(url, path, previous)
+                except BudgetExceeded as e:
+                    self._exceeded(url, e.reason)
+                    info = None
+                else:
+                    self._record(url, info)
+            finally:
+                self._concurrency.release()
+        finally:
+            slot.release()
+        
+        # mark_saved() pode copiar o arquivo para o BlobStore ou comprimi-lo
+        # no zip/tar: roda no executor, sem parar os demais downloads
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._finish, url, path, info, previous
+        )
+    
+    def _submit(self, url: str, priority: int):
+        """Agenda o download no event loop."""
+        loop = self._get_loop()
+        
+        def collect(future):
+            try:
+                local_path = future.result()
+            except Exception:
+                self.organizer.release(url)
+                local_path = None
+            self._results.put((url, local_path))
+        
+        future = asyncio.run_coroutine_threadsafe(self._afetch(url, priority), loop)
+        future.add_done_callback(collect)
+
+
+def create_pool(
+    downloader: Downloader,
+    organizer: FileOrganizer,
+    max_workers: Optional[int] = None,
+    per_host_limit: Optional[int] = None,
+    use_async: bool = False
+) -> DownloadPool:
+    """
+    Cria o pool de downloads adequado.
+    
+    Args:
+        downloader: Downloader síncrono (usado quando use_async=False).
+        organizer: Organizador que recebe os arquivos baixados.
+        max_workers: Número máximo de downloads simultâneos (None = padrão
+            do pool: 8 com threads, 64 com asyncio).
+        per_host_limit: Número máximo de conexões simultâneas por host
+            (None = padrão do pool: 6 com threads, 32 com asyncio).
+        use_async: Usa o AsyncDownloader (asyncio + HTTP/2).
+        
+    Returns:
+        DownloadPool ou AsyncDownloadPool.
+    """
+    if use_async:
+        from .async_downloader import AsyncDownloader
+        async_downloader = AsyncDownloader(
+            timeout=downloader.timeout,
+            cache=downloader.cache,
+            rate_limiter=downloader.rate_limiter,
+            budget=downloader.budget,
+            metrics=downloader.metrics
+        )
+        return AsyncDownloadPool(async_downloader, organizer, max_workers, per_host_limit)
+    
+    return DownloadPool(downloader, organizer, max_workers, per_host_limit)
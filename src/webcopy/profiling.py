@@ -0,0 +1,251 @@
+"""
+Profiling Module - Perfil de CPU (cProfile) e de memória (tracemalloc) de
+uma cópia.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# Diretório do pacote: separa as funções do WebCopy das demais no resumo
+PACKAGE_DIR = str(Path(__file__).resolve().parent)
+
+# Um perfil por vez no processo: threading.setprofile e tracemalloc são globais
+_profile_lock = threading.Lock()
+
+# A partir do Python 3.12 o cProfile usa sys.monitoring: um único profiler
+# ativo no processo, que já enxerga todas as threads
+PROFILER_PER_THREAD = sys.version_info < (3, 12)
+
+
+class JobProfiler:
+    """
+    Perfil de CPU e memória de um job.
+    
+    O cProfile mede a thread que chamou start() e todas as threads criadas
+    até stop() (pool de downloads, event loop do modo assíncrono,
+    rastreamento). Até o Python 3.11 cada thread tem seu próprio profiler e
+    os resultados são somados no final; no 3.12+ um único profiler já mede
+    todas as threads do processo. Em um processo com vários jobs simultâneos (interface
+    web), threads criadas por outros jobs nesse intervalo também entram.
+    
+    O tracemalloc registra as alocações de todo o processo e o pico de
+    memória rastreada durante o perfil.
+    
+    Como os ganchos são globais, só um perfil roda por vez: start() espera
+    o perfil anterior terminar.
+    """
+    
+    # Quadros guardados por alocação (1 basta para agrupar por linha)
+    MEMORY_FRAMES = 1
+    
+    def __init__(self, memory: bool = True):
+        """
+        Args:
+            memory: Também registra as alocações com tracemalloc (mais lento).
+        """
+        self.memory = memory
+        self.stats: Optional[pstats.Stats] = None
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_memory = 0
+        self._profiler: Optional[cProfile.Profile] = None
+        self._thread_profilers: List[cProfile.Profile] = []
+        self._started_tracemalloc = False
+        self._lock = threading.Lock()
+    
+    def _thread_hook(self, frame, event, arg):
+        """Primeiro evento de uma thread nova: passa a medi-la com um profiler próprio."""
+        sys.setprofile(None)
+        # Nunca derruba a thread medida: sem profiler, ela só fica fora do perfil
+        try:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        except Exception:
+            return
+        with self._lock:
+            self._thread_profilers.append(profiler)
+    
+    def start(self):
+        """Começa o perfil (espera, se outro estiver em andamento)."""
+        _profile_lock.acquire()
+        try:
+            if self.memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(self.MEMORY_FRAMES)
+                    self._started_tracemalloc = True
+                if hasattr(tracemalloc, 'reset_peak'):
+                    tracemalloc.reset_peak()
+            
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+            if PROFILER_PER_THREAD:
+                threading.setprofile(self._thread_hook)
+        except BaseException:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            self._profiler = None
+            _profile_lock.release()
+            raise
+    
+    def stop(self):
+        """Encerra o perfil e junta os resultados de todas as threads."""
+        if self._profiler is None:
+            return
+        try:
+            if PROFILER_PER_THREAD:
+                threading.setprofile(None)
+            self._profiler.disable()
+            
+            self.stats = pstats.Stats(self._profiler)
+            with self._lock:
+                profilers = list(self._thread_profilers)
+            for profiler in profilers:
+                profiler.disable()
+                try:
+                    self.stats.add(profiler)
+                except TypeError:
+                    # Thread que ainda não registrou nenhuma chamada
+                    pass
+            
+            if self.memory:
+                self.peak_memory = tracemalloc.get_traced_memory()[1]
+                self.snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+                    tracemalloc.Filter(False, '<unknown>'),
+                ))
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+        finally:
+            self._profiler = None
+            _profile_lock.release()
+    
+    def __enter__(self) -> 'JobProfiler':
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+    
+    @staticmethod
+    def _label(key) -> str:
+        """Nome de uma função do pstats: arquivo:linha(função)."""
+        filename, lineno, name = key
+        if filename.startswith(PACKAGE_DIR):
+            filename = 'webcopy' + filename[len(PACKAGE_DIR):].replace('\\', '/')
+        elif filename != '~':
+            filename = Path(filename).name
+        return f'{filename}:{lineno}({name})' if filename != '~' else name
+    
+    def hot_functions(self, top: int = 15, package_only: bool = True,
+                      sort: str = 'cumulative') -> List[Dict[str, Any]]:
+        """
+        Funções que mais tempo gastaram.
+        
+        Args:
+            top: Número de funções.
+            package_only: Só funções do WebCopy (HTMLParser, FileOrganizer,
+                Downloader, pool...).
+            sort: 'cumulative' (incluindo as funções chamadas) ou 'self'
+                (só o código da própria função).
+                
+        Returns:
+            Lista de dicts com 'function', 'calls', 'self' e 'cumulative'
+            (segundos).
+        """
+        if self.stats is None:
+            return []
+        rows = []
+        for key, (_, calls, self_time, cumulative, _) in self.stats.stats.items():
+            if package_only and not key[0].startswith(PACKAGE_DIR):
+                continue
+            rows.append({
+                'function': self._label(key),
+                'calls': calls,
+                'self': round(self_time, 4),
+                'cumulative': round(cumulative, 4),
+            })
+        rows.sort(key=lambda row: row['cumulative' if sort == 'cumulative' else 'self'], reverse=True)
+        return rows[:top]
+    
+    def memory_summary(self, top: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        Pico de memória rastreada e as linhas que mais alocaram.
+        
+        Returns:
+            Dict com 'peak_mb', 'retained_mb' (ainda alocado no fim) e 'top'
+            (lista com 'line', 'size_kb', 'count'), ou None sem tracemalloc.
+        """
+        if self.snapshot is None:
+            return None
+        statistics = self.snapshot.statistics('lineno')
+        return {
+            'peak_mb': round(self.peak_memory / (1024 * 1024), 2),
+            'retained_mb': round(sum(stat.size for stat in statistics) / (1024 * 1024), 2),
+            'top': [
+                {
+                    'line': f'{self._label((frame.filename, frame.lineno, "")).rstrip("()")}',
+                    'size_kb': round(stat.size / 1024, 1),
+                    'count': stat.count,
+                }
+                for stat in statistics[:top]
+                for frame in [stat.traceback[0]]
+            ],
+        }
+    
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        """Resumo para o resultado do job: funções mais quentes e memória."""
+        return {
+            'hot_functions': self.hot_functions(top),
+            'top_self': self.hot_functions(top, package_only=False, sort='self'),
+            'memory': self.memory_summary(top),
+        }
+    
+    def save(self, directory: Path) -> Dict[str, str]:
+        """
+        Grava o perfil em um diretório.
+        
+        Arquivos:
+            cpu.pstats: perfil de CPU (python -m pstats, snakeviz...).
+            memory.tracemalloc: snapshot de memória
+                (tracemalloc.Snapshot.load()).
+            report.txt: as funções mais caras e as maiores alocações.
+            
+        Returns:
+            Mapa tipo -> caminho dos arquivos gravados.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        files = {}
+        report = io.StringIO()
+        
+        if self.stats is not None:
+            files['cpu'] = str(directory / 'cpu.pstats')
+            self.stats.dump_stats(files['cpu'])
+            
+            self.stats.stream = report
+            report.write('== Tempo acumulado ==\n')
+            self.stats.sort_stats('cumulative').print_stats(40)
+            report.write('\n== Tempo próprio ==\n')
+            self.stats.sort_stats('tottime').print_stats(40)
+            self.stats.stream = sys.stdout
+        
+        if self.snapshot is not None:
+            files['memory'] = str(directory / 'memory.tracemalloc')
+            self.snapshot.dump(files['memory'])
+            
+            report.write(f'\n== Memória (pico: {self.peak_memory / (1024 * 1024):.1f} MB) ==\n')
+            for stat in self.snapshot.statistics('lineno')[:40]:
+                report.write(f'{stat}\n')
+        
+        files['report'] = str(directory / 'report.txt')
+        Path(files['report']).write_text(report.getvalue(), encoding='utf-8')
+        return files
@@ -0,0 +1,322 @@
+"""
+Rate Limit Module - Limite adaptativo de requisições por origem.
+"""
+
+import asyncio
+import time
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import urlparse
+
+
+# Status com que o servidor pede para diminuir o ritmo
+THROTTLE_STATUS = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Lê o header Retry-After.
+    
+    Args:
+        value: Segundos ("120") ou data HTTP ("Wed, 21 Oct 2026 07:28:00 GMT").
+        
+    Returns:
+        Segundos a esperar (>= 0), ou None se o header faltar ou for inválido.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def origin_of(url: str) -> str:
+    """Origem (esquema://host:porta) de uma URL."""
+    parsed = urlparse(url)
+    return f'{parsed.scheme.lower()}://{parsed.netloc.lower()}'
+
+
+class OriginBucket:
+    """
+    Token bucket de uma origem, com taxa ajustada pelas respostas (AIMD).
+    
+    Sem taxa inicial, a origem não tem limite (só o de conexões do pool)
+    até o primeiro sinal de sobrecarga; a primeira redução parte do ritmo
+    medido no último segundo. Cada resposta normal aumenta a taxa: rápido
+    no começo (+1 req/s por resposta, como o slow start do TCP) e devagar
+    depois da primeira redução (+1 req/s por segundo). 429/503 cortam a
+    taxa pela metade e
+    bloqueiam a origem pelo Retry-After; erros de servidor e de rede, e
+    latência muito acima da usual, a reduzem menos. Reduções próximas
+    contam como uma só, já que as requisições em andamento costumam
+    falhar juntas.
+    """
+    
+    # Fatores de redução da taxa
+    THROTTLE_DECREASE = 0.5
+    ERROR_DECREASE = 0.75
+    LATENCY_DECREASE = 0.9
+    
+    # Intervalo mínimo (segundos) entre duas reduções
+    DECREASE_INTERVAL = 1.0
+    
+    # Latência (média recente) acima deste múltiplo da usual indica sobrecarga
+    LATENCY_FACTOR = 3.0
+    
+    # Latências abaixo disto (segundos) nunca indicam sobrecarga
+    LATENCY_FLOOR = 0.25
+    
+    # Espera usada em 429/503 sem Retry-After (dobra a cada falha seguida)
+    BACKOFF_BASE = 1.0
+    
+    # Janela (segundos) em que o ritmo das respostas é medido sem limite
+    RATE_WINDOW = 1.0
+    
+    def __init__(self, rate: Optional[float], min_rate: float, max_rate: Optional[float],
+                 burst: float, max_retry_after: float):
+        """
+        Args:
+            rate: Taxa inicial (requisições por segundo) ou None para não
+                limitar até o primeiro sinal de sobrecarga.
+            min_rate: Taxa mínima.
+            max_rate: Taxa máxima (None = sem teto).
+            burst: Número de requisições que podem sair de uma vez.
+            max_retry_after: Espera máxima (segundos) aceita de um Retry-After.
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = max(1.0, burst)
+        self.max_retry_after = max_retry_after
+        
+        self.tokens = self.burst
+        self.blocked_until = 0.0
+        self.slow_start = True
+        self.latency: Optional[float] = None
+        self.usual_latency: Optional[float] = None
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        
+        self._failures = 0
+        self._updated = time.monotonic()
+        self._decreased = 0.0
+        self._responses: Deque[float] = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """
+        Tenta reservar uma requisição.
+        
+        Returns:
+            0 se a requisição pode sair agora; senão, quanto esperar
+            (segundos) antes de tentar de novo.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.rate is None:
+                return 0.0
+            
+            if now > self._updated:
+                self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    
+    def record(self, status: Optional[int], latency: Optional[float] = None,
+               retry_after: Optional[float] = None) -> float:
+        """
+        Ajusta a taxa conforme uma resposta.
+        
+        Args:
+            status: Status HTTP, ou None se a requisição falhou (timeout,
+                conexão recusada...).
+            latency: Tempo (segundos) até a resposta.
+            retry_after: Valor do Retry-After, em segundos.
+            
+        Returns:
+            Por quanto tempo (segundos) a origem fica bloqueada.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            if self.rate is None:
+                self._responses.append(now)
+                while self._responses[0] < now - self.RATE_WINDOW:
+                    self._responses.popleft()
+            
+            if status in THROTTLE_STATUS:
+                self.throttled += 1
+                self._failures += 1
+                if retry_after is None:
+                    retry_after = self.BACKOFF_BASE * 2 ** min(self._failures - 1, 6)
+                self.blocked_until = max(self.blocked_until, now + min(retry_after, self.max_retry_after))
+                self._decrease(now, self.THROTTLE_DECREASE)
+                
+                # Sem rajada ao fim do bloqueio: os tokens voltam a encher
+                # só a partir dele, já na taxa reduzida
+                self.tokens = 0.0
+                self._updated = self.blocked_until
+            
+            elif status is None or status >= 500:
+                self.errors += 1
+                self._decrease(now, self.ERROR_DECREASE)
+            
+            else:
+                self._failures = 0
+                if self._congested(latency):
+                    self._decrease(now, self.LATENCY_DECREASE)
+                elif self.rate is None:
+                    pass
+                elif self.slow_start:
+                    self.rate = self._capped(self.rate + 1)
+                else:
+                    self.rate = self._capped(self.rate + 1 / self.rate)
+            
+            return max(0.0, self.blocked_until - now)
+    
+    def _congested(self, latency: Optional[float]) -> bool:
+        """Atualiza as médias de latência e diz se ela está alta demais."""
+        if latency is None:
+            return False
+        if self.latency is None:
+            self.latency = self.usual_latency = latency
+            return False
+        
+        # Média recente (reage rápido) e usual (acompanha devagar)
+        self.latency = 0.7 * self.latency + 0.3 * latency
+        self.usual_latency = 0.98 * self.usual_latency + 0.02 * latency
+        return self.latency > max(self.LATENCY_FLOOR, self.LATENCY_FACTOR * self.usual_latency)
+    
+    def _capped(self, rate: float) -> float:
+        """Aplica a taxa máxima."""
+        return rate if self.max_rate is None else min(self.max_rate, rate)
+    
+    def _decrease(self, now: float, factor: float):
+        """Reduz a taxa (requer self._lock)."""
+        if now - self._decreased < self.DECREASE_INTERVAL:
+            return
+        self._decreased = now
+        self.slow_start = False
+        if self.rate is None:
+            # Primeiro sinal: passa a limitar a partir do ritmo medido
+            measured = len(self._responses) / self.RATE_WINDOW
+            self._responses.clear()
+            self.rate = self._capped(max(self.min_rate, measured))
+            self.tokens = 1.0
+            self._updated = now
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.tokens = min(self.tokens, 1.0)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual da origem."""
+        with self._lock:
+            return {
+                'rate': round(self.rate, 2) if self.rate is not None else None,
+                'blocked_for': round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'latency_ms': round(self.latency * 1000) if self.latency is not None else None,
+            }
+
+
+class AdaptiveRateLimiter:
+    """
+    Limita as requisições de cada origem com um OriginBucket.
+    
+    Uma mesma instância pode (e deve) ser compartilhada por todos os
+    downloaders que acessam as mesmas origens, inclusive entre jobs, para
+    que um 429 recebido por um deles segure todos.
+    """
+    
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        min_rate: float = 0.5,
+        burst: float = 10.0,
+        max_retry_after: float = 60.0,
+        max_origins: int = 1024
+    ):
+        """
+        Inicializa o limitador.
+        
+        Args:
+            rate: Taxa inicial por origem (requisições por segundo). None
+                (padrão) não limita a origem até o primeiro 429/503, erro
+                ou aumento de latência (ou começa em max_rate, se houver);
+                até lá valem só os limites de conexões.
+            max_rate: Taxa máxima por origem (None = sem teto).
+            min_rate: Taxa mínima por origem.
+            burst: Requisições que uma origem pode receber de uma vez.
+            max_retry_after: Espera máxima (segundos) aceita de um Retry-After.
+            max_origins: Número de origens guardadas (as usadas há mais
+                tempo são esquecidas).
+        """
+        if max_rate is not None:
+            rate = max_rate if rate is None else min(rate, max_rate)
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, rate) if rate is not None else min_rate
+        self.burst = burst
+        self.max_retry_after = max_retry_after
+        self.max_origins = max_origins
+        self._origins: 'OrderedDict[str, OriginBucket]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def bucket(self, url: str) -> OriginBucket:
+        """Retorna o OriginBucket da origem da URL."""
+        origin = origin_of(url)
+        with self._lock:
+            bucket = self._origins.get(origin)
+            if bucket is None:
+                bucket = OriginBucket(self.rate, self.min_rate, self.max_rate,
+                                      self.burst, self.max_retry_after)
+                self._origins[origin] = bucket
+                while len(self._origins) > self.max_origins:
+                    self._origins.popitem(last=False)
+            else:
+                self._origins.move_to_end(origin)
+            return bucket
+    
+    def wait(self, url: str):
+        """Bloqueia até que uma requisição à origem da URL seja permitida."""
+        bucket = self.bucket(url)
+        delay = bucket.acquire()
+        while delay > 0:
+            time.sleep(delay)
+            delay = bucket.acquire()
+    
+    async def wait_async(self, url: str):
+        """Versão asyncio de wait()."""
+        bucket = self.bucket(url)
+        delay = bucket.acquire()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = bucket.acquire()
+    
+    def record(self, url: str, status: Optional[int], latency: Optional[float] = None,
+               retry_after: Optional[float] = None) -> float:
+        """Registra uma resposta da origem da URL (veja OriginBucket.record)."""
+        return self.bucket(url).record(status, latency, retry_after)
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Estado de cada origem (origem -> OriginBucket.stats())."""
+        with self._lock:
+            buckets = list(self._origins.items())
+        return {origin: bucket.stats() for origin, bucket in buckets}
@@ -0,0 +1,221 @@
+"""
+Rewriter Module - Leitura e reescrita de HTML em streaming, sem montar a árvore.
+
+Usado pelo HTMLParser em documentos grandes: um tokenizador baseado em
+regex percorre o HTML uma única vez, encontra as tags e os atributos com
+URLs e emite a saída em partes. Só os valores reescritos mudam; todo o
+resto do documento é copiado byte a byte.
+"""
+
+import re
+from html import escape, unescape
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .parser import HTMLParser
+
+
+# Comentários, doctype, <?...?> e tags de fechamento são copiados como estão;
+# tags de abertura capturam o nome (grupo 1) e o texto dos atributos (grupo 2)
+MARKUP_PATTERN = re.compile(
+    r'<(?:'
+    r'!--.*?(?:-->|\Z)'
+    r'|[!?/][^>]*(?:>|\Z)'
+    r'|([a-zA-Z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)(?:>|\Z)'
+    r')',
+    re.DOTALL
+)
+
+# Atributo: nome e, opcionalmente, = valor (com aspas duplas, simples ou sem aspas)
+ATTRIBUTE_PATTERN = re.compile(r'([^\s"\'>/=]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+
+# Elementos cujo conteúdo é texto puro (não contém tags)
+RAW_TEXT_PATTERNS = {
+    'script': re.compile(r'</script[\s/>]', re.IGNORECASE),
+    'style': re.compile(r'</style[\s/>]', re.IGNORECASE),
+}
+
+# Tipos de token
+TEXT, TAG, RAW_TEXT = 'text', 'tag', 'raw'
+
+
+def iter_tokens(html: str) -> Iterator[Tuple[str, int, int, Optional['re.Match']]]:
+    """
+    Divide o HTML em tokens, em uma única passada.
+    
+    Args:
+        html: Documento HTML.
+        
+    Yields:
+        Tuplas (tipo, início, fim, match). tipo é TEXT (texto e marcação
+        copiados sem alteração), TAG (tag de abertura; match é o da tag) ou
+        RAW_TEXT (conteúdo de <script>/<style>; match é o da tag de abertura).
+    """
+    pos = 0
+    length = len(html)
+    
+    while pos < length:
+        match = MARKUP_PATTERN.search(html, pos)
+        if match is None:
+            yield TEXT, pos, length, None
+            return
+        
+        if match.start() > pos:
+            yield TEXT, pos, match.start(), None
+        pos = match.end()
+        
+        name = match.group(1)
+        if name is None:
+            yield TEXT, match.start(), pos, None
+            continue
+        
+        yield TAG, match.start(), pos, match
+        
+        closing = RAW_TEXT_PATTERNS.get(name.lower())
+        if closing and not match.group(2).rstrip().endswith('/'):
+            end_match = closing.search(html, pos)
+            end = end_match.start() if end_match else length
+            yield RAW_TEXT, pos, end, match
+            pos = end
+
+
+def parse_attributes(attribute_text: str) -> List[Tuple[str, str, int, int, str]]:
+    """
+    Lê os atributos de uma tag de abertura.
+    
+    Args:
+        attribute_text: Texto entre o nome da tag e o ">".
+        
+    Returns:
+        Lista de (nome em minúsculas, valor decodificado, início e fim do
+        valor em attribute_text, aspas usadas). Atributos sem valor são
+        ignorados.
+    """
+    attributes = []
+    for match in ATTRIBUTE_PATTERN.finditer(attribute_text):
+        raw = match.group(2)
+        if raw is None:
+            continue
+        quote = raw[0] if raw[0] in '"\'' else ''
+        value = raw[1:-1] if quote else raw
+        attributes.append((match.group(1).lower(), unescape(value), match.start(2), match.end(2), quote))
+    return attributes
+
+
+def _quote(value: str, quote: str) -> str:
+    """Serializa um valor de atributo com as aspas originais (ou duplas)."""
+    quote = quote or '"'
+    # Como o BeautifulSoup: evita &quot; quando aspas simples resolvem
+    if quote in value and ('"' if quote == "'" else "'") not in value:
+        quote = '"' if quote == "'" else "'"
+    return quote + escape(value, quote=False).replace(quote, '&quot;' if quote == '"' else '&#x27;') + quote
+
+
+class StreamingRewriter:
+    """
+    Extrai e reescreve as URLs de um documento HTML sem montar a árvore.
+    
+    Quais atributos contêm URLs, e como cada valor é reescrito, é decidido
+    pelo HTMLParser (as mesmas regras da versão com BeautifulSoup); esta
+    classe só cuida de encontrar e substituir os valores no texto.
+    """
+    
+    def __init__(self, parser: 'HTMLParser'):
+        """
+        Args:
+            parser: HTMLParser da página (resolve URLs e classifica atributos).
+        """
+        self.parser = parser
+    
+    def _tag_attributes(self, match: 're.Match'):
+        """Atributos com URL de uma tag: (especificação, ocorrências)."""
+        attributes = parse_attributes(match.group(2))
+        values = {name: value for name, value, _, _, _ in attributes}
+        specs = self.parser.classify_tag(match.group(1).lower(), values)
+        return specs, values, attributes
+    
+    def iter_values(self, html: str) -> Iterator[Tuple[str, list, str]]:
+        """
+        Percorre os valores com URLs do documento.
+        
+        Yields:
+            Tuplas (tipo, categorias, valor), como HTMLParser.iter_values().
+        """
+        for kind, start, end, match in iter_tokens(html):
+            if kind == TAG:
+                specs, values, _ = self._tag_attributes(match)
+                for attr, attr_kind, categories in specs:
+                    yield attr_kind, categories, values[attr]
+            elif kind == RAW_TEXT and match.group(1).lower() == 'style' and end > start:
+                yield 'style_tag', [], html[start:end]
+    
+    def iter_tags(self, html: str, names: Tuple[str, ...]) -> Iterator[Tuple[str, Dict[str, str], bool]]:
+        """
+        Percorre as tags de abertura com os nomes informados.
+        
+        Yields:
+            Tuplas (nome, atributos, dentro_do_head), como HTMLParser.iter_tags().
+        """
+        in_head = False
+        for kind, start, end, match in iter_tokens(html):
+            if kind == TAG:
+                name = match.group(1).lower()
+                if name == 'head':
+                    in_head = True
+                elif name == 'body':
+                    in_head = False
+                elif name in names:
+                    attributes = {attr: value for attr, value, _, _, _ in parse_attributes(match.group(2))}
+                    yield name, attributes, in_head
+            elif kind == TEXT and html.startswith('</', start) and html[start + 2:end].strip('> \t\r\n').lower() == 'head':
+                in_head = False
+    
+    def rewrite(self, html: str, url_map: Dict[str, str],
+                link_map: Optional[Dict[str, str]] = None) -> Iterator[str]:
+        """
+        Reescreve as URLs do documento, emitindo a saída em partes.
+        
+        Args:
+            html: Documento HTML original.
+            url_map: Mapa de URL original -> caminho local.
+            link_map: Mapa de URL de página -> arquivo HTML local.
+            
+        Yields:
+            Partes do HTML reescrito, na ordem.
+        """
+        for kind, start, end, match in iter_tokens(html):
+            if kind == TAG:
+                yield self._rewrite_tag(match, url_map, link_map)
+            elif kind == RAW_TEXT and match.group(1).lower() == 'style':
+                yield self.parser._rewrite_css_urls(html[start:end], url_map)
+            else:
+                yield html[start:end]
+    
+    def _rewrite_tag(self, match: 're.Match', url_map: Dict[str, str],
+                     link_map: Optional[Dict[str, str]]) -> str:
+        """Reescreve os atributos com URL de uma tag de abertura."""
+        specs, values, attributes = self._tag_attributes(match)
+        
+        replacements = {}
+        for attr, kind, _ in specs:
+            new_value = self.parser.rewrite_value(values[attr], kind, url_map, link_map)
+            if new_value != values[attr]:
+                replacements[attr] = new_value
+        
+        if not replacements:
+            return match.group(0)
+        
+        # Troca só os valores alterados dentro do texto original da tag
+        text = match.group(2)
+        parts = []
+        pos = 0
+        for name, _, start, end, quote in attributes:
+            if name in replacements:
+                parts.append(text[pos:start])
+                parts.append(_quote(replacements[name], quote))
+                pos = end
+        parts.append(text[pos:])
+        
+        offset = match.start(2) - match.start()
+        tag = match.group(0)
+        return tag[:offset] + ''.join(parts) + tag[offset + len(text):]
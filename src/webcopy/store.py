@@ -0,0 +1,165 @@
+"""
+Store Module - Armazenamento de assets endereçado por conteúdo (SHA-256).
+"""
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .organizer import AtomicWriter
+
+
+# ioctl FICLONE do Linux (reflink em btrfs/xfs)
+FICLONE = 0x40049409
+
+
+def _reflink(source: Path, dest: Path) -> bool:
+    """Tenta clonar um arquivo por reflink (copy-on-write). Retorna True se conseguiu."""
+    if fcntl is None:
+        return False
+    try:
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dest)
+        except OSError:
+            pass
+        return False
+
+
+class BlobStore:
+    """
+    Guarda cada conteúdo distinto uma única vez, identificado pelo SHA-256.
+    
+    Os arquivos das cópias (output/<site>/...) apontam para os blobs via
+    hardlink; se o sistema de arquivos não suportar, tenta reflink e, por
+    último, faz uma cópia comum. Conteúdos idênticos — entre jobs ou entre
+    URLs diferentes da mesma página — ocupam espaço em disco uma vez só.
+    
+    Arquivos ligados a um blob nunca devem ser alterados no lugar: quem
+    precisar reescrevê-los deve gravar um arquivo novo e substituir o antigo
+    (o FileOrganizer já faz isso).
+    """
+    
+    def __init__(self, root: Path):
+        """
+        Inicializa o store.
+        
+        Args:
+            root: Diretório dos blobs. Deve estar no mesmo sistema de arquivos
+                das cópias para que hardlinks funcionem.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'blobs': 0, 'deduplicated': 0, 'bytes_saved': 0}
+    
+    def blob_path(self, digest: str) -> Path:
+        """Caminho do blob de um hash SHA-256 (hex)."""
+        return self.root / digest[:2] / digest[2:4] / digest
+    
+    def contains(self, digest: str) -> bool:
+        """Verifica se um conteúdo já está no store."""
+        return self.blob_path(digest).exists()
+    
+    def ingest(self, path: Path, digest: str) -> Path:
+        """
+        Move um arquivo recém-gravado para o store e o substitui por um link.
+        
+        Se o conteúdo já existe no store, o arquivo é trocado por um link
+        para o blob existente e o espaço duplicado é liberado.
+        
+        Args:
+            path: Arquivo gravado na cópia.
+            digest: SHA-256 (hex) do conteúdo do arquivo.
+            
+        Returns:
+            Caminho do blob.
+        """
+        path = Path(path)
+        blob = self.blob_path(digest)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        
+        with self._lock:
+            if blob.exists():
+                self.stats['deduplicated'] += 1
+                self.stats['bytes_saved'] += path.stat().st_size
+            else:
+                self.stats['blobs'] += 1
+                # Arquivo com outro link (ex: o corpo no cache HTTP) não vira
+                # o blob: gc() conta os links para achar blobs sem cópias
+                shared = path.stat().st_nlink > 1
+                if not shared:
+                    try:
+                        # O próprio arquivo vira o blob (mesmo inode, sem cópia)
+                        os.link(path, blob)
+                        return blob
+                    except OSError:
+                        pass
+                # Blob independente (reflink ou cópia); em outro sistema de
+                # arquivos a cópia fica como está
+                if not _reflink(path, blob):
+                    with AtomicWriter(blob) as writer, open(path, 'rb') as src:
+                        shutil.copyfileobj(src, writer)
+                if not shared:
+                    return blob
+        
+        self.link(digest, path)
+        return blob
+    
+    def link(self, digest: str, dest: Path):
+        """
+        Materializa um blob em um caminho da cópia.
+        
+        Usa hardlink; se não for possível, reflink; por último, cópia.
+        
+        Args:
+            digest: SHA-256 (hex) do conteúdo.
+            dest: Caminho de destino (substituído se já existir).
+        """
+        blob = self.blob_path(digest)
+        dest = Path(dest)
+        tmp = dest.with_name(f'.{dest.name}.link')
+        
+        try:
+            os.link(blob, tmp)
+        except FileExistsError:
+            os.unlink(tmp)
+            os.link(blob, tmp)
+        except OSError:
+            if not _reflink(blob, tmp):
+                shutil.copyfile(blob, tmp)
+        
+        os.replace(tmp, dest)
+    
+    def gc(self) -> int:
+        """
+        Remove blobs que não são mais referenciados por nenhuma cópia.
+        
+        Um blob com um único link não é usado por nenhuma cópia via
+        hardlink (cópias feitas por reflink ou cópia comum não dependem
+        dele) e pode ser removido.
+        
+        Returns:
+            Número de bytes liberados.
+        """
+        freed = 0
+        with self._lock:
+            for blob in self.root.glob('*/*/*'):
+                try:
+                    stat = blob.stat()
+                    if stat.st_nlink == 1:
+                        blob.unlink()
+                        freed += stat.st_size
+                except OSError:
+                    pass
+        return freed
@@ -3,17 +3,30 @@ Flask App - Interface web para o WebCopy.
 """
 
 import os
+import time
 import uuid
 import threading
-import shutil
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory
 from urllib.parse import urlparse
 
-from .tasks import process_website
+from .events import ProgressBroker
+from .jobs import JobQueue, JobStore, QueueFull
+from .retention import RetentionSweeper
+from .tasks import generate_output_name, output_path, process_website, remove_partial_output
+from ..archive import ARCHIVE_FORMATS, iter_zip
+from ..batch import batch_output_name
+from ..cache import HTTPCache
+from ..connections import connection_stats, get_dns_cache, install_dns_cache, parse_host_pool_sizes
+from ..downloader import Downloader
+from ..metrics import MetricsRegistry
+from ..pool import DownloadPool
+from ..ratelimit import AdaptiveRateLimiter
+from ..store import BlobStore
+from ..workers import CPUPool
 
 
 # Inicializa Flask app
@@ -21,9 +34,111 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'webcopy-secret-key-change-in-production'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request size
 
-# Armazena jobs em memória (dict thread-safe básico)
-jobs: Dict[str, Dict[str, Any]] = {}
-jobs_lock = threading.Lock()
+# Diretório onde as cópias são salvas
+app.config['OUTPUT_DIR'] = os.environ.get('WEBCOPY_OUTPUT_DIR', os.path.join(os.getcwd(), 'output'))
+
+# Jobs persistidos em SQLite e executados por um pool fixo de workers; com
+# JOB_QUEUE_SIZE jobs aguardando, novos pedidos recebem 429
+app.config['JOBS_DB'] = os.environ.get('WEBCOPY_JOBS_DB')
+app.config['JOB_WORKERS'] = int(os.environ.get('WEBCOPY_JOB_WORKERS', '2'))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('WEBCOPY_JOB_QUEUE_SIZE', '50'))
+
+# URLs aceitas em um /api/batch (cada uma vira um job e ocupa um lugar na fila)
+app.config['BATCH_MAX_URLS'] = int(os.environ.get('WEBCOPY_BATCH_MAX_URLS', str(app.config['JOB_QUEUE_SIZE'])))
+
+# Retenção: jobs encerrados (e suas cópias) são removidos depois de
+# JOB_TTL_HOURS, além dos JOB_MAX_COUNT mais recentes ou quando o diretório
+# de saída passa de OUTPUT_MAX_MB (0 = sem limite)
+app.config['JOB_TTL_HOURS'] = float(os.environ.get('WEBCOPY_JOB_TTL_HOURS', '72'))
+app.config['JOB_MAX_COUNT'] = int(os.environ.get('WEBCOPY_JOB_MAX_COUNT', '500'))
+app.config['OUTPUT_MAX_MB'] = int(os.environ.get('WEBCOPY_OUTPUT_MAX_MB', '0'))
+app.config['RETENTION_INTERVAL'] = int(os.environ.get('WEBCOPY_RETENTION_INTERVAL', '300'))
+
+# Downloads de assets: asyncio + HTTP/2 permite centenas de requisições
+# simultâneas sem uma thread por download. 0 = padrão do pool (8 downloads
+# e 6 por host com threads, 64 e 32 com asyncio)
+app.config['DOWNLOAD_ASYNC'] = os.environ.get('WEBCOPY_ASYNC', '').lower() in ('1', 'true', 'yes')
+app.config['DOWNLOAD_WORKERS'] = int(os.environ.get('WEBCOPY_DOWNLOAD_WORKERS', '0'))
+app.config['DOWNLOAD_PER_HOST'] = int(os.environ.get('WEBCOPY_DOWNLOAD_PER_HOST', '0'))
+
+# Prazo (segundos) para os assets de segundo plano; 0 = sem prazo. CSS,
+# scripts do <head> e imagens acima da dobra sempre são baixados
+app.config['DOWNLOAD_DEADLINE'] = float(os.environ.get('WEBCOPY_DOWNLOAD_DEADLINE', '0'))
+
+# Orçamento de cada job (0 = sem limite): MB de assets baixados, MB de um
+# único asset, número de assets e tempo total (segundos). Esgotado o
+# orçamento, o job termina com uma cópia parcial. Em /api/copy o cliente
+# pode pedir limites menores que estes, nunca maiores
+app.config['JOB_MAX_MB'] = float(os.environ.get('WEBCOPY_JOB_MAX_MB', '0'))
+app.config['ASSET_MAX_MB'] = float(os.environ.get('WEBCOPY_ASSET_MAX_MB', '0'))
+app.config['JOB_MAX_ASSETS'] = int(os.environ.get('WEBCOPY_JOB_MAX_ASSETS', '0'))
+app.config['JOB_TIME_LIMIT'] = float(os.environ.get('WEBCOPY_JOB_TIME_LIMIT', '0'))
+
+# Sessão HTTP única para todos os jobs: conexões (e handshakes TLS) são
+# reaproveitadas entre jobs. POOL_MAXSIZE conexões por host (padrão: cobre
+# DOWNLOAD_PER_HOST em todos os JOB_WORKERS); POOL_HOSTS ajusta hosts
+# específicos ("cdn.example.com=32,img.example.com=16")
+app.config['POOL_MAXSIZE'] = int(os.environ.get(
+    'WEBCOPY_POOL_MAXSIZE',
+    str((app.config['DOWNLOAD_PER_HOST'] or DownloadPool.DEFAULT_PER_HOST) * app.config['JOB_WORKERS'])
+))
+app.config['POOL_HOSTS'] = parse_host_pool_sizes(os.environ.get('WEBCOPY_POOL_HOSTS'))
+
+# Cache de DNS do processo (segundos; 0 desativa)
+app.config['DNS_TTL'] = int(os.environ.get('WEBCOPY_DNS_TTL', '300'))
+
+# Requisições por segundo a cada host: taxa inicial e máxima (a taxa se
+# ajusta às respostas e vale para todos os jobs juntos)
+app.config['RATE'] = float(os.environ.get('WEBCOPY_RATE', '0'))
+app.config['MAX_RATE'] = float(os.environ.get('WEBCOPY_MAX_RATE', '0'))
+
+# Cache HTTP persistente compartilhado por todos os jobs (WEBCOPY_CACHE=0 desativa)
+app.config['HTTP_CACHE'] = os.environ.get('WEBCOPY_CACHE', '1').lower() not in ('0', 'false', 'no')
+app.config['HTTP_CACHE_DIR'] = os.environ.get('WEBCOPY_CACHE_DIR')
+app.config['HTTP_CACHE_SIZE_MB'] = int(os.environ.get('WEBCOPY_CACHE_SIZE_MB', '1024'))
+
+# Assets guardados uma única vez em output/.store (WEBCOPY_STORE=0 desativa)
+app.config['BLOB_STORE'] = os.environ.get('WEBCOPY_STORE', '1').lower() not in ('0', 'false', 'no')
+
+# Parser HTML: 'html.parser' (padrão) ou 'lxml' (mais rápido em páginas grandes)
+app.config['HTML_PARSER'] = os.environ.get('WEBCOPY_HTML_PARSER', 'html.parser')
+
+# Limites do rastreamento de múltiplas páginas ("depth" em /api/copy)
+app.config['CRAWL_MAX_DEPTH'] = int(os.environ.get('WEBCOPY_CRAWL_MAX_DEPTH', '5'))
+app.config['CRAWL_MAX_PAGES'] = int(os.environ.get('WEBCOPY_CRAWL_MAX_PAGES', '500'))
+
+# Métricas no formato do Prometheus em /metrics (WEBCOPY_METRICS=0 desativa
+# o endpoint e a medição das fases de cada download)
+app.config['METRICS'] = os.environ.get('WEBCOPY_METRICS', '1').lower() not in ('0', 'false', 'no')
+
+# Perfil de CPU e memória por job ("profile" em /api/copy; WEBCOPY_PROFILE=0
+# recusa o pedido). Os jobs medidos rodam um de cada vez
+app.config['PROFILE'] = os.environ.get('WEBCOPY_PROFILE', '1').lower() not in ('0', 'false', 'no')
+
+# Processos para o parse e a reescrita de HTML/CSS, compartilhados por todos
+# os jobs (0 = nas threads dos jobs; os jobs só passam de um núcleo com isso)
+app.config['CPU_WORKERS'] = int(os.environ.get('WEBCOPY_CPU_WORKERS', '0'))
+
+_http_cache = None
+_http_session = None
+_blob_store = None
+_job_store = None
+_job_queue = None
+_sweeper = None
+_cpu_pool = None
+_shared_lock = threading.Lock()
+# Serializa a verificação e a criação de jobs de atualização incremental
+_update_lock = threading.Lock()
+
+# Progresso dos jobs transmitido por SSE (/api/events/<job_id>)
+progress_broker = ProgressBroker()
+
+# Ritmo de cada origem, compartilhado por todos os jobs: um 429 recebido
+# por um job segura os demais que acessam o mesmo host
+rate_limiter = AdaptiveRateLimiter(rate=app.config['RATE'] or None, max_rate=app.config['MAX_RATE'] or None)
+
+# Métricas acumuladas de todos os jobs (/metrics)
+metrics_registry = MetricsRegistry()
 
 
 def validate_url(url: str) -> bool:
@@ -35,51 +150,322 @@ def validate_url(url: str) -> bool:
         return False
 
 
+def get_http_cache() -> Optional[HTTPCache]:
+    """Retorna o cache HTTP compartilhado (criado no primeiro uso)."""
+    global _http_cache
+    if not app.config['HTTP_CACHE']:
+        return None
+    with _shared_lock:
+        if _http_cache is None:
+            _http_cache = HTTPCache(
+                app.config['HTTP_CACHE_DIR'],
+                max_size=app.config['HTTP_CACHE_SIZE_MB'] * 1024 * 1024
+            )
+        return _http_cache
+
+
+def get_http_session():
+    """Retorna a sessão HTTP compartilhada por todos os jobs (criada no primeiro uso)."""
+    global _http_session
+    with _shared_lock:
+        if _http_session is None:
+            if app.config['DNS_TTL'] > 0:
+                install_dns_cache(app.config['DNS_TTL'])
+            _http_session = Downloader.create_session(
+                pool_maxsize=app.config['POOL_MAXSIZE'],
+                host_pool_sizes=app.config['POOL_HOSTS']
+            )
+        return _http_session
+
+
+def get_blob_store(output_dir: str) -> Optional[BlobStore]:
+    """Retorna o BlobStore compartilhado, dentro do diretório de saída."""
+    global _blob_store
+    if not app.config['BLOB_STORE']:
+        return None
+    with _shared_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore(Path(output_dir) / '.store')
+        return _blob_store
+
+
+def get_cpu_pool() -> Optional[CPUPool]:
+    """Retorna o pool de processos compartilhado (criado no primeiro uso), ou None."""
+    global _cpu_pool
+    if app.config['CPU_WORKERS'] <= 0:
+        return None
+    with _shared_lock:
+        # Um processo que morre (ex: falta de memória) inutiliza o pool: cria outro
+        if _cpu_pool is None or _cpu_pool.broken:
+            _cpu_pool = CPUPool(app.config['CPU_WORKERS'])
+        return _cpu_pool
+
+
+def get_job_store() -> JobStore:
+    """Retorna o JobStore compartilhado (criado no primeiro uso)."""
+    global _job_store
+    with _shared_lock:
+        if _job_store is None:
+            db_path = app.config['JOBS_DB'] or os.path.join(app.config['OUTPUT_DIR'], 'webcopy-jobs.db')
+            _job_store = JobStore(Path(db_path))
+            _job_store.add_listener(progress_broker.publish)
+        return _job_store
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Retorna a fila de jobs, iniciando os workers no primeiro uso.
+    
+    Jobs que estavam na fila ou em andamento quando o serviço parou voltam
+    para a fila.
+    """
+    global _job_queue
+    store = get_job_store()
+    with _shared_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                store,
+                run_copy_task,
+                workers=app.config['JOB_WORKERS'],
+                max_queued=app.config['JOB_QUEUE_SIZE']
+            )
+            _job_queue.start()
+        return _job_queue
+
+
+def get_sweeper() -> RetentionSweeper:
+    """Retorna o RetentionSweeper, iniciando a limpeza periódica no primeiro uso."""
+    global _sweeper
+    store = get_job_store()
+    queue = get_job_queue()
+    blob_store = get_blob_store(app.config['OUTPUT_DIR'])
+    with _shared_lock:
+        if _sweeper is None:
+            _sweeper = RetentionSweeper(
+                store,
+                Path(app.config['OUTPUT_DIR']),
+                ttl=app.config['JOB_TTL_HOURS'] * 3600,
+                max_jobs=app.config['JOB_MAX_COUNT'],
+                max_bytes=app.config['OUTPUT_MAX_MB'] * 1024 * 1024,
+                interval=app.config['RETENTION_INTERVAL'],
+                blob_store=blob_store,
+                is_idle=lambda: not any(queue.stats()[key] for key in ('queued', 'running'))
+            )
+            _sweeper.start()
+        return _sweeper
+
+
 def update_job_status(job_id: str, updates: Dict[str, Any]):
     """Atualiza o status de um job de forma thread-safe."""
-    with jobs_lock:
-        if job_id in jobs:
-            jobs[job_id].update(updates)
+    get_job_store().update(job_id, updates)
+
+
+# Limites do orçamento aceitos em /api/copy -> configuração do servidor
+BUDGET_OPTIONS = {
+    'max_mb': 'JOB_MAX_MB',
+    'asset_max_mb': 'ASSET_MAX_MB',
+    'max_assets': 'JOB_MAX_ASSETS',
+    'time_limit': 'JOB_TIME_LIMIT',
+}
+
+
+def budget_limits(requested: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Combina os limites de orçamento pedidos para um job com os do servidor.
+    
+    Vale o mais apertado dos dois (0 = sem limite).
+    
+    Args:
+        requested: Valores pedidos (chaves de BUDGET_OPTIONS; as ausentes
+            ficam com o limite do servidor).
+        
+    Returns:
+        Limite efetivo de cada chave de BUDGET_OPTIONS.
+        
+    Raises:
+        ValueError: Se algum valor não for numérico.
+    """
+    limits = {}
+    for option, config_key in BUDGET_OPTIONS.items():
+        server = app.config[config_key]
+        value = requested.get(option)
+        value = max(0.0, float(value)) if value is not None else 0.0
+        limits[option] = min(value, server) if value and server else (value or server)
+    return limits
+
+
+def copy_options(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Monta as opções de um job a partir do corpo de /api/copy ou /api/batch.
+    
+    Raises:
+        ValueError: Com a mensagem de erro, se alguma opção for inválida.
+    """
+    output_format = data.get('output_format') or 'dir'
+    if output_format != 'dir' and output_format not in ARCHIVE_FORMATS:
+        raise ValueError('output_format deve ser dir, zip ou tar')
+    
+    deadline = app.config['DOWNLOAD_DEADLINE']
+    if data.get('deadline') is not None:
+        try:
+            deadline = max(0.0, float(data['deadline']))
+        except (TypeError, ValueError):
+            raise ValueError('deadline deve ser um número de segundos')
+    
+    try:
+        limits = budget_limits(data)
+    except (TypeError, ValueError):
+        raise ValueError('max_mb, asset_max_mb, max_assets e time_limit devem ser números')
+    
+    profile = bool(data.get('profile'))
+    if profile and not app.config['PROFILE']:
+        raise ValueError('Perfil de jobs desativado no servidor')
+    
+    # Rastreamento de múltiplas páginas
+    crawl = {}
+    if data.get('depth'):
+        try:
+            depth = int(data['depth'])
+            max_pages = int(data.get('max_pages') or app.config['CRAWL_MAX_PAGES'])
+        except (TypeError, ValueError):
+            raise ValueError('depth e max_pages devem ser números inteiros')
+        crawl = {
+            'max_depth': max(0, min(depth, app.config['CRAWL_MAX_DEPTH'])),
+            'max_pages': max(1, min(max_pages, app.config['CRAWL_MAX_PAGES'])),
+            'path_prefix': data.get('path_prefix') or None,
+        }
+    
+    return {
+        'output_dir': app.config['OUTPUT_DIR'],
+        'previous_dir': None,
+        'crawl': crawl,
+        'output_format': output_format,
+        'deadline': deadline,
+        'budget': limits,
+        'profile': profile,
+    }
+
+
+def new_job(job_id: str, url: str, options: Dict[str, Any], **fields) -> Dict[str, Any]:
+    """Registro de um job recém-criado, na fila."""
+    return {
+        'job_id': job_id,
+        'url': url,
+        'status': 'queued',
+        'message': 'Na fila...',
+        'progress': 0,
+        'steps': [],
+        'output_path': None,
+        'error': None,
+        'options': options,
+        **fields,
+        'created_at': datetime.now().isoformat(),
+        'updated_at': datetime.now().isoformat()
+    }
+
 
+def queue_full_response(queue: JobQueue):
+    """Resposta 429 (com Retry-After) para a fila de jobs cheia."""
+    stats = queue.stats()
+    response = jsonify({
+        'error': 'Fila de jobs cheia. Tente novamente em instantes.',
+        'queued': stats['queued'],
+        'running': stats['running'],
+    })
+    response.headers['Retry-After'] = '30'
+    return response, 429
 
-def run_copy_task(job_id: str, url: str, output_dir: str):
-    """Executa a tarefa de cópia em background."""
+
+def run_copy_task(job: Dict[str, Any]):
+    """Executa a tarefa de cópia de um job (chamada pelos workers da fila)."""
+    job_id = job['job_id']
+    url = job['url']
+    options = job.get('options') or {}
+    output_dir = options.get('output_dir') or app.config['OUTPUT_DIR']
+    previous_dir = options.get('previous_dir')
+    crawl = options.get('crawl')
+    output_format = options.get('output_format', 'dir')
+    deadline = options.get('deadline', app.config['DOWNLOAD_DEADLINE'])
+    limits = options.get('budget') or budget_limits({})
+    
+    # Nome decidido aqui para registrar o destino antes de qualquer gravação:
+    # a limpeza apaga também o que um job com erro deixou pela metade
+    output_name = options.get('output_name') or generate_output_name(url)
+    target = previous_dir or str(output_path(output_dir, url, output_name, output_format).absolute())
+    
+    # Job interrompido por um reinício: a cópia recomeça do zero, e o que a
+    # anterior gravou pela metade (que nenhum job referencia mais) é apagado
+    interrupted = job.get('output_target')
+    if interrupted and interrupted != previous_dir:
+        remove_partial_output(Path(interrupted))
+    
+    update_job_status(job_id, {
+        'status': 'processing',
+        'message': 'Iniciando...',
+        'output_target': target,
+        'output_path': None,
+        'preview_ready': False,
+        'started_at': datetime.now().isoformat(),
+        'updated_at': datetime.now().isoformat()
+    })
+    
     def progress_callback(progress_data: Dict[str, Any]):
         """Callback para atualizar progresso do job."""
-        update_job_status(job_id, {
+        updates = {
             'message': progress_data.get('message', ''),
             'progress': progress_data.get('progress', 0),
             'steps': progress_data.get('steps', []),
             'updated_at': datetime.now().isoformat()
-        })
+        }
+        if progress_data.get('preview_path'):
+            # Assets críticos prontos: o preview já pode ser aberto
+            updates['preview_ready'] = True
+            updates['output_path'] = progress_data['preview_path']
+        update_job_status(job_id, updates)
     
     try:
         # Processa o website
         result = process_website(
             url=url,
             output_dir=output_dir,
-            progress_callback=progress_callback
+            output_name=output_name,
+            progress_callback=progress_callback,
+            max_workers=app.config['DOWNLOAD_WORKERS'] or None,
+            per_host_limit=app.config['DOWNLOAD_PER_HOST'] or None,
+            use_async=app.config['DOWNLOAD_ASYNC'],
+            cache=get_http_cache(),
+            store=get_blob_store(output_dir),
+            session=get_http_session(),
+            rate_limiter=rate_limiter,
+            previous_dir=previous_dir,
+            html_parser=app.config['HTML_PARSER'],
+            output_format=output_format,
+            deadline=deadline or None,
+            max_bytes=int(limits['max_mb'] * 1024 * 1024),
+            max_asset_bytes=int(limits['asset_max_mb'] * 1024 * 1024),
+            max_assets=int(limits['max_assets']),
+            time_limit=limits['time_limit'],
+            metrics=metrics_registry if app.config['METRICS'] else None,
+            profile=options.get('profile', False),
+            cpu_pool=get_cpu_pool(),
+            **(crawl or {})
         )
         
         if result['success']:
-            # Cria ZIP do site baixado
-            output_path = Path(result['output_path'])
-            zip_path = None
-            
-            if output_path.exists():
-                try:
-                    # Cria arquivo ZIP
-                    zip_base = str(output_path.parent / output_path.name)
-                    zip_path = shutil.make_archive(zip_base, 'zip', output_path)
-                except Exception as e:
-                    print(f"Erro ao criar ZIP: {e}")
-            
+            # O ZIP é gerado sob demanda em /api/download
+            skipped = result.get('skipped', {})
             update_job_status(job_id, {
                 'status': 'completed',
-                'message': 'Cópia concluída com sucesso!',
+                'message': (f'Cópia parcial concluída ({len(skipped)} assets ignorados)'
+                            if result.get('partial') else 'Cópia concluída com sucesso!'),
                 'progress': 100,
                 'output_path': result['output_path'],
-                'zip_path': zip_path,
+                'pages': result.get('pages', 1),
+                'skipped': len(skipped),
+                'partial': result.get('partial', False),
+                'budget': result.get('budget'),
+                'timings': result.get('timings'),
+                'profile': result.get('profile'),
                 'completed_at': datetime.now().isoformat()
             })
         else:
@@ -87,6 +473,7 @@ def run_copy_task(job_id: str, url: str, output_dir: str):
                 'status': 'error',
                 'error': result.get('error', 'Erro desconhecido'),
                 'message': f'Erro: {result.get("error", "Erro desconhecido")}',
+                'profile': result.get('profile'),
                 'completed_at': datetime.now().isoformat()
             })
     
@@ -99,6 +486,13 @@ def run_copy_task(job_id: str, url: str, output_dir: str):
         })
 
 
+@app.before_request
+def start_background_workers():
+    """Garante que os workers e a limpeza periódica estão rodando."""
+    get_job_queue()
+    get_sweeper()
+
+
 @app.route('/')
 def index():
     """Página principal da interface web."""
@@ -112,13 +506,55 @@ def api_copy():
     
     Body JSON:
         {
-            "url": "https://example.com"
+            "url": "https://example.com",
+            "update": "uuid-de-um-job-concluído",  (opcional)
+            "depth": 2,  (opcional, segue links até essa profundidade)
+            "max_pages": 100,  (opcional)
+            "path_prefix": "/docs/",  (opcional)
+            "output_format": "zip",  (opcional: "dir", "zip" ou "tar")
+            "deadline": 30,  (opcional, segundos para os assets de segundo plano)
+            "max_mb": 200,  (opcional, MB de assets que o job pode baixar)
+            "asset_max_mb": 20,  (opcional, MB de um único asset)
+            "max_assets": 1000,  (opcional)
+            "time_limit": 120,  (opcional, segundos de duração do job)
+            "profile": true  (opcional, mede o job com cProfile e tracemalloc)
         }
     
+    Com "update", a cópia do job informado é atualizada no lugar: apenas os
+    assets que mudaram no servidor são baixados novamente. A URL precisa ser
+    a do job informado (senão, 400), e uma cópia só aceita uma atualização
+    por vez (outra na fila ou em andamento responde 409).
+    
+    Com "depth", as páginas ligadas por <a href> (mesmo host) também são
+    copiadas, até os limites CRAWL_MAX_DEPTH e CRAWL_MAX_PAGES.
+    
+    Com "output_format" "zip" ou "tar", a cópia é gravada direto em um
+    arquivo (sem árvore de diretórios), servido por /api/download; o preview
+    não fica disponível.
+    
+    Os assets críticos (CSS, scripts do <head>, imagens acima da dobra) são
+    baixados primeiro; quando chegam, o job passa a ter "preview_ready" e o
+    preview já funciona. Com "deadline", os demais assets que não começaram
+    a baixar dentro do prazo ficam de fora (com a URL original).
+    
+    "max_mb", "asset_max_mb", "max_assets" e "time_limit" formam o orçamento
+    do job, limitado pelos valores do servidor (JOB_MAX_MB, ASSET_MAX_MB,
+    JOB_MAX_ASSETS, JOB_TIME_LIMIT). Quando ele se esgota, o job termina
+    com uma cópia parcial ("partial": true e o número de assets ignorados
+    em "skipped").
+    
+    Com "profile", o job concluído traz "profile": onde o perfil foi salvo
+    (ao lado da cópia) e as funções mais caras e maiores alocações. Jobs com
+    perfil rodam um de cada vez; PROFILE desativado responde 400.
+    
+    O job entra em uma fila atendida por JOB_WORKERS workers. Com a fila
+    cheia (JOB_QUEUE_SIZE jobs aguardando), responde 429 com Retry-After.
+    
     Returns:
         {
             "job_id": "uuid-here",
-            "status": "processing",
+            "status": "queued",
+            "queue_position": 0,
             "message": "Job iniciado"
         }
     """
@@ -134,37 +570,47 @@ def api_copy():
         if not validate_url(url):
             return jsonify({'error': 'URL inválida. Use formato: https://example.com'}), 400
         
+        try:
+            options = copy_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Modo incremental: atualiza a cópia de um job anterior
+        if data.get('update'):
+            previous = get_job_store().get(data['update'])
+            if not previous or previous['status'] != 'completed' or not previous.get('output_path'):
+                return jsonify({'error': 'Job a atualizar não encontrado ou não concluído'}), 400
+            if url != previous['url']:
+                return jsonify({'error': 'A URL difere da URL do job a atualizar'}), 400
+            if options['output_format'] != 'dir' or not os.path.isdir(previous['output_path']):
+                return jsonify({'error': 'O modo incremental só funciona com saída em diretório'}), 400
+            options['previous_dir'] = previous['output_path']
+        
         # Gera ID único para o job
         job_id = str(uuid.uuid4())
         
         # Cria entrada do job
-        with jobs_lock:
-            jobs[job_id] = {
-                'job_id': job_id,
-                'url': url,
-                'status': 'processing',
-                'message': 'Iniciando...',
-                'progress': 0,
-                'steps': [],
-                'output_path': None,
-                'zip_path': None,
-                'error': None,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
+        store = get_job_store()
+        queue = get_job_queue()
+        with _update_lock:
+            # Duas atualizações da mesma cópia apagariam os arquivos uma da outra
+            if options.get('previous_dir') and any(
+                job.get('options', {}).get('previous_dir') == options['previous_dir'] for job in store.unfinished()
+            ):
+                return jsonify({'error': 'Esta cópia já está sendo atualizada por outro job'}), 409
+            store.create(new_job(job_id, url, options))
         
-        # Inicia thread para processar em background
-        output_dir = os.path.join(os.getcwd(), 'output')
-        thread = threading.Thread(
-            target=run_copy_task,
-            args=(job_id, url, output_dir),
-            daemon=True
-        )
-        thread.start()
+        # Coloca na fila (ou recusa, se estiver cheia)
+        try:
+            position = queue.submit(job_id)
+        except QueueFull:
+            store.delete(job_id)
+            return queue_full_response(queue)
         
         return jsonify({
             'job_id': job_id,
-            'status': 'processing',
+            'status': 'queued',
+            'queue_position': position,
             'message': 'Job iniciado com sucesso'
         }), 202
     
@@ -172,6 +618,136 @@ def api_copy():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    Inicia a cópia de várias URLs em um só pedido.
+    
+    Body JSON:
+        {
+            "urls": ["https://example.com", "https://example.org/docs/"],
+            ...  (opcional: as opções de /api/copy, exceto "update", valem
+                  para todas as URLs)
+        }
+    
+    Cada URL vira um job comum (com /api/status, /api/download e
+    /api/preview próprios), marcado com o "batch_id" do lote. Os jobs
+    compartilham a sessão HTTP, o cache de DNS, o cache HTTP e o BlobStore
+    do serviço e rodam com a concorrência da fila (JOB_WORKERS). Entram
+    todos na fila ou nenhum: sem espaço para o lote inteiro, responde 429.
+    URLs inválidas ficam de fora e são listadas em "rejected".
+    
+    Returns:
+        {
+            "batch_id": "uuid-here",
+            "status": "queued",
+            "jobs": [{"job_id": "...", "url": "...", "queue_position": 0}, ...],
+            "rejected": [{"index": 2, "url": "ftp://...", "error": "URL inválida"}]
+        }
+    """
+    try:
+        data = request.get_json()
+        
+        urls = data.get('urls') if isinstance(data, dict) else None
+        if not isinstance(urls, list) or not urls:
+            return jsonify({'error': 'urls deve ser uma lista de URLs'}), 400
+        if len(urls) > app.config['BATCH_MAX_URLS']:
+            return jsonify({'error': f'Máximo de {app.config["BATCH_MAX_URLS"]} URLs por lote'}), 400
+        
+        try:
+            options = copy_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        accepted = []
+        rejected = []
+        for index, url in enumerate(urls):
+            url = url.strip() if isinstance(url, str) else ''
+            if validate_url(url):
+                accepted.append((index, url))
+            else:
+                rejected.append({'index': index, 'url': urls[index], 'error': 'URL inválida'})
+        if not accepted:
+            return jsonify({'error': 'Nenhuma URL válida', 'rejected': rejected}), 400
+        
+        batch_id = str(uuid.uuid4())
+        store = get_job_store()
+        queue = get_job_queue()
+        jobs = []
+        for index, url in accepted:
+            job_id = str(uuid.uuid4())
+            # Nome próprio: jobs do mesmo host começam no mesmo segundo
+            job_options = dict(options, output_name=f'batch_{batch_id[:8]}_{batch_output_name(index, url)}')
+            store.create(new_job(job_id, url, job_options, batch_id=batch_id, batch_index=index))
+            jobs.append({'job_id': job_id, 'url': url})
+        
+        # Coloca o lote inteiro na fila (ou recusa, se não couber)
+        try:
+            positions = queue.submit_many([job['job_id'] for job in jobs])
+        except QueueFull:
+            for job in jobs:
+                store.delete(job['job_id'])
+            return queue_full_response(queue)
+        
+        for job, position in zip(jobs, positions):
+            job['queue_position'] = position
+        
+        return jsonify({
+            'batch_id': batch_id,
+            'status': 'queued',
+            'jobs': jobs,
+            'rejected': rejected,
+            'message': f'{len(jobs)} jobs iniciados'
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def api_batch_status(batch_id: str):
+    """
+    Consulta um lote: quantos jobs estão em cada status e o resultado de
+    cada URL, na ordem em que foram enviadas.
+    
+    Returns:
+        {
+            "batch_id": "uuid",
+            "total": 2,
+            "done": false,
+            "counts": {"completed": 1, "processing": 1},
+            "jobs": [{"job_id": "...", "url": "...", "status": "completed",
+                      "output_path": "...", "error": null, ...}, ...]
+        }
+    """
+    jobs = get_job_store().batch(batch_id)
+    if not jobs:
+        return jsonify({'error': 'Lote não encontrado'}), 404
+    
+    counts = {}
+    for job in jobs:
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+    
+    return jsonify({
+        'batch_id': batch_id,
+        'total': len(jobs),
+        'done': all(job['status'] in ('completed', 'error') for job in jobs),
+        'counts': counts,
+        'jobs': [
+            {
+                'job_id': job['job_id'],
+                'url': job['url'],
+                'status': job['status'],
+                'output_path': job.get('output_path'),
+                'error': job.get('error'),
+                'partial': job.get('partial', False),
+                'skipped': job.get('skipped', 0),
+            }
+            for job in jobs
+        ]
+    }), 200
+
+
 @app.route('/api/status/<job_id>', methods=['GET'])
 def api_status(job_id: str):
     """
@@ -180,7 +756,7 @@ def api_status(job_id: str):
     Returns:
         {
             "job_id": "uuid",
-            "status": "processing|completed|error",
+            "status": "queued|processing|completed|error",
             "message": "Status message",
             "progress": 0-100,
             "steps": [...],
@@ -189,22 +765,56 @@ def api_status(job_id: str):
             "error": "error message if any"
         }
     """
-    with jobs_lock:
-        job = jobs.get(job_id)
+    job = get_job_store().get(job_id)
     
     if not job:
         return jsonify({'error': 'Job não encontrado'}), 404
     
+    if job['status'] == 'queued':
+        job['queue_position'] = get_job_queue().position(job_id)
+    
     return jsonify(job), 200
 
 
+@app.route('/api/events/<job_id>', methods=['GET'])
+def api_events(job_id: str):
+    """
+    Transmite o progresso de um job por Server-Sent Events.
+    
+    O primeiro evento ("snapshot") traz o job completo, como em /api/status;
+    os seguintes ("progress") trazem apenas os campos alterados. Os passos
+    vêm como "steps_from" (índice do primeiro passo alterado) e "steps" (a
+    lista a partir dele). Atualizações muito próximas são combinadas em um
+    evento só. O fluxo termina quando o job é concluído ou falha.
+    """
+    store = get_job_store()
+    
+    if not store.get(job_id):
+        return jsonify({'error': 'Job não encontrado'}), 404
+    
+    return Response(
+        progress_broker.stream(job_id, lambda: store.get(job_id)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # Desativa o buffer de proxies (nginx)
+        }
+    )
+
+
 @app.route('/api/download/<job_id>', methods=['GET'])
 def api_download(job_id: str):
     """
-    Faz download do arquivo ZIP do site copiado.
+    Faz download do site copiado como ZIP.
+    
+    O ZIP é montado em streaming a partir dos arquivos da cópia, sem arquivo
+    temporário: o download começa na hora e cada arquivo é lido uma vez só.
+    Imagens, fontes woff/woff2 e outros formatos já comprimidos vão sem
+    compressão; HTML, CSS e JS são comprimidos (deflate). Jobs com
+    output_format "zip" ou "tar" já têm o arquivo pronto, que é enviado
+    como está.
     """
-    with jobs_lock:
-        job = jobs.get(job_id)
+    job = get_job_store().get(job_id)
     
     if not job:
         return jsonify({'error': 'Job não encontrado'}), 404
@@ -212,19 +822,33 @@ def api_download(job_id: str):
     if job['status'] != 'completed':
         return jsonify({'error': 'Job ainda não foi concluído'}), 400
     
-    zip_path = job.get('zip_path')
+    output_path = job.get('output_path')
     
-    if not zip_path or not os.path.exists(zip_path):
-        return jsonify({'error': 'Arquivo ZIP não encontrado'}), 404
+    if output_path and os.path.isfile(output_path):
+        return send_file(
+            output_path,
+            as_attachment=True,
+            download_name=os.path.basename(output_path),
+            mimetype='application/zip' if output_path.endswith('.zip') else 'application/x-tar'
+        )
+    
+    if not output_path or not os.path.isdir(output_path):
+        return jsonify({'error': 'Diretório de saída não encontrado'}), 404
     
-    # Extrai nome do arquivo do path
-    zip_filename = os.path.basename(zip_path)
+    zip_filename = f'{os.path.basename(output_path)}.zip'
     
-    return send_file(
-        zip_path,
-        as_attachment=True,
-        download_name=zip_filename,
-        mimetype='application/zip'
+    def timed_zip():
+        started = time.perf_counter()
+        yield from iter_zip(Path(output_path))
+        if app.config['METRICS']:
+            metrics_registry.histogram(
+                'webcopy_zip_duration_seconds', 'Tempo para gerar e enviar o ZIP de uma cópia'
+            ).observe(time.perf_counter() - started)
+    
+    return Response(
+        timed_zip(),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'}
     )
 
 
@@ -233,18 +857,23 @@ def api_download(job_id: str):
 def api_preview(job_id: str, filename: str = 'index.html'):
     """
     Serve o site copiado para preview no navegador.
+    
+    Disponível também durante a cópia, assim que o job tiver
+    "preview_ready" (assets críticos baixados).
     """
-    with jobs_lock:
-        job = jobs.get(job_id)
+    job = get_job_store().get(job_id)
     
     if not job:
         return jsonify({'error': 'Job não encontrado'}), 404
     
-    if job['status'] != 'completed':
+    if job['status'] != 'completed' and not (job['status'] == 'processing' and job.get('preview_ready')):
         return jsonify({'error': 'Job ainda não foi concluído'}), 400
     
     output_path = job.get('output_path')
     
+    if output_path and os.path.isfile(output_path):
+        return jsonify({'error': 'Preview indisponível para cópias salvas em arquivo'}), 400
+    
     if not output_path or not os.path.exists(output_path):
         return jsonify({'error': 'Diretório de saída não encontrado'}), 404
     
@@ -258,17 +887,98 @@ def api_preview(job_id: str, filename: str = 'index.html'):
 @app.route('/api/jobs', methods=['GET'])
 def api_jobs():
     """
-    Lista todos os jobs (útil para debug/desenvolvimento).
+    Lista os jobs, dos mais recentes para os mais antigos, em páginas.
+    
+    Query string:
+        offset: Número de jobs a pular (padrão: 0).
+        limit: Jobs por página (padrão: 50, máximo: 500).
+    
+    Cada job vem resumido (sem "steps" e "options"); os detalhes ficam em
+    /api/status/<job_id>.
+    """
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({'error': 'offset e limit devem ser números inteiros'}), 400
+    
+    store = get_job_store()
+    jobs = [
+        {key: value for key, value in job.items() if key not in ('steps', 'options')}
+        for job in store.list(offset, limit, newest_first=True)
+    ]
+    
+    return jsonify({
+        'total': store.count(),
+        'offset': offset,
+        'limit': limit,
+        'jobs': jobs
+    }), 200
+
+
+@app.route('/api/connections', methods=['GET'])
+def api_connections():
     """
-    with jobs_lock:
-        all_jobs = list(jobs.values())
+    Reaproveitamento de conexões da sessão HTTP compartilhada, cache de DNS
+    e ritmo atual de cada origem.
     
+    Returns:
+        {
+            "http": {"requests": 1200, "connections": 40, "tls_connections": 38,
+                     "reused": 1160, "reuse_ratio": 0.967, "hosts": 12},
+            "dns": {"ttl": 300, "entries": 12, "hits": 28, "misses": 12},
+            "origins": {
+                "https://example.com": {"rate": 42.5, "blocked_for": 0, "requests": 900,
+                                        "throttled": 2, "errors": 0, "latency_ms": 85}
+            }
+        }
+    """
+    dns_cache = get_dns_cache()
     return jsonify({
-        'total': len(all_jobs),
-        'jobs': all_jobs
+        'http': connection_stats(get_http_session()),
+        'dns': dns_cache.stats() if dns_cache else None,
+        'origins': rate_limiter.stats()
     }), 200
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas no formato de texto do Prometheus.
+    
+    Acumuladas desde o início do processo: jobs concluídos e sua duração,
+    duração de cada etapa (webcopy_stage_duration_seconds{stage}), fases
+    dos downloads (webcopy_download_phase_seconds{phase}: dns, connect,
+    ttfb, transfer), assets e bytes por resultado do cache e tempo de
+    geração dos ZIPs; mais o estado atual da fila, das conexões e do
+    cache de DNS.
+    """
+    if not app.config['METRICS']:
+        return jsonify({'error': 'Métricas desativadas (WEBCOPY_METRICS=0)'}), 404
+    
+    queue = get_job_queue().stats()
+    jobs = metrics_registry.gauge('webcopy_queue_jobs', 'Jobs na fila e em execução', ('state',))
+    jobs.set(queue['queued'], state='queued')
+    jobs.set(queue['running'], state='running')
+    
+    http = connection_stats(get_http_session())
+    metrics_registry.gauge(
+        'webcopy_http_requests', 'Requisições feitas pela sessão HTTP compartilhada'
+    ).set(http['requests'])
+    metrics_registry.gauge(
+        'webcopy_http_connections', 'Conexões abertas pela sessão HTTP compartilhada'
+    ).set(http['connections'])
+    
+    dns_cache = get_dns_cache()
+    if dns_cache:
+        dns = metrics_registry.gauge('webcopy_dns_cache_lookups', 'Consultas ao cache de DNS', ('result',))
+        dns_stats = dns_cache.stats()
+        dns.set(dns_stats['hits'], result='hit')
+        dns.set(dns_stats['misses'], result='miss')
+    
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.errorhandler(404)
 def not_found(e):
     """Handler para 404."""
@@ -285,7 +995,7 @@ def internal_error(e):
 
 if __name__ == '__main__':
     # Cria diretório output se não existir
-    output_dir = Path('output')
+    output_dir = Path(app.config['OUTPUT_DIR'])
     output_dir.mkdir(exist_ok=True)
     
     print("=" * 60)
@@ -293,6 +1003,7 @@ if __name__ == '__main__':
     print("=" * 60)
     print(f"Servidor iniciado em: http://localhost:5000")
     print(f"Diretório de saída: {output_dir.absolute()}")
+    print(f"Workers de jobs: {app.config['JOB_WORKERS']} (fila: {app.config['JOB_QUEUE_SIZE']})")
     print("=" * 60)
     print()
     
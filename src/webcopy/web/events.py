@@ -0,0 +1,208 @@
+"""
+Events Module - Transmissão do progresso dos jobs por Server-Sent Events.
+"""
+
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+
+# Status em que o job não recebe mais atualizações
+FINAL_STATUSES = ('completed', 'error')
+
+
+class Subscription:
+    """
+    Inscrição de um cliente no progresso de um job.
+    
+    As atualizações recebidas entre duas leituras são combinadas em uma só:
+    campos simples ficam com o valor mais recente e, nos passos, basta
+    lembrar o primeiro índice alterado.
+    """
+    
+    def __init__(self, broker: 'ProgressBroker', job_id: str):
+        self.broker = broker
+        self.job_id = job_id
+        self._fields: Dict[str, Any] = {}
+        self._steps_from: Optional[int] = None
+        self._event = threading.Event()
+        self._last_sent = 0.0
+    
+    def push(self, fields: Dict[str, Any], steps_from: Optional[int]):
+        """Acumula uma atualização (chamado pelo broker, com o lock dele)."""
+        self._fields.update(fields)
+        if steps_from is not None:
+            self._steps_from = steps_from if self._steps_from is None else min(self._steps_from, steps_from)
+        self._event.set()
+    
+    def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Espera a próxima atualização combinada.
+        
+        Args:
+            timeout: Tempo máximo de espera em segundos.
+            
+        Returns:
+            Delta com os campos alterados (e 'steps_from'/'steps' se os
+            passos mudaram), ou None se nada mudou dentro do timeout.
+        """
+        if not self._event.wait(timeout):
+            return None
+        
+        # Segura um pouco para juntar rajadas de atualizações em um evento só
+        delay = self._last_sent + self.broker.min_interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        
+        with self.broker._lock:
+            delta = self._fields
+            if self._steps_from is not None:
+                steps = self.broker._steps.get(self.job_id, [])
+                delta['steps_from'] = self._steps_from
+                delta['steps'] = steps[self._steps_from:]
+            self._fields = {}
+            self._steps_from = None
+            self._event.clear()
+        
+        self._last_sent = time.monotonic()
+        return delta
+
+
+class ProgressBroker:
+    """
+    Distribui as atualizações de progresso dos jobs para os inscritos.
+    
+    Cada atualização vira um delta com apenas o que mudou; a lista de passos,
+    que só cresce ou muda no final, é enviada a partir do primeiro passo
+    alterado. Qualquer número de clientes pode acompanhar o mesmo job.
+    """
+    
+    def __init__(self, min_interval: float = 0.25, heartbeat: float = 15.0):
+        """
+        Inicializa o broker.
+        
+        Args:
+            min_interval: Intervalo mínimo (segundos) entre eventos enviados
+                a um mesmo cliente; atualizações nesse meio tempo são combinadas.
+            heartbeat: Intervalo (segundos) dos comentários que mantêm a
+                conexão aberta (e detectam clientes desconectados).
+        """
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._fields: Dict[str, Dict[str, Any]] = {}
+        self._steps: Dict[str, List[Dict[str, Any]]] = {}
+    
+    def publish(self, job_id: str, updates: Dict[str, Any]):
+        """
+        Registra uma atualização de um job e avisa os inscritos.
+        
+        Args:
+            job_id: ID do job.
+            updates: Campos atualizados (os mesmos gravados no JobStore).
+        """
+        with self._lock:
+            known = self._fields.setdefault(job_id, {})
+            fields = {
+                key: value for key, value in updates.items()
+                if key != 'steps' and known.get(key, object()) != value
+            }
+            known.update(fields)
+            
+            steps_from = None
+            if 'steps' in updates:
+                # Cópia: os passos são alterados no lugar por process_website
+                new_steps = [dict(step) for step in updates['steps'] or []]
+                old_steps = self._steps.get(job_id, [])
+                common = 0
+                for old, new in zip(old_steps, new_steps):
+                    if old != new:
+                        break
+                    common += 1
+                if common < len(new_steps) or len(new_steps) != len(old_steps):
+                    steps_from = common
+                self._steps[job_id] = new_steps
+            
+            if fields or steps_from is not None:
+                for subscription in self._subscribers.get(job_id, ()):
+                    subscription.push(fields, steps_from)
+            
+            # Jobs encerrados não precisam mais do estado (os inscritos já
+            # receberam o status final e encerram a conexão)
+            if updates.get('status') in FINAL_STATUSES and not self._subscribers.get(job_id):
+                self._forget(job_id)
+    
+    def subscribe(self, job_id: str) -> Subscription:
+        """Inscreve um novo cliente no progresso de um job."""
+        subscription = Subscription(self, job_id)
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a inscrição de um cliente."""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.job_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.job_id]
+                if self._fields.get(subscription.job_id, {}).get('status') in FINAL_STATUSES:
+                    self._forget(subscription.job_id)
+    
+    def _forget(self, job_id: str):
+        """Descarta o estado de um job (requer self._lock)."""
+        self._fields.pop(job_id, None)
+        self._steps.pop(job_id, None)
+    
+    def subscriber_count(self, job_id: Optional[str] = None) -> int:
+        """Número de clientes inscritos (em um job ou no total)."""
+        with self._lock:
+            if job_id is not None:
+                return len(self._subscribers.get(job_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+    
+    def stream(self, job_id: str, snapshot: Callable[[], Optional[Dict[str, Any]]]) -> Iterator[str]:
+        """
+        Gera o fluxo SSE de um job.
+        
+        O primeiro evento ('snapshot') traz o job completo; os seguintes
+        ('progress') trazem só os deltas. O fluxo termina quando o job é
+        concluído ou falha.
+        
+        Args:
+            job_id: ID do job.
+            snapshot: Função que retorna o estado atual do job.
+            
+        Yields:
+            Mensagens no formato text/event-stream.
+        """
+        # Inscreve antes de ler o estado: nenhuma atualização se perde, e
+        # reaplicar um delta já refletido no snapshot não muda nada
+        subscription = self.subscribe(job_id)
+        try:
+            job = snapshot()
+            if job is None:
+                return
+            yield format_event('snapshot', job)
+            if job.get('status') in FINAL_STATUSES:
+                return
+            
+            while True:
+                delta = subscription.next(self.heartbeat)
+                if delta is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event('progress', delta)
+                if delta.get('status') in FINAL_STATUSES:
+                    return
+        finally:
+            self.unsubscribe(subscription)
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    """Serializa um evento SSE."""
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
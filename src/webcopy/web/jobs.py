@@ -0,0 +1,309 @@
+"""
+Jobs Module - Persistência de jobs em SQLite e fila com pool de workers.
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class QueueFull(Exception):
+    """A fila de jobs atingiu o limite de jobs aguardando."""
+
+
+class JobStore:
+    """
+    Guarda os jobs em um banco SQLite para que sobrevivam a reinícios.
+    
+    Os jobs ficam também em memória, e as atualizações de progresso (muito
+    frequentes) só são gravadas no banco a cada flush_interval segundos;
+    mudanças de status são gravadas na hora. Listeners registrados com
+    add_listener() recebem cada atualização (ex: para transmitir o progresso).
+    """
+    
+    def __init__(self, path: Path, flush_interval: float = 1.0):
+        """
+        Inicializa o store.
+        
+        Args:
+            path: Arquivo do banco SQLite.
+            flush_interval: Intervalo mínimo (segundos) entre gravações de
+                progresso de um mesmo job.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._flushed_at: Dict[str, float] = {}
+        # Índice batch_id -> job_ids dos jobs de cada lote
+        self._batches: Dict[str, List[str]] = {}
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        
+        self._db = sqlite3.connect(
+            str(self.path),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' job_id TEXT PRIMARY KEY,'
+            ' status TEXT NOT NULL,'
+            ' created_at TEXT NOT NULL,'
+            ' data TEXT NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at)')
+        
+        for (data,) in self._db.execute('SELECT data FROM jobs ORDER BY created_at'):
+            job = json.loads(data)
+            self._jobs[job['job_id']] = job
+            self._index(job)
+    
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
+        """Registra uma função chamada com (job_id, updates) a cada update()."""
+        self._listeners.append(listener)
+    
+    def close(self):
+        """Grava o progresso pendente e fecha o banco."""
+        with self._lock:
+            for job in self._jobs.values():
+                self._write(job)
+            self._db.close()
+    
+    def _write(self, job: Dict[str, Any]):
+        """Grava um job no banco (requer self._lock)."""
+        self._db.execute(
+            'INSERT OR REPLACE INTO jobs (job_id, status, created_at, data) VALUES (?, ?, ?, ?)',
+            (job['job_id'], job['status'], job['created_at'], json.dumps(job, ensure_ascii=False))
+        )
+        self._flushed_at[job['job_id']] = time.monotonic()
+    
+    def _index(self, job: Dict[str, Any]):
+        """Coloca o job no índice do seu lote, se tiver um (requer self._lock)."""
+        batch_id = job.get('batch_id')
+        if batch_id is not None:
+            self._batches.setdefault(batch_id, []).append(job['job_id'])
+    
+    def create(self, job: Dict[str, Any]):
+        """Registra um novo job (precisa de 'job_id', 'status' e 'created_at')."""
+        with self._lock:
+            self._jobs[job['job_id']] = dict(job)
+            self._index(job)
+            self._write(self._jobs[job['job_id']])
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna uma cópia do job, ou None se não existir."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def update(self, job_id: str, updates: Dict[str, Any]):
+        """
+        Atualiza campos de um job.
+        
+        Mudanças de status são gravadas imediatamente; as demais, no máximo
+        uma vez a cada flush_interval segundos por job.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            status_changed = 'status' in updates and updates['status'] != job['status']
+            job.update(updates)
+            
+            elapsed = time.monotonic() - self._flushed_at.get(job_id, 0)
+            if status_changed or elapsed >= self.flush_interval:
+                self._write(job)
+        
+        for listener in self._listeners:
+            listener(job_id, updates)
+    
+    def delete(self, job_id: str):
+        """Remove um job."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            self._flushed_at.pop(job_id, None)
+            self._db.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+            
+            batch_id = job.get('batch_id') if job else None
+            if batch_id in self._batches:
+                self._batches[batch_id].remove(job_id)
+                if not self._batches[batch_id]:
+                    del self._batches[batch_id]
+    
+    def list(self, offset: int = 0, limit: Optional[int] = None,
+             newest_first: bool = False) -> List[Dict[str, Any]]:
+        """
+        Lista jobs por ordem de criação.
+        
+        Args:
+            offset: Número de jobs a pular.
+            limit: Número máximo de jobs (None = todos).
+            newest_first: Lista os mais recentes primeiro.
+        """
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j['created_at'], reverse=newest_first)
+            end = None if limit is None else offset + limit
+            return [dict(job) for job in jobs[offset:end]]
+    
+    def batch(self, batch_id: str) -> List[Dict[str, Any]]:
+        """
+        Jobs de um lote, na ordem das URLs (batch_index), sem percorrer os
+        demais jobs.
+        """
+        with self._lock:
+            jobs = [dict(self._jobs[job_id]) for job_id in self._batches.get(batch_id, ())]
+        jobs.sort(key=lambda job: job.get('batch_index', 0))
+        return jobs
+    
+    def count(self) -> int:
+        """Número de jobs guardados."""
+        with self._lock:
+            return len(self._jobs)
+    
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs que estavam na fila ou em andamento (ex: antes de um reinício)."""
+        return [job for job in self.list() if job['status'] in ('queued', 'processing')]
+
+
+class JobQueue:
+    """
+    Fila limitada de jobs atendida por um número fixo de workers.
+    
+    Mantém a concorrência do serviço previsível: no máximo `workers` cópias
+    rodam ao mesmo tempo e no máximo `max_queued` aguardam. Com a fila
+    cheia, submit() levanta QueueFull (a API responde 429).
+    """
+    
+    def __init__(
+        self,
+        store: JobStore,
+        handler: Callable[[Dict[str, Any]], None],
+        workers: int = 4,
+        max_queued: int = 100
+    ):
+        """
+        Inicializa a fila.
+        
+        Args:
+            store: JobStore onde os jobs estão registrados.
+            handler: Função que executa um job (recebe o dict do job).
+            workers: Número de jobs executados em paralelo.
+            max_queued: Número máximo de jobs aguardando na fila.
+        """
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queued = max(0, max_queued)
+        
+        self._pending: Deque[str] = deque()
+        self._running = 0
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+    
+    def start(self):
+        """Inicia os workers e recoloca na fila os jobs interrompidos."""
+        with self._condition:
+            if self._threads:
+                return
+            for job in self.store.unfinished():
+                self.store.update(job['job_id'], {
+                    'status': 'queued',
+                    'message': 'Na fila (reiniciado após interrupção)...',
+                })
+                self._pending.append(job['job_id'])
+            
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f'webcopy-job-{index}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            self._condition.notify_all()
+    
+    def submit(self, job_id: str) -> int:
+        """
+        Coloca um job (já registrado no store) na fila.
+        
+        Returns:
+            Posição do job na fila (0 = será executado assim que houver
+            um worker livre).
+            
+        Raises:
+            QueueFull: Se a fila estiver cheia.
+        """
+        with self._condition:
+            if len(self._pending) >= self.max_queued:
+                raise QueueFull(len(self._pending))
+            self._pending.append(job_id)
+            position = len(self._pending) - 1
+            self._condition.notify()
+        return position
+    
+    def submit_many(self, job_ids: List[str]) -> List[int]:
+        """
+        Coloca vários jobs na fila de uma vez: entram todos ou nenhum.
+        
+        Returns:
+            Posição de cada job na fila.
+            
+        Raises:
+            QueueFull: Se não houver espaço para todos.
+        """
+        with self._condition:
+            if len(self._pending) + len(job_ids) > self.max_queued:
+                raise QueueFull(len(self._pending))
+            first = len(self._pending)
+            self._pending.extend(job_ids)
+            self._condition.notify(len(job_ids))
+        return list(range(first, first + len(job_ids)))
+    
+    def position(self, job_id: str) -> Optional[int]:
+        """Posição atual de um job na fila, ou None se não estiver aguardando."""
+        with self._condition:
+            try:
+                return self._pending.index(job_id)
+            except ValueError:
+                return None
+    
+    def stats(self) -> Dict[str, int]:
+        """Números da fila: jobs aguardando, em execução e limites."""
+        with self._condition:
+            return {
+                'queued': len(self._pending),
+                'running': self._running,
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+            }
+    
+    def _work(self):
+        """Loop de um worker: pega o próximo job e o executa."""
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                job_id = self._pending.popleft()
+                self._running += 1
+            
+            try:
+                job = self.store.get(job_id)
+                if job is not None:
+                    self.handler(job)
+            except Exception as e:
+                self.store.update(job_id, {
+                    'status': 'error',
+                    'error': str(e),
+                    'message': f'Erro: {e}',
+                })
+            finally:
+                with self._condition:
+                    self._running -= 1
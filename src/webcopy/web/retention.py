@@ -0,0 +1,226 @@
+"""
+Retention Module - Expiração de jobs e limpeza do diretório de saída.
+"""
+
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .jobs import JobStore
+from ..store import BlobStore
+
+
+# Só jobs encerrados podem ser removidos
+FINISHED_STATUSES = ('completed', 'error')
+
+
+def disk_usage(path: Path) -> int:
+    """
+    Calcula o espaço ocupado por um diretório (ou arquivo).
+    
+    Arquivos com vários hardlinks (cópias deduplicadas pelo BlobStore) são
+    contados uma única vez.
+    """
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    
+    total = 0
+    seen = set()
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.lstat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            if stat.st_nlink > 1:
+                key = (stat.st_dev, stat.st_ino)
+                if key in seen:
+                    continue
+                seen.add(key)
+            total += stat.st_size
+    return total
+
+
+class RetentionSweeper:
+    """
+    Remove periodicamente jobs antigos e as cópias deles.
+    
+    Um job encerrado é removido quando passa do tempo de vida (ttl), quando
+    há mais de max_jobs jobs encerrados (os mais antigos saem primeiro) ou
+    enquanto o diretório de saída ocupar mais que max_bytes. A cópia do job
+    (árvore ou arquivo ZIP/tar) é apagada junto, a não ser que outro job
+    ainda a use (atualizações incrementais gravam no mesmo diretório), e os
+    blobs que ficarem sem nenhuma cópia são liberados. Jobs com erro não
+    têm output_path: deles sai o destino registrado no início
+    (output_target), com o que chegou a ser gravado.
+    """
+    
+    def __init__(
+        self,
+        store: JobStore,
+        output_dir: Path,
+        ttl: float = 0,
+        max_jobs: int = 0,
+        max_bytes: int = 0,
+        interval: float = 300,
+        blob_store: Optional[BlobStore] = None,
+        is_idle: Optional[Callable[[], bool]] = None
+    ):
+        """
+        Inicializa o sweeper.
+        
+        Args:
+            store: JobStore com os jobs.
+            output_dir: Diretório de saída; nada fora dele é apagado.
+            ttl: Tempo de vida (segundos) de um job encerrado (0 = sem limite).
+            max_jobs: Número máximo de jobs encerrados guardados (0 = sem limite).
+            max_bytes: Espaço máximo do diretório de saída (0 = sem limite).
+            interval: Intervalo (segundos) entre as limpezas automáticas.
+            blob_store: BlobStore cujos blobs órfãos são removidos.
+            is_idle: Retorna True quando nenhum job está rodando; a coleta
+                de blobs só acontece nesses momentos, para não disputar um
+                blob com um download em andamento.
+        """
+        self.store = store
+        self.output_dir = Path(output_dir).resolve()
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.blob_store = blob_store
+        self.is_idle = is_idle
+        
+        self._gc_pending = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sweep_lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """Indica se algum limite está configurado."""
+        return bool(self.ttl or self.max_jobs or self.max_bytes)
+    
+    def start(self):
+        """Inicia a limpeza periódica em uma thread de fundo."""
+        if self._thread is not None or not self.enabled:
+            return
+        self._thread = threading.Thread(target=self._run, name='webcopy-retention', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Interrompe a limpeza periódica."""
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Erro na limpeza de jobs: {e}")
+            self._stop.wait(self.interval)
+    
+    def sweep(self) -> Dict[str, int]:
+        """
+        Executa uma limpeza.
+        
+        Returns:
+            Dict com 'jobs' (jobs removidos), 'outputs' (cópias apagadas) e
+            'blob_bytes' (bytes liberados no BlobStore).
+        """
+        with self._sweep_lock:
+            stats = {'jobs': 0, 'outputs': 0, 'blob_bytes': 0}
+            finished = [job for job in self.store.list() if job['status'] in FINISHED_STATUSES]
+            
+            # Tempo de vida
+            if self.ttl:
+                limit = datetime.now() - timedelta(seconds=self.ttl)
+                expired = [job for job in finished if self._finished_at(job) < limit]
+                self._evict(expired, stats)
+                finished = [job for job in finished if self._finished_at(job) >= limit]
+            
+            # Quantidade (sai o mais antigo)
+            if self.max_jobs and len(finished) > self.max_jobs:
+                excess = finished[:len(finished) - self.max_jobs]
+                self._evict(excess, stats)
+                finished = finished[len(excess):]
+            
+            # Espaço em disco: remove um por vez até caber. Com BlobStore o
+            # espaço só é liberado pela coleta de blobs; se ela não puder
+            # rodar agora, a próxima limpeza continua de onde parou
+            if self.max_bytes:
+                while finished and disk_usage(self.output_dir) > self.max_bytes:
+                    self._evict(finished[:1], stats)
+                    finished = finished[1:]
+                    if not self._collect_blobs(stats):
+                        break
+            
+            self._collect_blobs(stats)
+            return stats
+    
+    @staticmethod
+    def _finished_at(job: Dict) -> datetime:
+        """Momento em que o job terminou (ou foi criado, se não houver)."""
+        value = job.get('completed_at') or job.get('created_at')
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return datetime.min
+    
+    def _evict(self, jobs: List[Dict], stats: Dict[str, int]):
+        """Remove jobs do store e apaga as cópias que ninguém mais usa."""
+        for job in jobs:
+            self.store.delete(job['job_id'])
+            stats['jobs'] += 1
+        
+        remaining = self.store.list()
+        in_use = {job.get('output_path') for job in remaining}
+        in_use.update(job.get('output_target') for job in remaining)
+        in_use.update((job.get('options') or {}).get('previous_dir') for job in remaining)
+        in_use.update((job.get('profile') or {}).get('path') for job in remaining)
+        
+        for job in jobs:
+            paths = {job.get('output_path'), job.get('output_target')} - {None}
+            removed = [path for path in paths if path not in in_use and self._remove_output(Path(path))]
+            if removed:
+                stats['outputs'] += 1
+            # Perfil do job (profile em /api/copy), gravado ao lado da cópia
+            profile_path = (job.get('profile') or {}).get('path')
+            if profile_path and profile_path not in in_use:
+                self._remove_output(Path(profile_path))
+    
+    def _remove_output(self, path: Path) -> bool:
+        """Apaga uma cópia (diretório ou arquivo) dentro do diretório de saída."""
+        try:
+            resolved = path.resolve()
+            resolved.relative_to(self.output_dir)
+        except (OSError, ValueError):
+            return False
+        
+        if resolved == self.output_dir or not resolved.exists():
+            return False
+        
+        if resolved.is_dir():
+            shutil.rmtree(resolved, ignore_errors=True)
+        else:
+            resolved.unlink()
+        self._gc_pending = True
+        return True
+    
+    def _collect_blobs(self, stats: Dict[str, int]) -> bool:
+        """
+        Remove blobs órfãos, se nenhum job estiver rodando.
+        
+        Returns:
+            False se havia blobs a coletar mas a coleta teve que ser adiada.
+        """
+        if self.blob_store is None or not self._gc_pending:
+            return True
+        if self.is_idle is not None and not self.is_idle():
+            return False
+        stats['blob_bytes'] += self.blob_store.gc()
+        self._gc_pending = False
+        return True
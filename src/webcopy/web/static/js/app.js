@@ -4,6 +4,8 @@ class WebCopyUI {
     constructor() {
         this.currentJobId = null;
         this.pollInterval = null;
+        this.eventSource = null;
+        this.job = null;
         this.initializeElements();
         this.attachEventListeners();
     }
@@ -22,6 +24,7 @@ class WebCopyUI {
         this.progressBar = document.getElementById('progress-bar');
         this.progressStatus = document.getElementById('progress-status');
         this.progressDetails = document.getElementById('progress-details');
+        this.earlyPreviewBtn = document.getElementById('early-preview-btn');
         
         // Result elements
         this.resultUrl = document.getElementById('result-url');
@@ -43,6 +46,7 @@ class WebCopyUI {
         this.newCopyBtn.addEventListener('click', () => this.resetUI());
         this.downloadBtn.addEventListener('click', () => this.downloadZip());
         this.previewBtn.addEventListener('click', () => this.openPreview());
+        this.earlyPreviewBtn.addEventListener('click', () => this.openPreview());
     }
 
     validateUrl(url) {
@@ -94,7 +98,7 @@ class WebCopyUI {
             if (response.ok) {
                 this.currentJobId = data.job_id;
                 this.showProgressSection();
-                this.startPolling();
+                this.startTracking();
             } else {
                 this.showError(data.error || 'Erro ao iniciar cópia');
                 this.submitBtn.disabled = false;
@@ -114,6 +118,7 @@ class WebCopyUI {
         this.progressBar.style.width = '0%';
         this.progressStatus.textContent = 'Iniciando...';
         this.progressDetails.innerHTML = '';
+        this.earlyPreviewBtn.style.display = 'none';
     }
 
     showResultSection(data) {
@@ -133,6 +138,53 @@ class WebCopyUI {
         this.submitBtn.disabled = false;
         this.submitBtn.innerHTML = '<i class="fas fa-copy"></i> Copiar Site';
         this.currentJobId = null;
+        this.stopTracking();
+    }
+
+    startTracking() {
+        // Server-Sent Events: o servidor envia só o que mudou
+        if (!window.EventSource) {
+            this.startPolling();
+            return;
+        }
+
+        this.job = null;
+        this.eventSource = new EventSource(`/api/events/${this.currentJobId}`);
+
+        this.eventSource.addEventListener('snapshot', (e) => {
+            this.job = JSON.parse(e.data);
+            this.handleJobUpdate(this.job);
+        });
+
+        this.eventSource.addEventListener('progress', (e) => {
+            if (!this.job) return;
+            const delta = JSON.parse(e.data);
+
+            // Passos alterados vêm a partir do índice steps_from
+            if (delta.steps_from !== undefined) {
+                this.job.steps = (this.job.steps || []).slice(0, delta.steps_from).concat(delta.steps);
+                delete delta.steps_from;
+                delete delta.steps;
+            }
+            Object.assign(this.job, delta);
+            this.handleJobUpdate(this.job);
+        });
+
+        this.eventSource.onerror = () => {
+            // Conexão recusada (ex: proxy sem suporte): volta para o polling.
+            // Quedas temporárias são reconectadas pelo próprio EventSource
+            if (this.eventSource && this.eventSource.readyState === EventSource.CLOSED) {
+                this.stopTracking();
+                this.startPolling();
+            }
+        };
+    }
+
+    stopTracking() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
         if (this.pollInterval) {
             clearInterval(this.pollInterval);
             this.pollInterval = null;
@@ -157,22 +209,26 @@ class WebCopyUI {
             const data = await response.json();
 
             if (response.ok) {
-                this.updateProgress(data);
-
-                if (data.status === 'completed') {
-                    clearInterval(this.pollInterval);
-                    this.showResultSection(data);
-                } else if (data.status === 'error') {
-                    clearInterval(this.pollInterval);
-                    this.showError(data.error || 'Erro durante o processamento');
-                    this.resetUI();
-                }
+                this.handleJobUpdate(data);
             }
         } catch (error) {
             console.error('Error checking status:', error);
         }
     }
 
+    handleJobUpdate(data) {
+        this.updateProgress(data);
+
+        if (data.status === 'completed') {
+            this.stopTracking();
+            this.showResultSection(data);
+        } else if (data.status === 'error') {
+            this.stopTracking();
+            this.showError(data.error || 'Erro durante o processamento');
+            this.resetUI();
+        }
+    }
+
     updateProgress(data) {
         // Update progress bar
         const progress = data.progress || 0;
@@ -181,6 +237,9 @@ class WebCopyUI {
         // Update status message
         this.progressStatus.textContent = data.message || 'Processando...';
         
+        // Assets críticos já baixados: a página pode ser aberta antes do fim
+        this.earlyPreviewBtn.style.display = data.preview_ready ? '' : 'none';
+        
         // Update progress steps
         if (data.steps && data.steps.length > 0) {
             this.progressDetails.innerHTML = data.steps.map(step => {
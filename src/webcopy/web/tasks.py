@@ -3,15 +3,33 @@ Tasks Module - Lógica de processamento em background para o WebCopy Web.
 """
 
 import sys
+import glob
+import time
+import shutil
+import hashlib
 from pathlib import Path
 from datetime import datetime
 from urllib.parse import urlparse
+from collections import Counter
 from typing import Callable, Optional, Dict, Any
 
+import requests
+
 # Import dos módulos core do WebCopy
+from ..archive import ARCHIVE_FORMATS, ArchiveOrganizer
+from ..budget import REASON_LABELS, JobBudget
+from ..cache import HTTPCache
+from ..crawler import Crawler
+from ..cssgraph import CSSGraph
 from ..downloader import Downloader
+from ..metrics import JobMetrics, MetricsRegistry
 from ..parser import HTMLParser
 from ..organizer import FileOrganizer
+from ..pool import PRIORITY_BACKGROUND, PRIORITY_CRITICAL, PRIORITY_HIGH, DownloadPool, create_pool
+from ..profiling import JobProfiler
+from ..ratelimit import AdaptiveRateLimiter
+from ..store import BlobStore
+from ..workers import CPUPool, RewriteMaps, extract_page, rewrite_page
 
 
 def generate_output_name(url: str) -> str:
@@ -22,11 +40,70 @@ def generate_output_name(url: str) -> str:
     return f"{domain}_{timestamp}"
 
 
+def output_path(output_dir: str, url: str, output_name: Optional[str] = None,
+                output_format: str = 'dir') -> Path:
+    """
+    Caminho onde process_website() grava uma cópia nova (diretório, ou
+    arquivo com a extensão do formato).
+    
+    Args:
+        output_dir: Diretório base.
+        url: URL copiada (dá o nome quando output_name é omitido).
+        output_name: Nome customizado da cópia.
+        output_format: 'dir' ou um dos ARCHIVE_FORMATS.
+    """
+    name = output_name or generate_output_name(url)
+    if output_format in ARCHIVE_FORMATS:
+        name += ARCHIVE_FORMATS[output_format].EXTENSION
+    return Path(output_dir) / name
+
+
+def remove_partial_output(target: Path):
+    """
+    Apaga o que uma cópia interrompida deixou em target: o diretório (ou o
+    arquivo) e os temporários de um zip/tar ('.<nome>.*', ao lado dele).
+    """
+    for path in [target, *target.parent.glob(f'.{glob.escape(target.name)}.*')]:
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except OSError:
+            pass
+
+
 def process_website(
     url: str,
     output_dir: str = "output",
     output_name: Optional[str] = None,
-    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    max_workers: Optional[int] = None,
+    per_host_limit: Optional[int] = None,
+    use_async: bool = False,
+    cache: Optional[HTTPCache] = None,
+    store: Optional[BlobStore] = None,
+    previous_dir: Optional[str] = None,
+    max_depth: int = 0,
+    max_pages: int = 50,
+    same_origin: bool = True,
+    path_prefix: Optional[str] = None,
+    page_workers: int = 4,
+    page_delay: float = 0.5,
+    html_parser: str = 'html.parser',
+    output_format: str = 'dir',
+    session: Optional[requests.Session] = None,
+    host_pool_sizes: Optional[Dict[str, int]] = None,
+    rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    deadline: Optional[float] = None,
+    max_bytes: int = 0,
+    max_asset_bytes: int = 0,
+    max_assets: int = 0,
+    time_limit: float = 0,
+    metrics: Optional[MetricsRegistry] = None,
+    collect_stats: bool = False,
+    profile: bool = False,
+    cpu_pool: Optional[CPUPool] = None
 ) -> Dict[str, Any]:
     """
     Processa uma URL e faz download completo do site.
@@ -36,6 +113,76 @@ def process_website(
         output_dir: Diretório base para salvar (padrão: output)
         output_name: Nome customizado para o diretório de saída
         progress_callback: Função callback para reportar progresso
+        max_workers: Número máximo de downloads simultâneos (None = padrão
+            do pool: 8, ou 64 com use_async)
+        per_host_limit: Número máximo de conexões simultâneas por host
+            (None = padrão do pool: 6, ou 32 com use_async)
+        use_async: Baixa os assets com o AsyncDownloader (asyncio + HTTP/2)
+        cache: Cache HTTP persistente compartilhado entre jobs
+        store: BlobStore para guardar cada conteúdo uma única vez
+        previous_dir: Cópia existente a atualizar (modo incremental). Usa o
+            manifesto da cópia para revalidar cada asset e baixa apenas o
+            que mudou, reaproveitando os arquivos inalterados no lugar
+        max_depth: Profundidade de links a seguir (0 = copia só a página)
+        max_pages: Número máximo de páginas copiadas no rastreamento
+        same_origin: Segue apenas links do mesmo host da página inicial
+        path_prefix: Segue apenas links cujo caminho começa com este prefixo
+        page_workers: Número de páginas baixadas em paralelo no rastreamento
+        page_delay: Intervalo mínimo (segundos) entre páginas do mesmo host
+        html_parser: Parser do BeautifulSoup ('html.parser' ou 'lxml', mais
+            rápido em páginas grandes)
+        output_format: 'dir' (árvore de arquivos) ou 'zip'/'tar' (um único
+            arquivo, montado à medida que os assets chegam, sem criar a
+            árvore). output_path aponta para o arquivo
+        session: Sessão HTTP compartilhada (Downloader.create_session()). Sem
+            ela, o job usa uma sessão própria, com pool de conexões por host
+            do tamanho da concorrência, e o resultado inclui 'connections'
+            (reaproveitamento de conexões)
+        host_pool_sizes: Conexões mantidas para hosts específicos na sessão
+            própria (ex: {'cdn.example.com': 32})
+        rate_limiter: Limitador adaptativo por origem, compartilhado entre
+            jobs para que todos respeitem o ritmo (e o Retry-After) de cada
+            host. Sem ele, o job usa um limitador próprio
+        deadline: Prazo (segundos desde o início da cópia) para os downloads
+            de segundo plano. O que não começou até lá é descartado (a
+            página mantém a URL original) e listado em 'skipped'; CSS,
+            scripts do <head> e imagens acima da dobra não têm prazo
+        max_bytes: Total de bytes de assets que o job pode baixar (0 = sem
+            limite)
+        max_asset_bytes: Tamanho máximo de um asset, conferido pelo
+            Content-Length e durante o download (0 = sem limite)
+        max_assets: Número máximo de assets; os mais prioritários entram
+            primeiro (0 = sem limite)
+        time_limit: Tempo máximo (segundos) do job. Ao fim dele nenhum
+            download novo começa, os em andamento são interrompidos e a
+            cópia é finalizada com o que já chegou (0 = sem limite)
+        metrics: Registry que acumula as métricas de todos os jobs (tempo
+            das etapas, fases dos downloads, bytes e uso do cache)
+        collect_stats: Inclui no resultado 'stats', com os tempos, os
+            totais e o registro de cada asset (DNS, conexão, TTFB,
+            transferência, bytes e resultado do cache)
+        profile: Mede o job com cProfile e tracemalloc. Os arquivos vão
+            para '<saída>.profile/' (cpu.pstats, memory.tracemalloc e
+            report.txt) e o resultado inclui 'profile', com os caminhos, as
+            funções mais caras e as maiores alocações. Deixa o job mais
+            lento; só um job é medido por vez no processo
+        cpu_pool: Pool de processos (workers.CPUPool), compartilhável entre
+            jobs, que faz o parse da página, a reescrita do HTML (e do
+            preview) e a dos CSS fora deste processo; os downloads
+            continuam aqui. Vale a pena com páginas grandes, muitas
+            páginas ou muitos jobs simultâneos. O parse das páginas do
+            rastreamento continua neste processo
+    
+    Com um orçamento esgotado, o job termina normalmente com uma cópia
+    parcial: 'partial' fica True e 'skipped' mapeia cada asset que ficou de
+    fora ao motivo (veja budget.REASON_*); 'budget' traz o consumo.
+    
+    O progresso inclui 'preview_path' assim que os assets críticos chegam:
+    a partir daí a página já pode ser aberta, com o resto chegando depois.
+    
+    'timings' traz sempre os segundos gastos em cada etapa (fetch, crawl,
+    parse, download, rewrite_html, rewrite_css, save) e o total. As fases
+    de cada download só são medidas com metrics ou collect_stats.
     
     Returns:
         Dict com informações do resultado (success, path, error, etc.)
@@ -47,36 +194,75 @@ def process_website(
         'error': None
     }
     
-    def update_progress(message: str, progress: int = 0, step_status: str = 'current', steps: list = None):
+    def update_progress(message: str, progress: int = 0, step_status: str = 'current', steps: list = None,
+                        preview_path: Optional[str] = None):
         """Helper para atualizar progresso."""
         if progress_callback:
-            progress_callback({
+            data = {
                 'message': message,
                 'progress': progress,
                 'step_status': step_status,
                 'steps': steps or []
-            })
+            }
+            if preview_path:
+                data['preview_path'] = preview_path
+            progress_callback(data)
+    
+    organizer = None
+    started = time.monotonic()
+    budget = JobBudget(max_bytes, max_asset_bytes, max_assets, time_limit)
+    job_metrics = JobMetrics(metrics, keep_assets=collect_stats)
+    site_path = None
+    
+    profiler = None
+    if profile:
+        profiler = JobProfiler()
+        try:
+            profiler.start()
+        except ValueError as e:
+            # Outro profiler já ativo no processo (Python 3.12+): copia sem perfil
+            profiler = None
+            result['profile'] = {'error': f'Não foi possível iniciar o perfil: {e}'}
     
     try:
-        # Determina o nome do diretório de saída
-        if output_name:
-            site_dir_name = output_name
-        else:
-            site_dir_name = generate_output_name(url)
+        manifest = None
         
-        # Cria o caminho completo
-        base_path = Path(output_dir)
-        site_path = base_path / site_dir_name
+        if output_format != 'dir' and output_format not in ARCHIVE_FORMATS:
+            result['error'] = f'Formato de saída desconhecido: {output_format}'
+            return result
+        
+        if previous_dir and output_format != 'dir':
+            result['error'] = 'O modo incremental só funciona com saída em diretório'
+            return result
+        
+        if previous_dir:
+            # Modo incremental: atualiza a cópia existente no lugar
+            site_path = Path(previous_dir)
+            manifest = FileOrganizer.read_manifest(site_path)
+            if manifest is None:
+                result['error'] = f'Manifesto não encontrado em {site_path}'
+                return result
+        else:
+            site_path = output_path(output_dir, url, output_name, output_format)
         
         steps = []
         
         # 1. Baixa o HTML principal
+        job_metrics.mark('fetch')
         update_progress('Baixando página principal...', 5, 'current', steps)
         steps.append({'message': 'Baixar página principal', 'status': 'current'})
         
-        downloader = Downloader()
-        parser = HTMLParser(url)
-        organizer = FileOrganizer(site_path)
+        downloader = Downloader(
+            cache=cache,
+            session=session,
+            pool_maxsize=max(per_host_limit or DownloadPool.DEFAULT_PER_HOST, page_workers,
+                             Downloader.POOL_MAXSIZE),
+            host_pool_sizes=host_pool_sizes,
+            rate_limiter=rate_limiter,
+            budget=budget if budget.enabled else None,
+            metrics=job_metrics
+        )
+        parser = HTMLParser(url, html_parser)
         
         html_content = downloader.download_text(url)
         
@@ -84,21 +270,58 @@ def process_website(
             result['error'] = 'Não foi possível baixar a página'
             return result
         
+        if output_format == 'dir':
+            organizer = FileOrganizer(site_path, store=store)
+            if manifest:
+                organizer.adopt(manifest)
+        else:
+            # Sem árvore: cada asset vai direto para o arquivo
+            organizer = ArchiveOrganizer(site_path, output_format)
+        
         steps[-1]['status'] = 'completed'
         
+        # Páginas copiadas (URL -> HTML), começando pela principal, e o
+        # parser de cada uma (resolve URLs relativas à própria página)
+        pages = {url: html_content}
+        parsers = {url: parser}
+        
+        if max_depth > 0:
+            job_metrics.mark('crawl')
+            steps.append({'message': 'Rastrear páginas (1)', 'status': 'current'})
+            update_progress('Rastreando páginas...', 7, 'current', steps)
+            
+            def on_page(page_url: str, count: int):
+                steps[-1]['message'] = f'Rastrear páginas ({count})'
+                update_progress(f'Rastreando páginas... {count}', 7, 'current', steps)
+            
+            crawler = Crawler(url, downloader, max_depth, max_pages, same_origin,
+                              path_prefix, page_workers, page_delay, html_parser)
+            crawler.parsers = parsers  # árvores do rastreamento são reaproveitadas
+            pages = crawler.crawl(html_content, on_page)
+            steps[-1]['status'] = 'completed'
+        
         # 2. Faz parse do HTML e extrai URLs de assets
+        job_metrics.mark('parse')
         update_progress('Analisando página e extraindo assets...', 10, 'current', steps)
-        steps.append({'message': 'Analisar página', 'status': 'current'})
-        
-        assets = parser.extract_assets(html_content)
+        steps.append({
+            'message': 'Analisar página' if len(pages) == 1 else f'Analisar {len(pages)} páginas',
+            'status': 'current'
+        })
         
-        total_assets = (
-            len(assets['css']) + 
-            len(assets['js']) + 
-            len(assets['images']) + 
-            len(assets['fonts']) + 
-            len(assets['other'])
-        )
+        # União dos assets de todas as páginas: o que é comum é baixado uma
+        # vez só. A árvore montada aqui é reaproveitada na reescrita do HTML
+        critical = None
+        if cpu_pool is not None and len(pages) == 1:
+            # Página ainda não analisada: o parse vai para o pool
+            assets, critical = cpu_pool.submit(extract_page, url, html_content, html_parser).result()
+        else:
+            assets = parser.extract_assets(html_content)
+        for page_url, page_html in list(pages.items())[1:]:
+            if page_url not in parsers:
+                parsers[page_url] = HTMLParser(page_url, html_parser)
+            page_assets = parsers[page_url].extract_assets(page_html)
+            for category, urls in page_assets.items():
+                assets[category] = sorted(set(assets[category]).union(urls))
         
         steps[-1]['status'] = 'completed'
         steps.append({
@@ -106,139 +329,243 @@ def process_website(
                       f'{len(assets["images"])} imagens, {len(assets["fonts"])} fontes',
             'status': 'completed'
         })
+        update_progress(steps[-1]['message'], 12, 'current', steps)
         
         # 3. Cria estrutura de diretórios
         organizer.create_structure()
         
-        # 4. Baixa e salva cada asset
+        # Links entre as páginas copiadas apontam para os arquivos locais
+        link_map = None
+        if len(pages) > 1:
+            link_map = organizer.page_filenames([HTMLParser.strip_fragment(u) for u in pages])
+        
+        # 4. Baixa os assets por prioridade: CSS (e os que eles importam) e
+        # scripts do <head> primeiro, depois as imagens acima da dobra e, em
+        # segundo plano, o resto. As categorias baixam ao mesmo tempo, então
+        # um servidor lento não segura as demais
+        job_metrics.mark('download')
         url_map = {}  # Mapeia URL original -> caminho local
+        changed_css = set()  # CSS novos ou alterados (precisam ser reescritos)
         downloaded_count = 0
+        head_scripts, above_fold = critical or parser.extract_critical(html_content)
+        pool = create_pool(downloader, organizer, max_workers, per_host_limit, use_async)
         
-        # Baixa CSS
-        if assets['css']:
-            steps.append({'message': f'Baixar CSS (0/{len(assets["css"])})', 'status': 'current'})
-            update_progress(f'Baixando arquivos CSS...', 15, 'current', steps)
-            
-            for idx, css_url in enumerate(assets['css'], 1):
-                content = downloader.download_bytes(css_url)
-                if content:
-                    local_path = organizer.save_css(css_url, content)
-                    url_map[css_url] = local_path
-                    
-                    # Extrai assets de dentro do CSS
-                    css_text = content.decode('utf-8', errors='ignore')
-                    css_assets = parser.extract_css_urls(css_text, css_url)
-                    
-                    for asset_url in css_assets:
-                        if asset_url not in url_map:
-                            asset_content = downloader.download_bytes(asset_url)
-                            if asset_content:
-                                asset_local = organizer.save_asset(asset_url, asset_content)
-                                url_map[asset_url] = asset_local
-                
-                downloaded_count += 1
-                progress = 15 + int((downloaded_count / max(total_assets, 1)) * 50)
-                steps[-1]['message'] = f'Baixar CSS ({idx}/{len(assets["css"])})'
-                update_progress(f'Baixando CSS... {idx}/{len(assets["css"])}', progress, 'current', steps)
-            
-            steps[-1]['status'] = 'completed'
+        # Downloads que liberam o preview (prioridade alta ou crítica)
+        urgent = set()
         
-        # Baixa JavaScript
-        if assets['js']:
-            steps.append({'message': f'Baixar JavaScript (0/{len(assets["js"])})', 'status': 'current'})
-            update_progress('Baixando arquivos JavaScript...', 30, 'current', steps)
-            
-            for idx, js_url in enumerate(assets['js'], 1):
-                content = downloader.download_bytes(js_url)
-                if content:
-                    local_path = organizer.save_js(js_url, content)
-                    url_map[js_url] = local_path
-                
-                downloaded_count += 1
-                progress = 15 + int((downloaded_count / max(total_assets, 1)) * 50)
-                steps[-1]['message'] = f'Baixar JavaScript ({idx}/{len(assets["js"])})'
-                update_progress(f'Baixando JS... {idx}/{len(assets["js"])}', progress, 'current', steps)
-            
-            steps[-1]['status'] = 'completed'
+        def schedule(urls, category, priority):
+            scheduled = pool.schedule(urls, category, priority)
+            if priority >= PRIORITY_HIGH:
+                urgent.update(scheduled)
+            return scheduled
+        
+        # Progresso por categoria: URL -> categoria e categoria -> contadores
+        categories = [
+            ('css', 'CSS', 'CSS', 1),
+            ('js', 'JavaScript', 'JS', 1),
+            ('images', 'imagens', 'imagens', 10),
+            ('fonts', 'fontes', 'fontes', 1),
+            ('other', 'outros recursos', 'outros', 1),
+        ]
+        tiers = [
+            (PRIORITY_CRITICAL, lambda category, u: category == 'css' or u in head_scripts),
+            (PRIORITY_HIGH, lambda category, u: u in above_fold),
+            (PRIORITY_BACKGROUND, lambda category, u: True),
+        ]
+        
+        # Um nível de prioridade por vez, para que um limite de assets
+        # fique com os mais importantes de todas as categorias
+        scheduled_by_category = {category: [] for category, *_ in categories}
+        for priority, wanted in tiers:
+            for category, *_ in categories:
+                urls = [u for u in assets[category] if wanted(category, u)]
+                scheduled_by_category[category] += schedule(urls, category, priority)
+        
+        category_of = {}
+        counters = {}
+        for category, label, short, every in categories:
+            scheduled = scheduled_by_category[category]
+            if not scheduled:
+                continue
+            category_of.update((u, category) for u in scheduled)
+            steps.append({'message': f'Baixar {label} (0/{len(scheduled)})', 'status': 'current'})
+            counters[category] = {'done': 0, 'total': len(scheduled), 'step': steps[-1],
+                                  'label': label, 'short': short, 'every': every}
+        total_assets = len(category_of)
+        if counters:
+            update_progress('Baixando assets...', 15, 'current', steps)
         
-        # Baixa imagens
-        if assets['images']:
-            steps.append({'message': f'Baixar imagens (0/{len(assets["images"])})', 'status': 'current'})
-            update_progress('Baixando imagens...', 45, 'current', steps)
+        # Dependências dos CSS, extraídas na ordem dos arquivos (nomes
+        # determinísticos). Cada @import novo entra no grafo e na fila com
+        # prioridade, enquanto os demais downloads continuam
+        css_graph = CSSGraph(assets['css'])
+        css_order = list(assets['css'])
+        css_finished = set()
+        css_cursor = 0
+        
+        def process_css(css_url: str):
+            """Extrai e agenda as dependências de um CSS baixado."""
+            if organizer.is_unchanged(css_url):
+                # CSS já reescrito na cópia anterior: usa o manifesto
+                info = organizer.previous_info(css_url)
+                css_deps = info.get('deps', [])
+                css_imports = info.get('imports', [u for u in css_deps if organizer.category_for(u) == 'css'])
+            else:
+                css_text = organizer.read_text(url_map[css_url])
+                css_imports, css_assets = parser.extract_css_refs(css_text, css_url)
+                css_deps = list(dict.fromkeys(css_imports + css_assets))
+                changed_css.add(url_map[css_url])
+            organizer.set_dependencies(css_url, css_deps, css_imports)
             
-            for idx, img_url in enumerate(assets['images'], 1):
-                content = downloader.download_bytes(img_url)
-                if content:
-                    local_path = organizer.save_image(img_url, content)
-                    url_map[img_url] = local_path
+            imports = css_graph.add(css_url, css_imports)
+            css_order.extend(imports)
+            schedule(imports, 'css', PRIORITY_CRITICAL)
+            schedule([u for u in css_deps if u not in css_imports], None, PRIORITY_BACKGROUND)
+        
+        preview_ready = False
+        
+        def publish_preview():
+            """Grava uma versão preliminar da página com os assets críticos já locais."""
+            if output_format != 'dir':
+                return
+            if not manifest:
+                # Na atualização incremental a cópia anterior serve de preview
+                if cpu_pool is not None:
+                    with RewriteMaps(dict(url_map), link_map) as maps:
+                        cpu_pool.submit(rewrite_page, url, html_content, html_parser, maps.path,
+                                        str(organizer.output_path / 'index.html')).result()
+                else:
+                    organizer.save_html(
+                        HTMLParser(url, html_parser).iter_rewrite_html(html_content, dict(url_map), link_map)
+                    )
+            steps.append({'message': 'Preview disponível', 'status': 'completed'})
+            update_progress('Preview disponível (assets críticos baixados)', 15 + int(
+                (downloaded_count / max(total_assets, 1)) * 50
+            ), 'current', steps, preview_path=str(site_path.absolute()))
+        
+        deadline_at = started + deadline if deadline else None
+        try:
+            for asset_url, local_path in pool.results(deadline_at):
+                if local_path:
+                    url_map[asset_url] = local_path
+                urgent.discard(asset_url)
                 
-                downloaded_count += 1
-                progress = 15 + int((downloaded_count / max(total_assets, 1)) * 50)
+                category = category_of.get(asset_url)
+                if category:
+                    counter = counters[category]
+                    counter['done'] += 1
+                    downloaded_count += 1
+                    done, total = counter['done'], counter['total']
+                    
+                    # Evita atualizações demais em categorias grandes
+                    if done % counter['every'] == 0 or done == total:
+                        counter['step']['message'] = f'Baixar {counter["label"]} ({done}/{total})'
+                        if done == total:
+                            counter['step']['status'] = 'completed'
+                        progress = 15 + int((downloaded_count / max(total_assets, 1)) * 50)
+                        update_progress(f'Baixando {counter["short"]}... {done}/{total}', progress, 'current', steps)
                 
-                # Update every 10 images to avoid too many updates
-                if idx % 10 == 0 or idx == len(assets['images']):
-                    steps[-1]['message'] = f'Baixar imagens ({idx}/{len(assets["images"])})'
-                    update_progress(f'Baixando imagens... {idx}/{len(assets["images"])}', progress, 'current', steps)
-            
-            steps[-1]['status'] = 'completed'
-        
-        # Baixa fontes
-        if assets['fonts']:
-            steps.append({'message': f'Baixar fontes (0/{len(assets["fonts"])})', 'status': 'current'})
-            update_progress('Baixando fontes...', 70, 'current', steps)
-            
-            for idx, font_url in enumerate(assets['fonts'], 1):
-                content = downloader.download_bytes(font_url)
-                if content:
-                    local_path = organizer.save_font(font_url, content)
-                    url_map[font_url] = local_path
+                if asset_url in css_graph:
+                    css_finished.add(asset_url)
+                    while css_cursor < len(css_order) and css_order[css_cursor] in css_finished:
+                        css_url = css_order[css_cursor]
+                        css_cursor += 1
+                        if css_url in url_map:
+                            process_css(css_url)
                 
-                downloaded_count += 1
-                progress = 15 + int((downloaded_count / max(total_assets, 1)) * 50)
-                steps[-1]['message'] = f'Baixar fontes ({idx}/{len(assets["fonts"])})'
-                update_progress(f'Baixando fontes... {idx}/{len(assets["fonts"])}', progress, 'current', steps)
-            
-            steps[-1]['status'] = 'completed'
+                if not urgent and not preview_ready:
+                    preview_ready = True
+                    publish_preview()
+        finally:
+            pool.close()
         
-        # Baixa outros assets
-        if assets['other']:
-            steps.append({'message': f'Baixar outros recursos (0/{len(assets["other"])})', 'status': 'current'})
-            update_progress('Baixando outros recursos...', 75, 'current', steps)
-            
-            for idx, other_url in enumerate(assets['other'], 1):
-                content = downloader.download_bytes(other_url)
-                if content:
-                    local_path = organizer.save_other(other_url, content)
-                    url_map[other_url] = local_path
-                
-                downloaded_count += 1
-                progress = 15 + int((downloaded_count / max(total_assets, 1)) * 50)
-                steps[-1]['message'] = f'Baixar outros recursos ({idx}/{len(assets["other"])})'
-                update_progress(f'Baixando outros... {idx}/{len(assets["other"])}', progress, 'current', steps)
-            
-            steps[-1]['status'] = 'completed'
+        # Ciclos de @import não travam a cópia (cada CSS é baixado uma vez só)
+        cycles = css_graph.cycles()
+        if cycles:
+            result['css_cycles'] = cycles
+            steps.append({'message': f'{len(cycles)} ciclo(s) de @import entre CSS', 'status': 'completed'})
+        if css_graph.too_deep:
+            steps.append({
+                'message': f'{len(css_graph.too_deep)} CSS ignorados (@import encadeado demais)',
+                'status': 'completed'
+            })
+        
+        if pool.skipped:
+            result['skipped'] = dict(pool.skipped)
+            result['partial'] = True
+            reasons = Counter(pool.skipped.values())
+            steps.append({
+                'message': f'{len(pool.skipped)} assets ignorados (' + ', '.join(
+                    f'{REASON_LABELS.get(reason, reason)}: {count}' for reason, count in reasons.most_common()
+                ) + ')',
+                'status': 'completed'
+            })
+        if budget.enabled:
+            result['budget'] = budget.stats()
         
         # 5. Reescreve URLs no HTML
+        job_metrics.mark('rewrite_html')
         steps.append({'message': 'Reescrever URLs no HTML', 'status': 'current'})
         update_progress('Reescrevendo URLs no HTML...', 85, 'current', steps)
         
-        if url_map:
-            modified_html = parser.rewrite_html_urls(html_content, url_map)
-        else:
-            modified_html = html_content
+        page = {'url': url, 'sha256': hashlib.sha256(html_content.encode('utf-8')).hexdigest()}
+        
+        # No modo incremental, HTML idêntico com os mesmos assets não muda
+        html_unchanged = bool(manifest) and len(pages) == 1 and manifest.get('page') == page and url_map == {
+            asset_url: entry['path'] for asset_url, entry in manifest['assets'].items()
+        }
+        
+        # A reescrita é gerada em partes e gravada direto no arquivo ao salvar
+        # (páginas grandes são processadas em streaming, sem montar a árvore)
+        # Com cpu_pool, as páginas são reescritas em paralelo e cada processo
+        # grava a sua no destino (no modo arquivo, no diretório temporário,
+        # que entra no arquivo em organizer.close()); os mapas vão uma vez só
+        modified_pages = {}
+        if not html_unchanged:
+            maps = RewriteMaps(url_map, link_map) if cpu_pool is not None and (url_map or link_map) else None
+            try:
+                rewrites = []
+                for page_url, page_html in pages.items():
+                    filename = link_map[HTMLParser.strip_fragment(page_url)] if link_map else 'index.html'
+                    if maps is not None:
+                        rewrites.append(cpu_pool.submit(rewrite_page, page_url, page_html, html_parser,
+                                                        maps.path, str(organizer.output_path / filename)))
+                        continue
+                    if url_map or link_map:
+                        page_html = parsers[page_url].iter_rewrite_html(page_html, url_map, link_map)
+                    modified_pages[filename] = page_html
+                for future in rewrites:
+                    future.result()
+            finally:
+                if maps is not None:
+                    maps.close()
         
         steps[-1]['status'] = 'completed'
         
         # 6. Reescreve URLs nos arquivos CSS
+        job_metrics.mark('rewrite_css')
         steps.append({'message': 'Reescrever URLs nos arquivos CSS', 'status': 'current'})
         update_progress('Reescrevendo URLs nos arquivos CSS...', 90, 'current', steps)
-        organizer.rewrite_css_urls(url_map)
+        organizer.rewrite_css_urls(url_map, only=changed_css if manifest else None, executor=cpu_pool)
         steps[-1]['status'] = 'completed'
         
-        # 7. Salva o HTML final
+        # 7. Salva o HTML final (a reescrita do HTML é gerada aqui, em streaming)
+        job_metrics.mark('save')
         steps.append({'message': 'Salvar HTML final', 'status': 'current'})
         update_progress('Salvando HTML final...', 95, 'current', steps)
-        organizer.save_html(modified_html)
+        for filename, page_html in modified_pages.items():
+            organizer.save_html(page_html, filename)
+        if manifest:
+            removed = organizer.remove_stale(url_map)
+            unchanged = sum(1 for asset_url in url_map if organizer.is_unchanged(asset_url))
+            result['incremental'] = {
+                'unchanged': unchanged,
+                'updated': len(url_map) - unchanged,
+                'removed': removed,
+            }
+        organizer.save_manifest(url_map, page)
+        if isinstance(organizer, ArchiveOrganizer):
+            organizer.close()
         steps[-1]['status'] = 'completed'
         
         # Concluído
@@ -246,9 +573,31 @@ def process_website(
         
         result['success'] = True
         result['output_path'] = str(site_path.absolute())
+        result['pages'] = len(pages)
+        if session is None:
+            result['connections'] = downloader.connection_stats()
         
     except Exception as e:
         result['error'] = str(e)
         update_progress(f'Erro: {str(e)}', 0, 'error', [])
+        if isinstance(organizer, ArchiveOrganizer):
+            organizer.abort()
+    finally:
+        result['timings'] = job_metrics.finish(result['success'])
+        if collect_stats:
+            result['stats'] = job_metrics.summary()
+        if profiler is not None:
+            profiler.stop()
+            if site_path is None:
+                site_path = Path(output_dir) / (output_name or generate_output_name(url))
+            profile_path = site_path.with_name(site_path.name + '.profile')
+            try:
+                result['profile'] = {
+                    'path': str(profile_path.absolute()),
+                    'files': profiler.save(profile_path),
+                    **profiler.summary(),
+                }
+            except OSError as e:
+                result['profile'] = {'error': f'Não foi possível gravar o perfil: {e}'}
     
     return result
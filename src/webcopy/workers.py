@@ -0,0 +1,142 @@
+"""
+Workers Module - Pool de processos para o trabalho de CPU das cópias
+(parse e reescrita de HTML e CSS).
+
+O parse do BeautifulSoup e as expressões regulares da reescrita são Python
+puro e disputam o GIL: jobs em threads não passam de um núcleo. Com um
+CPUPool, essas etapas rodam em outros processos, enquanto os downloads
+(rede, cache, rate limiter) continuam no processo principal.
+"""
+
+import multiprocessing
+import os
+import pickle
+import tempfile
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .organizer import FileOrganizer
+from .parser import HTMLParser
+
+# Mapas de reescrita mantidos em cada processo (um por job em andamento)
+MAPS_CACHE_SIZE = 4
+
+_maps: 'OrderedDict[str, Tuple[Dict[str, str], Optional[Dict[str, str]]]]' = OrderedDict()
+
+
+class CPUPool(ProcessPoolExecutor):
+    """
+    ProcessPoolExecutor para as etapas de CPU, compartilhável entre jobs.
+    
+    Usa 'spawn': os processos começam limpos, sem herdar as threads, locks
+    e conexões do processo principal (fork com threads, como na interface
+    web, pode travar).
+    """
+    
+    def __init__(self, processes: int = 0, preload: bool = True):
+        """
+        Args:
+            processes: Número de processos (0 = um por núcleo).
+            preload: Inicia todos os processos agora, para que o primeiro
+                job não pague a inicialização (importar bs4, lxml...).
+        """
+        self.processes = processes or os.cpu_count() or 1
+        super().__init__(max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'))
+        if preload:
+            for future in [self.submit(_ping) for _ in range(self.processes)]:
+                future.result()
+    
+    @property
+    def broken(self) -> bool:
+        """Indica se um processo morreu (o pool não aceita mais tarefas)."""
+        return bool(self._broken)
+
+
+class RewriteMaps:
+    """
+    Mapas da reescrita de um job, entregues a cada processo do pool uma vez.
+    
+    Os mapas vão para um arquivo temporário; as tarefas levam só o caminho,
+    e cada processo carrega o arquivo na primeira página do job e guarda os
+    mapas em memória para as seguintes.
+    """
+    
+    def __init__(self, url_map: Dict[str, str], link_map: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            url_map: Mapa de URL original -> caminho local.
+            link_map: Mapa de URL de página -> arquivo HTML local.
+        """
+        self.path = os.path.join(tempfile.gettempdir(), f'webcopy-maps-{uuid.uuid4().hex}.pickle')
+        with open(self.path, 'xb') as f:
+            pickle.dump((url_map, link_map), f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def __enter__(self) -> 'RewriteMaps':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """Remove o arquivo (os processos que já o carregaram não precisam mais dele)."""
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _ping() -> bool:
+    return True
+
+
+def _load_maps(maps_path: str) -> Tuple[Dict[str, str], Optional[Dict[str, str]]]:
+    """Devolve os mapas de um RewriteMaps, lendo o arquivo só na primeira vez."""
+    maps = _maps.get(maps_path)
+    if maps is None:
+        with open(maps_path, 'rb') as f:
+            maps = pickle.load(f)
+        _maps[maps_path] = maps
+        if len(_maps) > MAPS_CACHE_SIZE:
+            _maps.popitem(last=False)
+    else:
+        _maps.move_to_end(maps_path)
+    return maps
+
+
+def extract_page(url: str, html_content: str, features: str = 'html.parser'
+                 ) -> Tuple[Dict[str, List[str]], Tuple[Set[str], Set[str]]]:
+    """
+    Extrai os assets e os recursos críticos de uma página (em um processo
+    do pool).
+    
+    Returns:
+        Tupla (assets, (scripts_do_head, acima_da_dobra)), como
+        HTMLParser.extract_assets() e extract_critical().
+    """
+    parser = HTMLParser(url, features)
+    return parser.extract_assets(html_content), parser.extract_critical(html_content)
+
+
+def rewrite_page(url: str, html_content: str, features: str, maps_path: str, file_path: str):
+    """
+    Reescreve as URLs de uma página e a grava no destino (em um processo do pool).
+    
+    A árvore montada no parse não atravessa processos, então a página é
+    analisada de novo aqui; o custo fica fora do processo principal. A
+    saída de HTMLParser.iter_rewrite_html() é gravada à medida que é gerada,
+    sem voltar ao processo principal (páginas grandes seguem em streaming).
+    
+    Args:
+        url: URL da página.
+        html_content: Conteúdo HTML original.
+        features: Parser do BeautifulSoup.
+        maps_path: Caminho de um RewriteMaps com os mapas do job.
+        file_path: Arquivo HTML a gravar.
+    """
+    url_map, link_map = _load_maps(maps_path)
+    FileOrganizer.write_html(
+        Path(file_path), HTMLParser(url, features).iter_rewrite_html(html_content, url_map, link_map)
+    )
@@ -0,0 +1,8 @@
+"""
+Configuração dos testes: importa o pacote direto de src/, sem instalá-lo.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
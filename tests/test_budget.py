@@ -0,0 +1,175 @@
+"""
+Testes do JobBudget (budget.py) e da vaga de assets no DownloadPool.
+"""
+
+import hashlib
+
+import pytest
+
+from webcopy import budget as budget_module
+from webcopy.budget import (
+    REASON_MAX_ASSET_BYTES, REASON_MAX_ASSETS, REASON_MAX_BYTES, REASON_TIME_LIMIT,
+    BudgetExceeded, JobBudget,
+)
+from webcopy.organizer import FileOrganizer
+from webcopy.pool import DownloadPool
+
+
+def test_unlimited_budget_accepts_everything():
+    budget = JobBudget()
+    assert not budget.enabled
+    for _ in range(100):
+        budget.admit()
+    budget.check_length('999999999')
+    budget.consume(10 ** 9, 10 ** 9)
+    assert budget.exhausted is None
+
+
+def test_admit_counts_assets_and_release_returns_the_slot():
+    budget = JobBudget(max_assets=2)
+    budget.admit()
+    budget.admit()
+    with pytest.raises(BudgetExceeded) as e:
+        budget.admit()
+    assert e.value.reason == REASON_MAX_ASSETS
+    assert budget.exhausted is None
+    
+    budget.release()
+    budget.admit()
+    assert budget.assets == 2
+
+
+@pytest.mark.parametrize('length, reason', [
+    ('101', REASON_MAX_ASSET_BYTES),
+    (101, REASON_MAX_ASSET_BYTES),
+    ('60', REASON_MAX_BYTES),
+    ('50', None),
+    (None, None),
+    ('', None),
+    ('abc', None),
+])
+def test_check_length(length, reason):
+    budget = JobBudget(max_bytes=100, max_asset_bytes=100)
+    budget.consume(50, 50)
+    if reason is None:
+        budget.check_length(length)
+    else:
+        with pytest.raises(BudgetExceeded) as e:
+            budget.check_length(length)
+        assert e.value.reason == reason
+    # Conferir o Content-Length nunca esgota o job
+    assert budget.exhausted is None
+    assert budget.bytes == 50
+
+
+def test_oversized_asset_is_dropped_and_refunded():
+    budget = JobBudget(max_bytes=1000, max_asset_bytes=100)
+    budget.consume(60, 60)
+    with pytest.raises(BudgetExceeded) as e:
+        budget.consume(60, 120)
+    assert e.value.reason == REASON_MAX_ASSET_BYTES
+    budget.refund(120)
+    assert budget.bytes == 0
+    assert budget.exhausted is None
+
+
+def test_asset_overrunning_the_total_drops_only_itself():
+    budget = JobBudget(max_bytes=100)
+    budget.consume(40, 40)       # asset A, completo
+    budget.consume(50, 50)       # asset B, em andamento
+    with pytest.raises(BudgetExceeded) as e:
+        budget.consume(20, 70)   # B passa do total: só B fica de fora
+    assert e.value.reason == REASON_MAX_BYTES
+    budget.refund(70)
+    assert budget.bytes == 40
+    assert budget.exhausted is None
+    
+    # Um asset menor ainda cabe no que sobrou
+    budget.admit()
+    budget.consume(60, 60)
+    assert budget.bytes == 100
+
+
+def test_total_used_up_exhausts_the_job():
+    budget = JobBudget(max_bytes=100)
+    budget.consume(100, 100)     # asset A usa todo o total
+    with pytest.raises(BudgetExceeded):
+        budget.consume(1, 1)     # sem B, o total já chegou ao limite
+    budget.refund(1)
+    assert budget.exhausted == REASON_MAX_BYTES
+    
+    for check in (budget.admit, lambda: budget.check_length(0), lambda: budget.charge(0)):
+        with pytest.raises(BudgetExceeded) as e:
+            check()
+        assert e.value.reason == REASON_MAX_BYTES
+
+
+def test_charge_counts_nothing_when_the_asset_does_not_fit():
+    budget = JobBudget(max_bytes=100, max_asset_bytes=80)
+    budget.charge(70)
+    for size, reason in [(90, REASON_MAX_ASSET_BYTES), (40, REASON_MAX_BYTES)]:
+        with pytest.raises(BudgetExceeded) as e:
+            budget.charge(size)
+        assert e.value.reason == reason
+    assert budget.bytes == 70
+    assert budget.exhausted is None
+
+
+def test_refund_never_goes_below_zero():
+    budget = JobBudget(max_bytes=100)
+    budget.consume(10, 10)
+    budget.refund(50)
+    assert budget.bytes == 0
+
+
+def test_time_limit(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(budget_module.time, 'monotonic', lambda: now[0])
+    budget = JobBudget(time_limit=5)
+    budget.admit()
+    assert not budget.expired()
+    
+    now[0] += 5
+    assert budget.expired()
+    assert budget.exhausted == REASON_TIME_LIMIT
+    with pytest.raises(BudgetExceeded) as e:
+        budget.consume(1, 1)
+    assert e.value.reason == REASON_TIME_LIMIT
+    with pytest.raises(BudgetExceeded):
+        budget.admit()
+
+
+class _StubDownloader:
+    """Downloader sem rede: grava o corpo de BODIES ou levanta BudgetExceeded."""
+    
+    BODIES = {
+        'https://example.com/big.png': None,
+        'https://example.com/a.png': b'a' * 10,
+        'https://example.com/b.png': b'b' * 10,
+    }
+    
+    def __init__(self, budget):
+        self.budget = budget
+        self.metrics = None
+    
+    def download_to_file(self, url, path, previous=None):
+        body = self.BODIES[url]
+        if body is None:
+            raise BudgetExceeded(REASON_MAX_ASSET_BYTES)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        return {'size': len(body), 'sha256': hashlib.sha256(body).hexdigest()}
+
+
+def test_pool_returns_the_slot_of_a_rejected_asset(tmp_path):
+    budget = JobBudget(max_assets=2, max_asset_bytes=100)
+    organizer = FileOrganizer(tmp_path)
+    with DownloadPool(_StubDownloader(budget), organizer, max_workers=2) as pool:
+        results = dict(pool.download(['https://example.com/big.png', 'https://example.com/a.png'], 'images'))
+        # A vaga do asset recusado volta: o próximo ainda cabe em max_assets
+        results.update(pool.download(['https://example.com/b.png'], 'images'))
+    
+    assert results['https://example.com/big.png'] is None
+    assert results['https://example.com/a.png'] and results['https://example.com/b.png']
+    assert pool.skipped == {'https://example.com/big.png': REASON_MAX_ASSET_BYTES}
+    assert budget.assets == 2
@@ -0,0 +1,301 @@
+"""
+Testes do HTTPCache (cache.py): frescor, revalidação, LRU e o hardlink dos
+corpos com o BlobStore.
+"""
+
+import hashlib
+import os
+from email.utils import formatdate
+
+import pytest
+
+from webcopy import cache as cache_module
+from webcopy.cache import HTTPCache
+from webcopy.organizer import AtomicWriter
+from webcopy.store import BlobStore
+
+NOW = 1_700_000_000.0
+
+
+def http_date(timestamp):
+    return formatdate(timestamp, usegmt=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio do cache controlado pelo teste (clock[0] = agora)."""
+    now = [NOW]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = HTTPCache(tmp_path / 'cache', max_size=1024)
+    yield cache
+    cache.close()
+
+
+def write_body(path, content):
+    """Grava um corpo como o Downloader (AtomicWriter) e devolve o info."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with AtomicWriter(path) as writer:
+        writer.write(content)
+    return {'size': writer.size, 'sha256': writer.sha256, 'content_type': 'image/png'}
+
+
+@pytest.mark.parametrize('headers, ttl', [
+    ({'Cache-Control': 'max-age=60'}, 60),
+    ({'Cache-Control': 'public, max-age="60"'}, 60),
+    ({'Cache-Control': 'max-age=60', 'Age': '50'}, 10),
+    ({'Cache-Control': 'max-age=60', 'Age': '90'}, 0),
+    ({'Cache-Control': 'max-age=abc'}, 0),
+    ({'Cache-Control': 'no-cache, max-age=60'}, 0),
+    ({'Expires': http_date(NOW + 100), 'Date': http_date(NOW)}, 100),
+    ({'Expires': http_date(NOW + 100), 'Date': http_date(NOW + 40)}, 60),
+    ({'Expires': http_date(NOW - 100)}, 0),
+    ({'Expires': 'invalid'}, 0),
+    ({'Cache-Control': 'max-age=5', 'Expires': http_date(NOW + 100)}, 5),
+    ({'Last-Modified': http_date(NOW - 1000), 'Date': http_date(NOW)}, 100),
+    ({'Last-Modified': http_date(NOW - 10 ** 7)}, HTTPCache.MAX_HEURISTIC_TTL),
+    ({'Last-Modified': http_date(NOW + 1000)}, 0),
+    ({}, 0),
+])
+def test_expires_at(cache, headers, ttl):
+    assert cache._expires_at(headers, NOW) == pytest.approx(NOW + ttl)
+
+
+def test_no_store_is_never_cached(cache):
+    assert cache._expires_at({'Cache-Control': 'no-store, max-age=60'}, NOW) is None
+
+
+@pytest.mark.parametrize('headers, stored, fresh', [
+    ({'Cache-Control': 'max-age=60'}, True, True),
+    ({'Cache-Control': 'no-store', 'ETag': '"a"'}, False, None),
+    ({'Cache-Control': 'no-cache', 'ETag': '"a"'}, True, False),
+    ({'Last-Modified': http_date(NOW)}, True, False),
+    ({}, False, None),
+])
+def test_store_and_lookup(cache, tmp_path, headers, stored, fresh):
+    url = 'https://example.com/a.png'
+    info = write_body(tmp_path / 'copy' / 'a.png', b'png data')
+    
+    assert cache.store(url, headers, tmp_path / 'copy' / 'a.png', info) is stored
+    entry = cache.lookup(url)
+    if not stored:
+        assert entry is None
+        return
+    assert entry['fresh'] is fresh
+    assert entry['size'] == len(b'png data')
+    assert entry['sha256'] == hashlib.sha256(b'png data').hexdigest()
+    assert entry['content_type'] == 'image/png'
+    assert entry['etag'] == headers.get('ETag')
+    assert entry['path'].read_bytes() == b'png data'
+
+
+def test_entry_goes_stale(cache, tmp_path, clock):
+    url = 'https://example.com/a.png'
+    info = write_body(tmp_path / 'a.png', b'data')
+    cache.store(url, {'Cache-Control': 'max-age=60'}, tmp_path / 'a.png', info)
+    
+    clock[0] += 59
+    assert cache.lookup(url)['fresh']
+    clock[0] += 1
+    assert not cache.lookup(url)['fresh']
+
+
+def test_conditional_headers():
+    assert HTTPCache.conditional_headers(None) == {}
+    assert HTTPCache.conditional_headers({'etag': '"v1"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}) == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+    }
+    assert HTTPCache.conditional_headers({'etag': None, 'last_modified': None}) == {}
+
+
+def test_refresh_after_304(cache, tmp_path, clock):
+    url = 'https://example.com/style.css'
+    info = write_body(tmp_path / 'style.css', b'body{}')
+    last_modified = http_date(NOW - 3600)
+    cache.store(url, {'Cache-Control': 'no-cache', 'ETag': '"v1"', 'Last-Modified': last_modified},
+                tmp_path / 'style.css', info)
+    assert not cache.lookup(url)['fresh']
+    
+    clock[0] += 10
+    cache.refresh(url, {'Cache-Control': 'max-age=300', 'ETag': '"v2"'})
+    entry = cache.lookup(url)
+    assert entry['fresh']
+    assert entry['etag'] == '"v2"'
+    # Validador ausente no 304 é mantido
+    assert entry['last_modified'] == last_modified
+    assert entry['path'].read_bytes() == b'body{}'
+    
+    clock[0] += 300
+    assert not cache.lookup(url)['fresh']
+
+
+def test_refresh_with_no_store_only_expires(cache, tmp_path):
+    url = 'https://example.com/a.js'
+    info = write_body(tmp_path / 'a.js', b'js')
+    cache.store(url, {'Cache-Control': 'max-age=60', 'ETag': '"v1"'}, tmp_path / 'a.js', info)
+    cache.refresh(url, {'Cache-Control': 'no-store'})
+    entry = cache.lookup(url)
+    assert entry is not None and not entry['fresh']
+
+
+def test_lookup_drops_entry_without_body(cache, tmp_path):
+    url = 'https://example.com/a.png'
+    info = write_body(tmp_path / 'a.png', b'data')
+    cache.store(url, {'Cache-Control': 'max-age=60'}, tmp_path / 'a.png', info)
+    cache.lookup(url)['path'].unlink()
+    
+    assert cache.lookup(url) is None
+    assert cache._total_size == 0
+
+
+def test_lru_eviction(tmp_path, clock):
+    cache = HTTPCache(tmp_path / 'cache', max_size=25)
+    urls = [f'https://example.com/{name}.png' for name in 'abc']
+    for url in urls[:2]:
+        clock[0] += 1
+        info = write_body(tmp_path / 'body', url[-5:].encode() * 2)
+        cache.store(url, {'Cache-Control': 'max-age=600'}, tmp_path / 'body', info)
+    
+    # 'a' foi usada por último: 'b' é a menos recente
+    clock[0] += 1
+    assert cache.lookup(urls[0])
+    
+    clock[0] += 1
+    info = write_body(tmp_path / 'body', b'c' * 10)
+    cache.store(urls[2], {'Cache-Control': 'max-age=600'}, tmp_path / 'body', info)
+    
+    assert cache.lookup(urls[0]) is not None
+    assert cache.lookup(urls[1]) is None
+    assert cache.lookup(urls[2]) is not None
+    assert cache._total_size == 20
+    assert len(list(cache.bodies_dir.glob('*/*'))) == 2
+    cache.close()
+
+
+def test_replacing_an_entry_keeps_the_total(cache, tmp_path):
+    url = 'https://example.com/a.png'
+    for content in (b'x' * 100, b'y' * 40):
+        info = write_body(tmp_path / 'a.png', content)
+        cache.store(url, {'Cache-Control': 'max-age=60'}, tmp_path / 'a.png', info)
+    assert cache._total_size == 40
+    assert cache.lookup(url)['path'].read_bytes() == b'y' * 40
+
+
+def test_total_is_shared_between_instances(tmp_path, clock):
+    first = HTTPCache(tmp_path / 'cache', max_size=30)
+    second = HTTPCache(tmp_path / 'cache', max_size=30)
+    for index, (cache, size) in enumerate([(first, 12), (second, 12), (first, 20)]):
+        clock[0] += 1
+        info = write_body(tmp_path / 'body', bytes([65 + index]) * size)
+        cache.store(f'https://example.com/{index}', {'Cache-Control': 'max-age=60'}, tmp_path / 'body', info)
+    
+    # first só conhece 32 bytes; o evict recalcula o total pelo índice (44,
+    # com o que o outro processo gravou) e remove as duas entradas mais antigas
+    assert first.lookup('https://example.com/0') is None
+    assert first.lookup('https://example.com/1') is None
+    assert first.lookup('https://example.com/2') is not None
+    assert first._total_size == 20
+    reopened = HTTPCache(tmp_path / 'cache')
+    assert reopened._total_size == 20
+    for cache in (first, second, reopened):
+        cache.close()
+
+
+def test_store_hardlinks_the_body(cache, tmp_path):
+    url = 'https://example.com/a.png'
+    source = tmp_path / 'copy' / 'a.png'
+    info = write_body(source, b'data')
+    cache.store(url, {'Cache-Control': 'max-age=60'}, source, info)
+    
+    body = cache.lookup(url)['path']
+    assert os.path.samefile(body, source)
+    assert source.stat().st_nlink == 2
+    
+    # A cópia é sempre substituída por um arquivo novo: o corpo não muda
+    write_body(source, b'other')
+    assert body.read_bytes() == b'data'
+
+
+def test_store_without_hash_copies_the_body(cache, tmp_path):
+    url = 'https://example.com/a.png'
+    source = tmp_path / 'a.png'
+    source.write_bytes(b'data')
+    cache.store(url, {'Cache-Control': 'max-age=60'}, source, {'content_type': 'image/png'})
+    
+    entry = cache.lookup(url)
+    assert not os.path.samefile(entry['path'], source)
+    assert entry['size'] == 4
+    assert entry['sha256'] == hashlib.sha256(b'data').hexdigest()
+
+
+def test_copy_to(cache, tmp_path):
+    url = 'https://example.com/a.png'
+    info = write_body(tmp_path / 'a.png', b'data')
+    cache.store(url, {'Cache-Control': 'max-age=60'}, tmp_path / 'a.png', info)
+    
+    dest = tmp_path / 'other' / 'a.png'
+    dest.parent.mkdir()
+    copied = cache.copy_to(cache.lookup(url), dest)
+    assert copied == {'size': 4, 'sha256': info['sha256'], 'content_type': 'image/png'}
+    assert dest.read_bytes() == b'data'
+    assert not os.path.samefile(dest, cache.lookup(url)['path'])
+
+
+def test_clear(cache, tmp_path):
+    info = write_body(tmp_path / 'a.png', b'data')
+    cache.store('https://example.com/a.png', {'Cache-Control': 'max-age=60'}, tmp_path / 'a.png', info)
+    cache.clear()
+    assert cache.lookup('https://example.com/a.png') is None
+    assert cache._total_size == 0
+    assert cache.bodies_dir.is_dir()
+
+
+def test_cached_body_does_not_keep_blobs_alive(cache, tmp_path):
+    """O hardlink do cache não pode fazer o BlobStore.gc() achar que um blob está em uso."""
+    store = BlobStore(tmp_path / 'store')
+    url = 'https://example.com/a.png'
+    source = tmp_path / 'copy' / 'a.png'
+    info = write_body(source, b'data')
+    cache.store(url, {'Cache-Control': 'max-age=60'}, source, info)
+    
+    blob = store.ingest(source, info['sha256'])
+    body = cache.lookup(url)['path']
+    assert os.path.samefile(source, blob)
+    assert not os.path.samefile(body, blob)
+    assert store.gc() == 0
+    
+    # Sem a cópia o blob fica órfão; o corpo do cache continua intacto
+    source.unlink()
+    assert store.gc() == 4
+    assert not blob.exists()
+    assert body.read_bytes() == b'data'
+    
+    # Um segundo job com o mesmo conteúdo reaproveita o cache, não o blob
+    second = tmp_path / 'copy2' / 'a.png'
+    second.parent.mkdir()
+    cache.copy_to(cache.lookup(url), second)
+    store.ingest(second, info['sha256'])
+    assert store.stats['blobs'] == 2
+    assert second.read_bytes() == b'data'
+
+
+def test_ingest_of_unshared_file_moves_it_into_the_store(tmp_path):
+    store = BlobStore(tmp_path / 'store')
+    first = tmp_path / 'a' / 'x.png'
+    second = tmp_path / 'b' / 'x.png'
+    for path in (first, second):
+        info = write_body(path, b'same')
+        store.ingest(path, info['sha256'])
+    
+    blob = store.blob_path(info['sha256'])
+    assert os.path.samefile(first, blob) and os.path.samefile(second, blob)
+    assert store.stats == {'blobs': 1, 'deduplicated': 1, 'bytes_saved': 4}
+    first.unlink()
+    assert store.gc() == 0
+    second.unlink()
+    assert store.gc() == 4
@@ -0,0 +1,185 @@
+"""
+Testes das referências dentro de CSS (cssgraph.py, HTMLParser.extract_css_refs)
+e da reescrita dos CSS salvos (FileOrganizer.rewrite_css_urls).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from webcopy.cssgraph import CSSGraph, css_refs, rewrite_css_refs
+from webcopy.organizer import FileOrganizer
+from webcopy.parser import HTMLParser
+
+CSS_URL = 'https://example.com/static/css/main.css'
+
+
+@pytest.fixture
+def organizer(tmp_path):
+    organizer = FileOrganizer(tmp_path / 'copy')
+    organizer.create_structure()
+    return organizer
+
+
+@pytest.mark.parametrize('css, expected', [
+    ('a { background: url(a.png) }', [('url', 'a.png')]),
+    ('a { background: url("a.png") }', [('url', 'a.png')]),
+    ("a { background: url( 'a.png' ) }", [('url', 'a.png')]),
+    ('a { background: URL(a.png) }', [('url', 'a.png')]),
+    ('@import url(x.css);', [('import', 'x.css')]),
+    ('@import url("x.css") screen;', [('import', 'x.css')]),
+    ('@import "x.css";', [('import', 'x.css')]),
+    ("@import 'x.css' print;", [('import', 'x.css')]),
+    ('@IMPORT "x.css";', [('import', 'x.css')]),
+    ('a { background: image-set("a.png" 1x, "a@2x.png" 2x) }',
+     [('image-set', 'a.png'), ('image-set', 'a@2x.png')]),
+    ('a { background: -webkit-image-set(url(a.png) 1x, "a@2x.png" 2x) }',
+     [('url', 'a.png'), ('image-set', 'a@2x.png')]),
+    ('a { background: image-set("a.avif" type("image/avif"), "a.png" type("image/png")) }',
+     [('image-set', 'a.avif'), ('image-set', 'a.png')]),
+    ('/* url(hidden.png) @import "hidden.css"; */ a { background: url(a.png) }', [('url', 'a.png')]),
+    ('@font-face { src: url(f.woff2) format("woff2"), url(f.woff) format("woff") }',
+     [('url', 'f.woff2'), ('url', 'f.woff')]),
+])
+def test_css_refs(css, expected):
+    assert [(ref.kind, ref.url) for ref in css_refs(css)] == expected
+
+
+def test_css_refs_spans_cover_the_reference():
+    css = '@import "x.css"; a { background: url(a.png) }'
+    assert [css[ref.start:ref.end] for ref in css_refs(css)] == ['"x.css"', 'url(a.png)']
+
+
+def test_rewrite_css_refs_keeps_each_form():
+    css = ('@import "x.css"; @import url(y.css);\n'
+           'a { background: image-set("a.png" 1x, url(b.png) 2x) } /* url(c.png) */')
+    rewritten = rewrite_css_refs(css, lambda ref: None if ref.url == 'y.css' else 'local/' + ref.url)
+    assert rewritten == (
+        '@import "local/x.css"; @import url(y.css);\n'
+        'a { background: image-set("local/a.png" 1x, url("local/b.png") 2x) } /* url(c.png) */'
+    )
+
+
+def test_rewrite_css_refs_without_changes_returns_the_same_text():
+    css = 'a { background: url(a.png) }'
+    assert rewrite_css_refs(css, lambda ref: None) is css
+
+
+@pytest.mark.parametrize('css, imports, assets', [
+    # Relativas à própria folha, não à página
+    ('a { background: url(../img/a.png) }', [], ['https://example.com/static/img/a.png']),
+    ('a { background: url(/img/a.png) }', [], ['https://example.com/img/a.png']),
+    ('a { background: url(//cdn.example.com/a.png) }', [], ['https://cdn.example.com/a.png']),
+    ('@import "theme.css"; @import url(../base.css);', [
+        'https://example.com/static/css/theme.css', 'https://example.com/static/base.css',
+    ], []),
+    ('a { background: image-set("a.png" 1x, "a@2x.png" 2x) }', [], [
+        'https://example.com/static/css/a.png', 'https://example.com/static/css/a@2x.png',
+    ]),
+    # Fragmentos e repetições viram um download só
+    ('@font-face { src: url(icons.svg#a) } b { background: url(icons.svg#b) }', [],
+     ['https://example.com/static/css/icons.svg']),
+    ('a { background: url(data:image/png;base64,AAAA) } b { mask: url(#m) }', [], []),
+])
+def test_extract_css_refs(css, imports, assets):
+    parser = HTMLParser('https://example.com/pages/index.html')
+    assert parser.extract_css_refs(css, CSS_URL) == (imports, assets)
+
+
+def test_rewrite_css_urls_resolves_against_each_stylesheet(organizer):
+    sheets = {
+        'https://example.com/a/style.css': b'@import "theme.css"; a { background: url(img/logo.png) }',
+        'https://example.com/b/style.css': (
+            b'a { background: image-set("img/logo.png" 1x, url(../a/img/logo.png) 2x) }\n'
+            b'@font-face { src: url(/fonts/icons.svg#icon) } b { background: url(data:,x) }'
+        ),
+        'https://example.com/a/theme.css': b'a { background: url(https://example.com/a/img/logo.png) }',
+    }
+    for url, content in sheets.items():
+        organizer.save_css(url, content)
+    for url in ('https://example.com/a/img/logo.png', 'https://example.com/b/img/logo.png',
+                'https://example.com/fonts/icons.svg'):
+        organizer.save_asset(url, b'asset')
+    
+    url_map = organizer.get_saved_files()
+    organizer.rewrite_css_urls(url_map)
+    
+    def read(url):
+        return organizer.read_text(url_map[url])
+    
+    a_logo = url_map['https://example.com/a/img/logo.png']
+    b_logo = url_map['https://example.com/b/img/logo.png']
+    assert a_logo != b_logo
+    theme = url_map['https://example.com/a/theme.css'].split('/')[-1]
+    
+    assert read('https://example.com/a/style.css') == (
+        f'@import "{theme}"; a {{ background: url("../{a_logo}") }}'
+    )
+    assert read('https://example.com/b/style.css') == (
+        f'a {{ background: image-set("../{b_logo}" 1x, url("../{a_logo}") 2x) }}\n'
+        f'@font-face {{ src: url("../{url_map["https://example.com/fonts/icons.svg"]}#icon") }}'
+        ' b { background: url(data:,x) }'
+    )
+    assert read('https://example.com/a/theme.css') == f'a {{ background: url("../{a_logo}") }}'
+
+
+def test_rewrite_css_urls_only_touches_the_listed_files(organizer):
+    organizer.save_css('https://example.com/a.css', b'a { background: url(x.png) }')
+    organizer.save_css('https://example.com/b.css', b'b { background: url(x.png) }')
+    organizer.save_asset('https://example.com/x.png', b'png')
+    url_map = organizer.get_saved_files()
+    
+    organizer.rewrite_css_urls(url_map, only={url_map['https://example.com/a.css']})
+    assert 'url("../' in organizer.read_text(url_map['https://example.com/a.css'])
+    assert organizer.read_text(url_map['https://example.com/b.css']) == 'b { background: url(x.png) }'
+
+
+@pytest.mark.parametrize('imports, cycles', [
+    ({'a': ['b'], 'b': ['c'], 'c': []}, []),
+    ({'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': []}, []),
+    ({'a': ['b'], 'b': ['a']}, [['a', 'b', 'a']]),
+    ({'a': ['a']}, [['a', 'a']]),
+    ({'a': ['b'], 'b': ['c'], 'c': ['b']}, [['b', 'c', 'b']]),
+    ({'a': ['b'], 'b': ['a'], 'c': ['d'], 'd': ['c']}, [['a', 'b', 'a'], ['c', 'd', 'c']]),
+    ({'a': ['b', 'c'], 'b': ['a'], 'c': ['a']}, [['a', 'b', 'a'], ['a', 'c', 'a']]),
+    # Folha importada que não chegou a ser baixada (sem entrada própria)
+    ({'a': ['missing']}, []),
+])
+def test_cycles(imports, cycles):
+    graph = CSSGraph(['a'])
+    for css_url, children in imports.items():
+        graph.add(css_url, children)
+    assert graph.cycles() == cycles
+
+
+def test_add_returns_only_new_sheets_in_order():
+    graph = CSSGraph(['a', 'b'])
+    assert graph.add('a', ['c', 'b', 'c', 'd']) == ['c', 'd']
+    assert graph.add('c', ['a', 'd', 'e']) == ['e']
+    assert graph.depth == {'a': 0, 'b': 0, 'c': 1, 'd': 1, 'e': 2}
+    assert graph.imports['a'] == ['c', 'b', 'd']
+    assert 'e' in graph and 'f' not in graph
+
+
+def test_chains_deeper_than_max_depth_are_cut():
+    graph = CSSGraph(['s0'], max_depth=2)
+    assert graph.add('s0', ['s1']) == ['s1']
+    assert graph.add('s1', ['s2']) == ['s2']
+    assert graph.add('s2', ['s3']) == []
+    assert graph.too_deep == ['s3']
+    assert 's3' not in graph
+
+
+def test_rewrite_css_urls_in_batches_matches_the_serial_rewrite(tmp_path):
+    results = []
+    for executor in (None, ThreadPoolExecutor(2)):
+        organizer = FileOrganizer(tmp_path / f'copy{len(results)}')
+        organizer.create_structure()
+        for index in range(6):
+            organizer.save_css(f'https://example.com/{index}/s.css', b'a { background: url(../x.png) }')
+        organizer.save_asset('https://example.com/x.png', b'png')
+        url_map = organizer.get_saved_files()
+        organizer.rewrite_css_urls(url_map, executor=executor)
+        results.append({url: organizer.read_text(path) for url, path in url_map.items() if path.endswith('.css')})
+    assert results[0] == results[1]
+    assert set(results[0].values()) == {'a { background: url("../images/x.png") }'}
@@ -0,0 +1,122 @@
+"""
+Testes da reescrita de HTML em streaming (rewriter.py): só os valores com URL
+mudam, e o resultado equivale ao da reescrita com o BeautifulSoup.
+"""
+
+import pytest
+
+from webcopy.parser import HTMLParser
+from webcopy.rewriter import StreamingRewriter
+
+PAGE_URL = 'https://example.com/docs/index.html'
+
+URL_MAP = {
+    'https://example.com/static/site.css': 'css/site.css',
+    'https://example.com/static/app.js': 'js/app.js',
+    'https://example.com/img/a.png': 'images/a.png',
+    'https://example.com/img/b.png': 'images/b.png',
+    'https://example.com/img/bg.png': 'images/bg.png',
+}
+LINK_MAP = {'https://example.com/docs/other.html': 'docs_other.html'}
+
+# Cada campo é um valor reescrito: (original, esperado). Todo o resto do
+# modelo precisa sair idêntico, byte a byte.
+VALUES = {
+    'css': ('/static/site.css', '"css/site.css"'),
+    'css_upper': ('../static/site.css', '"css/site.css"'),
+    'js': ('"../static/app.js"', '"js/app.js"'),
+    'img': ("'/img/a.png'", "'images/a.png'"),
+    'img_entity': ('"/img/a.png?x=1&amp;y=2"', '"/img/a.png?x=1&amp;y=2"'),
+    'srcset': ('"/img/a.png 1x,  /img/b.png 2x"', '"images/a.png 1x, images/b.png 2x"'),
+    'style_attr': ('"background: url(/img/bg.png)"', '\'background: url("images/bg.png")\''),
+    'style_tag': ("url('../img/bg.png')", 'url("images/bg.png")'),
+    'link': ('"other.html#part"', '"docs_other.html#part"'),
+}
+
+TEMPLATE = (
+    '<!DOCTYPE html>\r\n'
+    '<!-- <img src="/img/a.png"> fica como está -->\r\n'
+    '<HTML lang=pt-BR>\r\n'
+    '<HEAD>\r\n'
+    '  <meta charset=utf-8>\r\n'
+    '  <LINK REL=stylesheet HREF={css}>\r\n'
+    '  <link rel="stylesheet"   media="print"\r\n        href={css_upper} >\r\n'
+    '  <!--[if IE]><link rel="stylesheet" href="/static/site.css"><![endif]-->\r\n'
+    '  <style>\r\n    body {{ background: {style_tag} }} /* url(/img/a.png) */\r\n  </style>\r\n'
+    '  <script>var s = \'<img src="/img/a.png">\'; if (a < b && c > d) {{ s += "</scr" + "ipt>"; }}</script>\r\n'
+    '  <script src={js} defer></script>\r\n'
+    '</HEAD>\r\n'
+    '<body class="x"  data-json=\'{{"a": "<b>"}}\'>\r\n'
+    '  <p>Acentuação: ção — 日本語 &amp; &lt;tag&gt; &nbsp;<br/>texto\r\n'
+    '  <img   data-x="1"  src = {img}   alt=\'a &amp; b "q"\' >\r\n'
+    '  <img src={img_entity} ALT="sem mudança">\r\n'
+    '  <img src="/img/missing.png"><img srcset={srcset}>\r\n'
+    '  <div style={style_attr}><input disabled value=\'>\'></div>\r\n'
+    '  <textarea name=t>a < b & "c" </textarea>\r\n'
+    '  <a href={link}>outra</a> <a href="https://other.example/">fora</a> <a href="#top">topo</a>\r\n'
+    '  <pre>\r\n  espaços   e\ttabs\r\n</pre>\r\n'
+    '</body>\r\n'
+    '</HTML>\r\n'
+    'texto final sem quebra de linha'
+)
+
+
+def render(index):
+    return TEMPLATE.format(**{name: values[index] for name, values in VALUES.items()})
+
+
+def streaming_parser():
+    return HTMLParser(PAGE_URL, streaming_threshold=0)
+
+
+def tree_parser():
+    return HTMLParser(PAGE_URL, streaming_threshold=10 ** 9)
+
+
+def test_only_rewritten_values_change():
+    original = render(0)
+    output = ''.join(streaming_parser().iter_rewrite_html(original, URL_MAP, LINK_MAP))
+    assert output == render(1)
+    assert output.encode('utf-8') == render(1).encode('utf-8')
+
+
+def test_streaming_and_tree_paths_rewrite_the_same_values():
+    original = render(0)
+    streamed = ''.join(streaming_parser().iter_rewrite_html(original, URL_MAP, LINK_MAP))
+    tree = tree_parser().rewrite_html_urls(original, URL_MAP, LINK_MAP)
+    
+    # As duas saídas são lidas do mesmo jeito e comparadas valor a valor
+    reader = StreamingRewriter(streaming_parser())
+    assert list(reader.iter_values(streamed)) == list(reader.iter_values(tree))
+
+
+def test_streaming_and_tree_paths_extract_the_same_assets():
+    original = render(0)
+    assert streaming_parser().extract_assets(original) == tree_parser().extract_assets(original)
+
+
+@pytest.mark.parametrize('html', [
+    '',
+    'só texto',
+    '<p>a < b > c & d</p>',
+    '<!-- comentário sem fim <img src="/img/a.png">',
+    '<img src="/img/missing.png" alt="x > y">',
+    '<img src=/img/missing.png/>',
+    '<div title=\'"aspas"\' data-a=\'&quot;\'>',
+    '<script>document.write("<img src=\'/img/a.png\'>")',
+    '<style>a { background: url(/img/missing.png) }',
+    '<?xml version="1.0"?><svg><image href="/img/a.png"/></svg>',
+    '<img src="/img/a.png"',
+    '</p></div><p/>',
+    '<a href="/docs/missing.html#x">link</a>',
+])
+def test_document_without_mapped_urls_is_copied_unchanged(html):
+    output = ''.join(StreamingRewriter(streaming_parser()).rewrite(html, {}, {}))
+    assert output == html
+
+
+def test_large_document_is_rewritten_in_parts():
+    original = render(0) * 50
+    parts = list(streaming_parser().iter_rewrite_html(original, URL_MAP, LINK_MAP))
+    assert len(parts) > 50
+    assert ''.join(parts) == render(1) * 50